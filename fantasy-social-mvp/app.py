@@ -1,6 +1,10 @@
 import streamlit as st
+from utils import leaderboards, social_graph
 from utils.database import Database
+from utils.leaderboards import LeaderboardJob
+from utils.roster_index import RosterIndex
 from utils.sleeper_api import SleeperAPI
+from utils.standings import get_standings
 
 # Page configuration
 st.set_page_config(
@@ -10,6 +14,18 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Number of posts fetched per "Load more" page
+FEED_PAGE_SIZE = 20
+
+# Rows shown on each leaderboard
+LEADERBOARD_SIZE = 25
+
+# Users fetched per "Load more" page on Discover
+DISCOVER_PAGE_SIZE = 20
+
+# "People you may know" suggestions shown on Discover
+SUGGESTION_COUNT = 5
+
 # Initialize database
 if 'db' not in st.session_state:
     st.session_state.db = Database()
@@ -225,6 +241,10 @@ def login_page():
                 else:
                     st.warning("Please enter your Sleeper username")
 
+def selected_season() -> str:
+    """Season picked in the sidebar (the current season until one is picked)"""
+    return st.session_state.get('season') or SleeperAPI.current_season()
+
 def main_app():
     """Main application with navigation"""
     # Sidebar navigation
@@ -252,10 +272,13 @@ def main_app():
 
         st.markdown("---")
 
+        # Season used for league views; finished seasons are served from the local archive
+        st.selectbox("Season", SleeperAPI.available_seasons(), key="season")
+
         # Quick roster viewer
         with st.expander("🏈 My Teams"):
             user = st.session_state.current_user
-            leagues = SleeperAPI.get_user_leagues(user['sleeper_user_id'], "nfl", "2025")
+            leagues = SleeperAPI.get_user_leagues(user['sleeper_user_id'], "nfl", selected_season())
 
             if leagues and len(leagues) > 0:
                 # Select league
@@ -267,14 +290,11 @@ def main_app():
                     selected_league = leagues[selected_idx]
 
                 # Get and display roster
-                roster = SleeperAPI.get_user_roster_in_league(user['sleeper_user_id'], selected_league['league_id'])
-                if roster:
-                    all_players = SleeperAPI.get_all_players()
-                    roster_with_names = SleeperAPI.get_roster_with_names(roster, all_players)
-
+                roster_with_names = SleeperAPI.get_user_roster_with_names(user['sleeper_user_id'], selected_league['league_id'])
+                if roster_with_names:
                     # Show record
-                    wins = roster.get('settings', {}).get('wins', 0)
-                    losses = roster.get('settings', {}).get('losses', 0)
+                    wins = roster_with_names.get('settings', {}).get('wins', 0)
+                    losses = roster_with_names.get('settings', {}).get('losses', 0)
                     st.caption(f"Record: {wins}-{losses}")
 
                     # Show starters
@@ -285,7 +305,7 @@ def main_app():
                         if len(roster_with_names['starter_details']) > 5:
                             st.caption(f"... and {len(roster_with_names['starter_details']) - 5} more")
             else:
-                st.caption("No leagues found for 2025")
+                st.caption(f"No leagues found for {selected_season()}")
 
         st.markdown("---")
 
@@ -341,7 +361,7 @@ def show_feed():
         if attach_roster:
             st.markdown("**Select a league to share from:**")
             user = st.session_state.current_user
-            leagues = SleeperAPI.get_user_leagues(user['sleeper_user_id'], "nfl", "2025")
+            leagues = SleeperAPI.get_user_leagues(user['sleeper_user_id'], "nfl", selected_season())
 
             if leagues:
                 league_options = {f"{league['name']}": league['league_id'] for league in leagues}
@@ -349,12 +369,9 @@ def show_feed():
                 selected_league_id = league_options[selected_league_name]
 
                 # Get roster for this league
-                roster = SleeperAPI.get_user_roster_in_league(user['sleeper_user_id'], selected_league_id)
+                roster_with_names = SleeperAPI.get_user_roster_with_names(user['sleeper_user_id'], selected_league_id)
 
-                if roster:
-                    # Load player data
-                    all_players = SleeperAPI.get_all_players()
-                    roster_with_names = SleeperAPI.get_roster_with_names(roster, all_players)
+                if roster_with_names:
 
                     share_option = st.radio("What to share:", ["Full Roster", "Starters Only", "Select Specific Players"])
 
@@ -393,7 +410,7 @@ def show_feed():
                             }
                             st.caption(f"👥 Will share {len(selected_players)} selected players")
             else:
-                st.info("No leagues found for 2025. Join a league on Sleeper first!")
+                st.info(f"No leagues found for {selected_season()}. Join a league on Sleeper first!")
 
         with col3:
             if st.button("Post", type="primary", use_container_width=True):
@@ -413,10 +430,26 @@ def show_feed():
 
     st.markdown("---")
 
+    # Post search
+    search_query = st.text_input(
+        "Search posts",
+        placeholder="🔍 Search posts, players, trade talk...",
+        label_visibility="collapsed"
+    ).strip()
+    if search_query:
+        show_search_results(search_query)
+        return
+
     # Show feed
-    feed = st.session_state.db.get_feed_for_user(
-        st.session_state.current_user['id'],
-        view_mode=view_mode.lower()
+    pages_key = f"feed_pages_{view_mode.lower()}"
+    feed, next_cursor = load_post_pages(
+        pages_key,
+        lambda cursor: st.session_state.db.get_feed_page(
+            st.session_state.current_user['id'],
+            view_mode=view_mode.lower(),
+            cursor=cursor,
+            page_size=FEED_PAGE_SIZE
+        )
     )
 
     if not feed:
@@ -427,10 +460,66 @@ def show_feed():
     else:
         for post in feed:
             show_post(post)
+        show_load_more(pages_key, next_cursor)
+
+def show_search_results(query: str):
+    """Show full-text search results for posts, best matches first"""
+    pages_key = f"search_pages_{query.lower()}"
+    results, next_cursor = load_post_pages(
+        pages_key,
+        lambda cursor: st.session_state.db.search_posts(
+            query,
+            st.session_state.current_user['id'],
+            cursor=cursor,
+            page_size=FEED_PAGE_SIZE
+        )
+    )
 
-def show_league_details(league_id: str):
-    """Display detailed league information including format and standings"""
-    league = SleeperAPI.get_league(league_id)
+    if not results:
+        st.info(f"No posts match \"{query}\".")
+        return
+    st.caption(f"Posts matching \"{query}\"")
+    for post in results:
+        show_post(post)
+    show_load_more(pages_key, next_cursor)
+
+def load_post_pages(pages_key: str, fetch_page):
+    """
+    Fetch every page of posts the user has loaded so far
+
+    fetch_page(cursor) returns (posts, next_cursor). The number of loaded pages
+    lives in session state so "Load more" survives reruns.
+    """
+    pages = st.session_state.get(pages_key, 1)
+    posts, cursor = [], None
+    for _ in range(pages):
+        page, cursor = fetch_page(cursor)
+        # One grouped query per page instead of one comment query per post
+        posts.extend(st.session_state.db.hydrate_posts(page, viewer_id=st.session_state.current_user['id']))
+        if not cursor:
+            break
+    return posts, cursor
+
+def show_load_more(pages_key: str, next_cursor):
+    """Show a "Load more" button when there are more results to fetch"""
+    if next_cursor and st.button("Load more", key=f"load_more_{pages_key}", use_container_width=True):
+        st.session_state[pages_key] = st.session_state.get(pages_key, 1) + 1
+        st.rerun()
+
+def show_league_details(league_id: str, league_data: dict = None):
+    """
+    Display detailed league information including format and standings
+
+    league_data: optional entry from SleeperAPI.hydrate_leagues, so callers that
+    already fetched the league don't fetch it again
+    """
+    if league_data is None:
+        league_data = {
+            'league': SleeperAPI.get_league(league_id),
+            'rosters': SleeperAPI.get_league_rosters(league_id),
+            'users': SleeperAPI.get_league_users(league_id)
+        }
+    league = league_data['league']
     if not league:
         st.error("Could not load league details")
         return
@@ -474,55 +563,23 @@ def show_league_details(league_id: str):
     st.markdown("---")
     st.markdown("**Standings:**")
 
-    rosters = SleeperAPI.get_league_rosters(league_id)
-    users = SleeperAPI.get_league_users(league_id)
+    rosters = league_data['rosters']
+    users = league_data['users']
 
     if rosters and users:
-        # Create user lookup
-        user_lookup = {user['user_id']: user for user in users}
-
-        # Build standings list
-        standings = []
-        for roster in rosters:
-            owner_id = roster.get('owner_id')
-            user = user_lookup.get(owner_id, {})
-
-            standings.append({
-                'team': user.get('display_name', 'Unknown'),
-                'wins': roster.get('settings', {}).get('wins', 0),
-                'losses': roster.get('settings', {}).get('losses', 0),
-                'ties': roster.get('settings', {}).get('ties', 0),
-                'points_for': roster.get('settings', {}).get('fpts', 0) + roster.get('settings', {}).get('fpts_decimal', 0) / 100,
-                'points_against': roster.get('settings', {}).get('fpts_against', 0) + roster.get('settings', {}).get('fpts_against_decimal', 0) / 100
-            })
-
-        # Sort by wins (descending), then by points_for
-        standings.sort(key=lambda x: (x['wins'], x['points_for']), reverse=True)
-
-        # Display standings
-        for idx, team in enumerate(standings, 1):
-            win_pct = team['wins'] / (team['wins'] + team['losses']) if (team['wins'] + team['losses']) > 0 else 0
-
-            # Medal emoji for top 3
-            medal = ""
-            if idx == 1:
-                medal = "🥇 "
-            elif idx == 2:
-                medal = "🥈 "
-            elif idx == 3:
-                medal = "🥉 "
-
-            st.markdown(f"""
-            <div style="background-color: #f8f9fa; padding: 0.75rem; border-radius: 0.5rem; margin-bottom: 0.5rem;">
-                <span style="color: #000000; font-weight: bold;">{medal}#{idx} {team['team']}</span><br>
-                <span style="color: #333333; font-size: 0.9rem;">
-                    {team['wins']}-{team['losses']}{f"-{team['ties']}" if team['ties'] > 0 else ""}
-                    ({win_pct:.1%}) |
-                    PF: {team['points_for']:.1f} |
-                    PA: {team['points_against']:.1f}
-                </span>
-            </div>
-            """, unsafe_allow_html=True)
+        # Computed once per league per roster version, rendered as one table
+        table = get_standings(league_id, rosters, users)
+        st.dataframe(
+            table,
+            hide_index=True,
+            width="stretch",
+            column_config={
+                'Rank': st.column_config.NumberColumn(width="small"),
+                'Win %': st.column_config.NumberColumn(format="%.1f%%"),
+                'PF': st.column_config.NumberColumn(format="%.1f"),
+                'PA': st.column_config.NumberColumn(format="%.1f"),
+            }
+        )
     else:
         st.info("Standings not available")
 
@@ -600,12 +657,20 @@ def show_post(post):
         col3 = None
 
     with col1:
-        if st.button(f"👍 {post['likes']}", key=f"like_{post['id']}"):
-            st.session_state.db.like_post(post['id'])
+        liked = post.get('liked', False)
+        if st.button(f"👍 {post['likes']}", key=f"like_{post['id']}", type="primary" if liked else "secondary",
+                     help="Unlike" if liked else "Like"):
+            if liked:
+                st.session_state.db.unlike_post(post['id'], st.session_state.current_user['id'])
+            else:
+                st.session_state.db.like_post(post['id'], st.session_state.current_user['id'])
             st.rerun()
     with col2:
-        comments = st.session_state.db.get_comments(post['id'])
-        st.button(f"💬 {len(comments)}", key=f"comment_btn_{post['id']}")
+        if 'comment_count' in post:
+            comment_count = post['comment_count']
+        else:
+            comment_count = st.session_state.db.get_comment_counts([post['id']])[post['id']]
+        st.button(f"💬 {comment_count}", key=f"comment_btn_{post['id']}")
 
     # Show delete button only for user's own posts
     if is_own_post and col3:
@@ -652,17 +717,22 @@ def show_profile():
     st.markdown("---")
 
     # Show Sleeper leagues
-    st.markdown("### My Leagues (2025)")
+    season = selected_season()
+    st.markdown(f"### My Leagues ({season})")
 
-    leagues = SleeperAPI.get_user_leagues(user['sleeper_user_id'], "nfl", "2025")
+    leagues = SleeperAPI.get_user_leagues(user['sleeper_user_id'], "nfl", season)
 
     if leagues:
+        # Fetch league, rosters and users for every league at once
+        hydrated = SleeperAPI.hydrate_leagues([league['league_id'] for league in leagues])
+
         for league in leagues:
+            league_data = hydrated[league['league_id']]
             with st.container():
                 st.markdown(f"#### {league['name']}")
 
-                # Get user's roster in this league
-                roster = SleeperAPI.get_user_roster_in_league(user['sleeper_user_id'], league['league_id'])
+                # Get user's roster in this league from the rosters fetched above
+                roster = RosterIndex(league_data['rosters']).owner(user['sleeper_user_id'])
 
                 if roster:
                     col1, col2, col3 = st.columns(3)
@@ -675,7 +745,7 @@ def show_profile():
 
                 # Add league details expander
                 with st.expander("ℹ️ View League Details & Standings"):
-                    show_league_details(league['league_id'])
+                    show_league_details(league['league_id'], league_data)
 
                 st.markdown("---")
     else:
@@ -685,59 +755,114 @@ def show_profile():
 
     # Show user's posts
     st.markdown("### My Posts")
-    user_posts = st.session_state.db.get_posts(user_id=user['id'])
+    user_posts, next_cursor = load_post_pages(
+        "profile_pages",
+        lambda cursor: st.session_state.db.get_posts_page(
+            user_id=user['id'],
+            cursor=cursor,
+            page_size=FEED_PAGE_SIZE
+        )
+    )
 
     if user_posts:
         for post in user_posts:
             show_post(post)
+        show_load_more("profile_pages", next_cursor)
     else:
         st.info("You haven't posted anything yet!")
 
-def show_discover():
-    """Show user discovery page"""
-    st.markdown('<p class="main-header">Discover Players</p>', unsafe_allow_html=True)
+def show_user_card(user: dict, current_user_id: int, key_prefix: str = "", reason: str = None):
+    """Show a user with their stats and a follow/unfollow button"""
+    with st.container():
+        col1, col2, col3 = st.columns([2, 4, 2])
 
-    st.markdown("Find and follow other fantasy football players")
+        with col1:
+            if user['avatar_url']:
+                st.image(f"https://sleepercdn.com/avatars/thumbs/{user['avatar_url']}", width=80)
 
-    # Get all users
-    all_users = st.session_state.db.get_all_users()
-    current_user_id = st.session_state.current_user['id']
+        with col2:
+            st.markdown(f"**{user['display_name']}**")
+            st.markdown(f"@{user['sleeper_username']}")
+            if user.get('bio'):
+                st.markdown(f"_{user['bio']}_")
 
-    # Filter out current user
-    other_users = [u for u in all_users if u['id'] != current_user_id]
+            # Show user stats
+            st.caption(f"{user['posts']} posts • {user['followers']} followers")
+            if reason:
+                st.caption(reason)
 
-    if other_users:
-        for user in other_users:
-            with st.container():
-                col1, col2, col3 = st.columns([2, 4, 2])
+        with col3:
+            if user['is_following']:
+                if st.button("Unfollow", key=f"{key_prefix}unfollow_{user['id']}", use_container_width=True):
+                    st.session_state.db.unfollow_user(current_user_id, user['id'])
+                    st.rerun()
+            else:
+                if st.button("Follow", key=f"{key_prefix}follow_{user['id']}", type="primary", use_container_width=True):
+                    st.session_state.db.follow_user(current_user_id, user['id'])
+                    st.rerun()
 
-                with col1:
-                    if user['avatar_url']:
-                        st.image(f"https://sleepercdn.com/avatars/thumbs/{user['avatar_url']}", width=80)
+        st.markdown("---")
+
+def suggestion_reason(suggestion: dict) -> str:
+    """Why a user is suggested, e.g. 'Followed by 3 people you follow • 1 shared league'"""
+    reasons = []
+    if suggestion['mutual']:
+        reasons.append(f"Followed by {suggestion['mutual']} {'person' if suggestion['mutual'] == 1 else 'people'} you follow")
+    if suggestion['shared_leagues']:
+        reasons.append(f"{suggestion['shared_leagues']} shared league{'s' if suggestion['shared_leagues'] != 1 else ''}")
+    return " • ".join(reasons)
+
+def show_suggestions(current_user_id: int):
+    """Show "People you may know" from the in-memory follow graph"""
+    # Loads in the background on first use; suggestions appear once it's ready
+    graph = social_graph.get_follow_graph(st.session_state.db)
+    if not graph.ready:
+        return
+    suggestions = graph.recommend(current_user_id, SUGGESTION_COUNT)
+    users = st.session_state.db.get_users_bulk([s['user_id'] for s in suggestions], current_user_id)
+    suggestions = [s for s in suggestions if s['user_id'] in users]
+    if not suggestions:
+        return
+
+    st.markdown("### 👋 People You May Know")
+    for suggestion in suggestions:
+        show_user_card(users[suggestion['user_id']], current_user_id,
+                       key_prefix="suggested_", reason=suggestion_reason(suggestion))
+    st.markdown("### All Players")
 
-                with col2:
-                    st.markdown(f"**{user['display_name']}**")
-                    st.markdown(f"@{user['sleeper_username']}")
-                    if user.get('bio'):
-                        st.markdown(f"_{user['bio']}_")
+def show_discover():
+    """Show user discovery page"""
+    st.markdown('<p class="main-header">Discover Players</p>', unsafe_allow_html=True)
 
-                    # Show user stats
-                    stats = st.session_state.db.get_user_stats(user['id'])
-                    st.caption(f"{stats['posts']} posts • {stats['followers']} followers")
+    st.markdown("Find and follow other fantasy football players")
 
-                with col3:
-                    is_following = st.session_state.db.is_following(current_user_id, user['id'])
+    query = st.text_input(
+        "Search players",
+        placeholder="🔍 Search by username or display name...",
+        label_visibility="collapsed"
+    ).strip()
+    current_user_id = st.session_state.current_user['id']
 
-                    if is_following:
-                        if st.button("Unfollow", key=f"unfollow_{user['id']}", use_container_width=True):
-                            st.session_state.db.unfollow_user(current_user_id, user['id'])
-                            st.rerun()
-                    else:
-                        if st.button("Follow", key=f"follow_{user['id']}", type="primary", use_container_width=True):
-                            st.session_state.db.follow_user(current_user_id, user['id'])
-                            st.rerun()
+    if not query:
+        show_suggestions(current_user_id)
 
-                st.markdown("---")
+    # Stats and follow state come back with each page of results
+    pages_key = f"discover_pages_{query.lower()}"
+    users, next_cursor = [], None
+    for _ in range(st.session_state.get(pages_key, 1)):
+        page, next_cursor = st.session_state.db.search_users(
+            query, current_user_id, cursor=next_cursor, page_size=DISCOVER_PAGE_SIZE
+        )
+        users.extend(page)
+        if not next_cursor:
+            break
+
+    if users:
+        for user in users:
+            show_user_card(user, current_user_id)
+        show_load_more(pages_key, next_cursor)
+    elif query:
+        st.info(f"No players match \"{query}\".")
     else:
         st.info("No other users yet. Invite your league mates!")
 
@@ -745,39 +870,64 @@ def show_leaderboards():
     """Show cross-league leaderboards"""
     st.markdown('<p class="main-header">Leaderboards</p>', unsafe_allow_html=True)
 
-    st.markdown("### Coming Soon!")
-    st.info("""
-    Cross-league leaderboards will show:
-    - Top performers across all connected leagues
-    - Best win percentages
-    - Highest scoring teams
-    - Most active users on the platform
-
-    For now, check out individual profiles to see their league stats!
-    """)
+    season = selected_season()
+    db = st.session_state.db
+
+    # Aggregated by a background batch job; the page only reads the top of each index
+    job = LeaderboardJob(db, SleeperAPI.get_user_leagues, SleeperAPI.get_league_rosters)
+    leaderboards.ensure_fresh(job, season)
+
+    st.markdown(f"### Across Everyone's Leagues ({season})")
+    boards = [
+        ("🏆 Win %", 'win_pct'),
+        ("🔥 Points For", 'points_for'),
+        ("😬 Points Against", 'points_against'),
+    ]
+    tabs = st.tabs([label for label, _ in boards])
+    for tab, (label, metric) in zip(tabs, boards):
+        with tab:
+            leaders = db.get_leaderboard(season, metric, limit=LEADERBOARD_SIZE)
+            if not leaders:
+                if leaderboards.is_running(season):
+                    st.info("Crunching league results... check back in a moment.")
+                else:
+                    st.info(f"No league results for {season} yet.")
+                continue
+            st.dataframe(
+                [
+                    {
+                        'Rank': idx,
+                        'User': f"@{leader['sleeper_username']}",
+                        'Leagues': leader['leagues'],
+                        'Record': f"{leader['wins']}-{leader['losses']}" + (f"-{leader['ties']}" if leader['ties'] else ""),
+                        'Win %': leader['win_pct'] * 100,
+                        'PF': leader['points_for'],
+                        'PA': leader['points_against'],
+                    }
+                    for idx, leader in enumerate(leaders, 1)
+                ],
+                hide_index=True,
+                width="stretch",
+                column_config={
+                    'Win %': st.column_config.NumberColumn(format="%.1f%%"),
+                    'PF': st.column_config.NumberColumn(format="%.1f"),
+                    'PA': st.column_config.NumberColumn(format="%.1f"),
+                }
+            )
 
     # Show most active users
     st.markdown("### Most Active Users")
 
-    all_users = st.session_state.db.get_all_users()
-    user_activity = []
-
-    for user in all_users:
-        stats = st.session_state.db.get_user_stats(user['id'])
-        user_activity.append({
-            'user': user,
-            'total_activity': stats['posts'] + stats['followers']
-        })
-
-    # Sort by activity
-    user_activity.sort(key=lambda x: x['total_activity'], reverse=True)
+    # Ranked by posts + followers in a single query
+    most_active = st.session_state.db.get_most_active_users(limit=10)
 
-    for idx, item in enumerate(user_activity[:10], 1):
-        user = item['user']
-        st.markdown(f"**#{idx}** @{user['sleeper_username']} - {item['total_activity']} activity points")
+    for idx, user in enumerate(most_active, 1):
+        st.markdown(f"**#{idx}** @{user['sleeper_username']} - {user['total_activity']} activity points")
 
 # Main app logic
 if st.session_state.current_user is None:
     login_page()
 else:
+    # Keep this user's leagues warm in the background while they're around
+    SleeperAPI.track_active_user(st.session_state.current_user['sleeper_user_id'])
     main_app()
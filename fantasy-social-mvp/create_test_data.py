@@ -180,8 +180,9 @@ def create_test_data():
     print("\nAdding likes to posts...")
     posts = db.get_posts(limit=100)
     for post in posts[:5]:  # Like first 5 posts
-        for _ in range(random.randint(1, 8)):
-            db.like_post(post['id'])
+        for liker_id in random.sample(user_ids, random.randint(1, len(user_ids))):
+            db.like_post(post['id'], liker_id)
+    db.flush_likes()
     print("✓ Likes added")
 
     # Add some comments
@@ -0,0 +1,56 @@
+"""
+Database maintenance commands
+
+Usage:
+    python maintenance.py repair-counters
+    python maintenance.py rebuild-timelines
+    python maintenance.py refresh-leaderboards [--season 2025]
+"""
+import argparse
+
+from utils.database import Database
+
+def repair_counters(db: Database):
+    """Rebuild the denormalized user_counters table"""
+    db.rebuild_user_counters()
+    print("✓ User counters rebuilt")
+
+def rebuild_timelines(db: Database):
+    """Rebuild the materialized home timelines"""
+    db.rebuild_timelines()
+    print("✓ Timelines rebuilt")
+
+def refresh_leaderboards(db: Database, season: str = None):
+    """Aggregate connected users' league records into the leaderboard table"""
+    # Imported here so the other commands don't need streamlit
+    from utils.leaderboards import LeaderboardJob
+    from utils.sleeper_api import SleeperAPI
+
+    season = season or SleeperAPI.current_season()
+    job = LeaderboardJob(db, SleeperAPI.get_user_leagues, SleeperAPI.get_league_rosters)
+    result = job.run(season)
+    print(f"✓ Leaderboards refreshed for {season}: {result['changed_leagues']} of {result['leagues']} leagues changed, "
+          f"{result['skipped_leagues']} skipped, {result['removed_leagues']} removed, "
+          f"{result['updated_users']} users updated")
+
+COMMANDS = {
+    'repair-counters': repair_counters,
+    'rebuild-timelines': rebuild_timelines,
+    'refresh-leaderboards': refresh_leaderboards,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Fantasy Football Social database maintenance")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--db', default="fantasy_social.db", help="Path to the SQLite database")
+    parser.add_argument('--season', help="Season for refresh-leaderboards (defaults to the current one)")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    if args.command == 'refresh-leaderboards':
+        refresh_leaderboards(db, args.season)
+    else:
+        COMMANDS[args.command](db)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, NamedTuple
+
+import pytest
+
+# The app imports its modules as `utils.*` from the project directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+class StubResponse(NamedTuple):
+    status: int = 200
+    body: bytes = b'{}'
+    headers: Dict[str, str] = {}
+    delay: float = 0.0      # on top of the server-wide delay
+
+
+class StubServer:
+    """
+    Local HTTP server standing in for the Sleeper API
+
+    routes maps a request path to a 200 response body (bytes), or to a list of
+    StubResponses served in order (the last one repeats). Every response waits
+    `delay` seconds first, and hits counts requests per path.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.delay = 0.0
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits[self.path] += 1
+                    response = stub._next_response(self.path)
+                time.sleep(stub.delay + response.delay)
+                try:
+                    self.send_response(response.status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(response.body)))
+                    for name, value in response.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(response.body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (e.g. a read timeout)
+                    pass
+
+        return Handler
+
+    def _next_response(self, path: str) -> StubResponse:
+        route = self.routes.get(path)
+        if route is None:
+            return StubResponse(404)
+        if isinstance(route, bytes):
+            return StubResponse(body=route)
+        return route.pop(0) if len(route) > 1 else route[0]
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,147 @@
+"""
+TieredCache: the backend interface, missing results, and loads that another caller just finished
+"""
+import time
+
+import pytest
+
+from utils import api_cache
+from utils.api_cache import (ARCHIVE_TABLE, NEGATIVE_TTL, CacheBackend, MemoryLRU, SQLiteCacheStore,
+                             TieredCache)
+
+ENDPOINT = 'user'
+KEY = '/user/nobody'
+
+
+class Clock:
+    """Stands in for the time module in api_cache"""
+
+    perf_counter = staticmethod(time.perf_counter)
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+class Loader:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(api_cache, 'time', clock)
+    return clock
+
+
+def make_cache(path, shared=None, **kwargs):
+    return TieredCache(shared=shared or SQLiteCacheStore(path), front=MemoryLRU(),
+                       archive=SQLiteCacheStore(path, table=ARCHIVE_TABLE), **kwargs)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.db')
+
+
+def test_backends_must_implement_get_set_delete():
+    class Incomplete(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        CacheBackend()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_missing_result_is_cached_briefly(path, clock):
+    cache = make_cache(path)
+    loader = Loader(None, {'user_id': '1'})
+
+    assert cache.get_or_load(ENDPOINT, KEY, loader) is None
+    assert cache.get_or_load(ENDPOINT, KEY, loader) is None
+    # Another process on the host sees it too
+    assert make_cache(path).get_or_load(ENDPOINT, KEY, loader) is None
+    assert loader.calls == 1
+
+    clock.now += NEGATIVE_TTL + 1
+    assert cache.get_or_load(ENDPOINT, KEY, loader) == {'user_id': '1'}
+    assert loader.calls == 2
+
+
+def test_missing_result_is_not_served_stale(path, clock):
+    # Well inside the endpoint's max staleness, which only applies to real values
+    cache = make_cache(path, ttls={ENDPOINT: 3600}, max_staleness={ENDPOINT: 3600})
+    loader = Loader(None, {'user_id': '1'})
+    cache.get_or_load(ENDPOINT, KEY, loader)
+
+    clock.now += NEGATIVE_TTL + 1
+    assert cache.get_or_load(ENDPOINT, KEY, loader) == {'user_id': '1'}
+    assert cache.stats()['stale_hits'] == 0
+
+
+def test_negative_ttl_is_capped_at_the_endpoint_ttl(path, clock):
+    cache = make_cache(path, ttls={ENDPOINT: 5})
+    loader = Loader(None)
+    cache.get_or_load(ENDPOINT, KEY, loader)
+
+    clock.now += 6
+    cache.get_or_load(ENDPOINT, KEY, loader)
+    assert loader.calls == 2
+
+
+def test_failed_refresh_keeps_the_cached_value(path):
+    cache = make_cache(path, ttls={ENDPOINT: 60}, max_staleness={ENDPOINT: 600})
+    cache.put(ENDPOINT, KEY, {'user_id': '1'}, fetched_at=time.time() - 120)
+
+    assert cache.get_or_load(ENDPOINT, KEY, Loader(None)) == {'user_id': '1'}
+    deadline = time.monotonic() + 5
+    while cache.stats()['refreshes'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert cache.stats()['refreshes'] == 1
+    assert cache.shared.get(KEY)[0] == '{"user_id":"1"}'
+    assert cache.get_or_load(ENDPOINT, KEY, Loader(None)) == {'user_id': '1'}
+
+
+def test_miss_takes_a_load_that_finished_after_its_lookup(path):
+    other_process = make_cache(path)
+
+    class RacedStore(SQLiteCacheStore):
+        """The first lookup runs just before another process stores the key"""
+
+        def get(self, key):
+            entry = super().get(key)
+            if not getattr(self, 'raced', False):
+                self.raced = True
+                other_process.put(ENDPOINT, key, {'user_id': '1'})
+            return entry
+
+    cache = make_cache(path, shared=RacedStore(path))
+    loader = Loader({'user_id': '2'})
+
+    assert cache.get_or_load(ENDPOINT, KEY, loader) == {'user_id': '1'}
+    assert loader.calls == 0
+    assert cache.stats()['misses'] == 1
+    # Copied to the front tier like any shared hit
+    assert cache.get_or_load(ENDPOINT, KEY, loader) == {'user_id': '1'}
+    assert cache.stats()['front_hits'] == 1
+
+
+def test_warm_still_reloads_ahead_of_expiry(path, clock):
+    cache = make_cache(path, ttls={ENDPOINT: 100})
+    cache.put(ENDPOINT, KEY, {'user_id': '1'}, fetched_at=clock.now - 80)
+    loader = Loader({'user_id': '2'})
+
+    # Fresh for 20 more seconds, but inside the refresh-ahead window
+    assert cache.warm(ENDPOINT, KEY, loader, refresh_ahead=0.25) == {'user_id': '2'}
+    assert loader.calls == 1
@@ -0,0 +1,96 @@
+"""
+Concurrent cache misses against a slow upstream share one request
+
+Threads are released together from a barrier so their misses overlap the
+in-flight fetch, which the stub server holds open for STUB_DELAY seconds.
+"""
+import threading
+
+import pytest
+
+from utils import http_client
+from utils.api_cache import MemoryLRU, SQLiteCacheStore, TieredCache, ARCHIVE_TABLE
+
+THREADS = 16
+STUB_DELAY = 0.3
+
+
+@pytest.fixture
+def cache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    return TieredCache(shared=SQLiteCacheStore(path), front=MemoryLRU(),
+                       archive=SQLiteCacheStore(path, table=ARCHIVE_TABLE))
+
+
+def run_together(calls):
+    """Start every call at the same moment; returns results in call order"""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+    errors = []
+
+    def worker(index, call):
+        barrier.wait()
+        try:
+            results[index] = call()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index, call)) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not errors, errors
+    return results
+
+
+def rosters_loader(stub_server, league_id):
+    url = stub_server.url(f'/v1/league/{league_id}/rosters')
+    return lambda: http_client.get(url, 'league_rosters').json()
+
+
+def test_concurrent_misses_share_one_load(stub_server, cache):
+    stub_server.delay = STUB_DELAY
+    stub_server.routes['/v1/league/L1/rosters'] = b'[{"roster_id": 1, "owner_id": "u1"}]'
+    loader = rosters_loader(stub_server, 'L1')
+
+    results = run_together([lambda: cache.get_or_load('league_rosters', 'rosters:L1', loader)] * THREADS)
+
+    assert results == [[{'roster_id': 1, 'owner_id': 'u1'}]] * THREADS
+    stats = cache.stats()
+    assert stats['misses'] == THREADS
+    assert stats['loads'] == 1
+    assert stats['coalesced'] == THREADS - 1
+    assert stub_server.hits['/v1/league/L1/rosters'] == 1
+
+
+def test_misses_for_different_keys_are_not_coalesced(stub_server, cache):
+    stub_server.delay = STUB_DELAY
+    for league_id in ('L1', 'L2'):
+        stub_server.routes[f'/v1/league/{league_id}/rosters'] = b'[]'
+    calls = [
+        (lambda league_id=league_id: cache.get_or_load(
+            'league_rosters', f'rosters:{league_id}', rosters_loader(stub_server, league_id)))
+        for league_id in ('L1', 'L2') for _ in range(THREADS // 2)
+    ]
+
+    run_together(calls)
+
+    stats = cache.stats()
+    assert stats['loads'] == 2
+    assert stats['coalesced'] == THREADS - 2
+    assert stub_server.hits['/v1/league/L1/rosters'] == 1
+    assert stub_server.hits['/v1/league/L2/rosters'] == 1
+
+
+def test_cached_value_is_served_without_loading(stub_server, cache):
+    stub_server.routes['/v1/league/L1/rosters'] = b'[]'
+    loader = rosters_loader(stub_server, 'L1')
+    cache.get_or_load('league_rosters', 'rosters:L1', loader)
+
+    run_together([lambda: cache.get_or_load('league_rosters', 'rosters:L1', loader)] * THREADS)
+
+    stats = cache.stats()
+    assert stats['loads'] == 1
+    assert stats['front_hits'] == THREADS
+    assert stub_server.hits['/v1/league/L1/rosters'] == 1
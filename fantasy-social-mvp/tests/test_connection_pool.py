@@ -0,0 +1,42 @@
+"""
+One pool per database file, and its settings are fixed by whoever creates it
+"""
+import pytest
+
+from utils.connection_pool import DEFAULT_MAX_SIZE, DEFAULT_PRAGMAS, ConnectionPool
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'pool.db')
+
+
+def test_same_file_shares_a_pool(path):
+    pool = ConnectionPool.for_path(path, max_size=4)
+    assert ConnectionPool.for_path(path) is pool
+    assert ConnectionPool.for_path(path, max_size=4) is pool
+    assert pool.max_size == 4
+
+
+def test_default_size_on_first_use(path):
+    assert ConnectionPool.for_path(path).max_size == DEFAULT_MAX_SIZE
+
+
+def test_different_size_is_an_error(path):
+    ConnectionPool.for_path(path, max_size=4)
+    with pytest.raises(ValueError):
+        ConnectionPool.for_path(path, max_size=8)
+
+
+def test_different_pragmas_are_an_error(path):
+    ConnectionPool.for_path(path)
+    assert ConnectionPool.for_path(path, pragmas=DEFAULT_PRAGMAS) is ConnectionPool.for_path(path)
+    with pytest.raises(ValueError):
+        ConnectionPool.for_path(path, pragmas=dict(DEFAULT_PRAGMAS, synchronous='FULL'))
+
+
+def test_memory_database_always_has_one_connection():
+    pool = ConnectionPool.for_path(':memory:', max_size=8)
+    assert pool.max_size == 1
+    # Any size asked for maps to the one shared connection
+    assert ConnectionPool.for_path(':memory:', max_size=4) is pool
@@ -0,0 +1,136 @@
+"""
+Shared HTTP client: retries, backoff, timeouts and their metrics
+"""
+import time
+
+import pytest
+import requests
+
+from utils import http_client
+from utils.rate_limiter import TokenBucket
+
+from conftest import StubResponse
+
+PATH = '/v1/state/nfl'
+
+
+class RecordingTime:
+    """Stands in for the time module in http_client: records backoff sleeps instead of sleeping"""
+
+    def __init__(self):
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+    perf_counter = staticmethod(time.perf_counter)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = RecordingTime()
+    monkeypatch.setattr(http_client, 'time', clock)
+    monkeypatch.setattr(http_client, 'limiter', TokenBucket(rate=1000, burst=1000))
+    http_client.metrics.reset()
+    return clock
+
+
+def get(stub_server, **kwargs):
+    return http_client.get(stub_server.url(PATH), 'state', **kwargs)
+
+
+@pytest.mark.parametrize('status', [429, 500, 502, 503, 504])
+def test_retries_until_success(stub_server, clock, status):
+    stub_server.routes[PATH] = [StubResponse(status), StubResponse(status), StubResponse(body=b'{"week": 7}')]
+
+    response = get(stub_server)
+
+    assert response.status_code == 200
+    assert response.json() == {'week': 7}
+    assert stub_server.hits[PATH] == 3
+    assert len(clock.sleeps) == 2
+    stats = http_client.metrics.snapshot()['state']
+    assert (stats['requests'], stats['retries'], stats['errors']) == (1, 2, 0)
+
+
+def test_other_errors_are_not_retried(stub_server, clock):
+    response = get(stub_server)     # no route: 404
+
+    assert response.status_code == 404
+    assert stub_server.hits[PATH] == 1
+    stats = http_client.metrics.snapshot()['state']
+    # A 404 is an answer (e.g. an unknown username), not an error
+    assert (stats['retries'], stats['errors']) == (0, 0)
+
+
+def test_retry_after_is_honoured(stub_server, clock):
+    stub_server.routes[PATH] = [StubResponse(429, headers={'Retry-After': '2'}), StubResponse()]
+
+    assert get(stub_server).status_code == 200
+    assert clock.sleeps == [2.0]
+
+
+def test_retry_after_is_capped(stub_server, clock):
+    stub_server.routes[PATH] = [StubResponse(503, headers={'Retry-After': '120'}), StubResponse()]
+
+    assert get(stub_server).status_code == 200
+    assert clock.sleeps == [http_client.BACKOFF_CAP]
+
+
+def test_backoff_is_jittered_and_bounded(stub_server, clock):
+    stub_server.routes[PATH] = [StubResponse(503)]
+
+    get(stub_server, max_retries=6)
+
+    assert len(clock.sleeps) == 6
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0 <= delay <= min(http_client.BACKOFF_CAP, http_client.BACKOFF_BASE * 2 ** attempt)
+
+
+def test_gives_up_after_max_retries(stub_server, clock):
+    stub_server.routes[PATH] = [StubResponse(503)]
+
+    response = get(stub_server)
+
+    assert response.status_code == 503
+    assert stub_server.hits[PATH] == http_client.MAX_RETRIES + 1
+    stats = http_client.metrics.snapshot()['state']
+    assert (stats['requests'], stats['retries'], stats['errors']) == (1, http_client.MAX_RETRIES, 1)
+
+
+def test_read_timeout_is_retried(stub_server, clock):
+    stub_server.routes[PATH] = [StubResponse(delay=1.0), StubResponse()]
+
+    response = get(stub_server, timeout=(1, 0.2))
+
+    assert response.status_code == 200
+    stats = http_client.metrics.snapshot()['state']
+    assert (stats['retries'], stats['errors']) == (1, 0)
+
+
+def test_timeout_raises_after_max_retries(stub_server, clock):
+    stub_server.routes[PATH] = [StubResponse(delay=1.0)]
+
+    with pytest.raises(requests.Timeout):
+        get(stub_server, timeout=(1, 0.2), max_retries=1)
+
+    assert stub_server.hits[PATH] == 2
+    stats = http_client.metrics.snapshot()['state']
+    assert (stats['requests'], stats['retries'], stats['errors']) == (1, 1, 1)
+
+
+def test_streamed_retries_release_their_connections(stub_server, clock, monkeypatch):
+    closed = []
+    original_close = requests.Response.close
+
+    def close(response):
+        closed.append(response.status_code)
+        original_close(response)
+
+    monkeypatch.setattr(requests.Response, 'close', close)
+    stub_server.routes[PATH] = [StubResponse(503), StubResponse(429), StubResponse()]
+
+    with get(stub_server, stream=True) as response:
+        assert response.status_code == 200
+
+    assert closed[:2] == [503, 429]
@@ -0,0 +1,68 @@
+"""
+hydrate_leagues fetches many leagues concurrently against a slow upstream
+"""
+import json
+import time
+
+import pytest
+
+from utils import api_cache, http_client
+from utils.api_cache import MemoryLRU, SQLiteCacheStore, TieredCache, ARCHIVE_TABLE
+from utils.rate_limiter import TokenBucket
+from utils.sleeper_api import SleeperAPI
+
+LEAGUES = 12
+STUB_DELAY = 0.2
+
+
+@pytest.fixture
+def sleeper(stub_server, tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.db')
+    monkeypatch.setattr(api_cache, '_cache', TieredCache(shared=SQLiteCacheStore(path), front=MemoryLRU(),
+                                                         archive=SQLiteCacheStore(path, table=ARCHIVE_TABLE)))
+    # Keep the shared limiter out of the timing
+    monkeypatch.setattr(http_client, 'limiter', TokenBucket(rate=1000, burst=1000))
+    monkeypatch.setattr(SleeperAPI, 'BASE_URL', stub_server.url('/v1'))
+    stub_server.delay = STUB_DELAY
+    return stub_server
+
+
+def serve_league(stub_server, league_id):
+    routes = {
+        f'/v1/league/{league_id}': {'league_id': league_id, 'name': f'League {league_id}', 'status': 'in_season'},
+        f'/v1/league/{league_id}/rosters': [{'roster_id': 1, 'owner_id': 'u1'}],
+        f'/v1/league/{league_id}/users': [{'user_id': 'u1', 'display_name': 'Team 1'}],
+    }
+    for path, body in routes.items():
+        stub_server.routes[path] = json.dumps(body).encode()
+
+
+def test_leagues_hydrate_concurrently(sleeper):
+    league_ids = [f'L{index}' for index in range(LEAGUES)]
+    for league_id in league_ids:
+        serve_league(sleeper, league_id)
+
+    start = time.monotonic()
+    hydrated = SleeperAPI.hydrate_leagues(league_ids, max_workers=8)
+    elapsed = time.monotonic() - start
+
+    # 3 requests per league; one at a time this would take 3 * LEAGUES * STUB_DELAY
+    assert elapsed < LEAGUES * STUB_DELAY, elapsed
+    assert set(hydrated) == set(league_ids)
+    for league_id in league_ids:
+        assert hydrated[league_id]['league']['league_id'] == league_id
+        assert hydrated[league_id]['rosters'] == [{'roster_id': 1, 'owner_id': 'u1'}]
+        assert hydrated[league_id]['users'] == [{'user_id': 'u1', 'display_name': 'Team 1'}]
+
+
+def test_failing_league_does_not_affect_the_others(sleeper):
+    serve_league(sleeper, 'L1')
+    serve_league(sleeper, 'L2')
+    # L404 has no routes: every request for it gets a 404
+
+    hydrated = SleeperAPI.hydrate_leagues(['L1', 'L404', 'L2'])
+
+    assert hydrated['L404'] == {'league': None, 'rosters': [], 'users': []}
+    for league_id in ('L1', 'L2'):
+        assert hydrated[league_id]['league']['league_id'] == league_id
+        assert hydrated[league_id]['rosters'] == [{'roster_id': 1, 'owner_id': 'u1'}]
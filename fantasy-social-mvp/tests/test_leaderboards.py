@@ -0,0 +1,114 @@
+"""
+Incremental leaderboard job: changed, failed, departed and newly connected leagues
+"""
+import pytest
+
+from utils.database import Database
+from utils.leaderboards import LeaderboardJob
+
+SEASON = '2025'
+
+
+def roster(owner_id, wins, losses, fpts=1000):
+    return {'owner_id': owner_id, 'settings': {'wins': wins, 'losses': losses, 'fpts': fpts}}
+
+
+class FakeSleeper:
+    """League lists and rosters the job reads, editable between runs"""
+
+    def __init__(self):
+        self.leagues = {}   # sleeper user id -> [league ids]
+        self.rosters = {}   # league id -> rosters (None = fetch failed)
+
+    def get_user_leagues(self, user_id, sport, season):
+        return [{'league_id': league_id} for league_id in self.leagues.get(user_id, [])]
+
+    def get_league_rosters(self, league_id):
+        return self.rosters.get(league_id)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'leaderboards.db'))
+    db.create_user('alice', 'A', 'Alice')
+    db.create_user('bob', 'B', 'Bob')
+    return db
+
+
+@pytest.fixture
+def sleeper():
+    sleeper = FakeSleeper()
+    sleeper.leagues = {'A': ['L1', 'L2'], 'B': ['L1']}
+    sleeper.rosters = {
+        'L1': [roster('A', 5, 1), roster('B', 2, 4)],
+        'L2': [roster('A', 3, 3), roster('X', 3, 3)],
+    }
+    return sleeper
+
+
+@pytest.fixture
+def job(db, sleeper):
+    return LeaderboardJob(db, sleeper.get_user_leagues, sleeper.get_league_rosters)
+
+
+def totals(db):
+    return {row['sleeper_username']: (row['leagues'], row['wins'], row['losses'])
+            for row in db.get_leaderboard(SEASON, 'win_pct', limit=10)}
+
+
+def test_first_run_aggregates_every_league(db, job):
+    result = job.run(SEASON)
+    assert result['changed_leagues'] == 2
+    assert totals(db) == {'alice': (2, 8, 4), 'bob': (1, 2, 4)}
+
+
+def test_quiet_run_writes_nothing(db, job):
+    job.run(SEASON)
+    assert job.run(SEASON) == {'leagues': 2, 'changed_leagues': 0, 'skipped_leagues': 0,
+                               'removed_leagues': 0, 'updated_users': 0}
+
+
+@pytest.mark.parametrize('failed_fetch', [None, []])
+def test_failed_roster_fetch_keeps_the_previous_snapshot(db, sleeper, job, failed_fetch):
+    job.run(SEASON)
+    sleeper.rosters['L2'] = failed_fetch
+
+    result = job.run(SEASON)
+
+    assert result['skipped_leagues'] == 1
+    assert totals(db) == {'alice': (2, 8, 4), 'bob': (1, 2, 4)}
+
+
+def test_league_nobody_is_in_any_more_is_removed(db, sleeper, job):
+    job.run(SEASON)
+    sleeper.leagues['A'] = ['L1']
+
+    result = job.run(SEASON)
+
+    assert result['removed_leagues'] == 1
+    assert totals(db) == {'alice': (1, 5, 1), 'bob': (1, 2, 4)}
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM league_team_stats WHERE league_id = 'L2'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM league_snapshots WHERE league_id = 'L2'").fetchone()[0] == 0
+
+
+def test_empty_league_list_does_not_remove_leagues(db, sleeper, job):
+    """An empty list may be a failed fetch, so the user's leagues stay"""
+    job.run(SEASON)
+    sleeper.leagues['A'] = []
+
+    result = job.run(SEASON)
+
+    assert result['removed_leagues'] == 0
+    assert totals(db) == {'alice': (2, 8, 4), 'bob': (1, 2, 4)}
+
+
+def test_user_who_connects_after_the_snapshot_is_ranked(db, sleeper, job):
+    job.run(SEASON)
+    db.create_user('xavier', 'X', 'Xavier')
+    sleeper.leagues['X'] = ['L2']
+
+    result = job.run(SEASON)
+
+    assert result['changed_leagues'] == 0
+    assert totals(db)['xavier'] == (1, 3, 3)
@@ -0,0 +1,101 @@
+"""
+Write-behind likes: batched flushes, an idle flusher that stays asleep, and stop()
+"""
+import time
+
+import pytest
+
+from utils.database import Database
+from utils.like_buffer import LikeBuffer
+
+INTERVAL_MS = 100
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'likes.db'))
+    db.author = db.create_user('author', 'A')
+    db.post = db.create_post(db.author, 'Like this')
+    return db
+
+
+class CountingBuffer(LikeBuffer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super().flush()
+
+
+def make_buffer(db, **kwargs):
+    buffer = CountingBuffer(db.pool, **kwargs)
+    db.like_buffer = buffer
+    return buffer
+
+
+def stored_likes(db):
+    with db.connection() as conn:
+        return conn.execute('SELECT likes FROM posts WHERE id = ?', (db.post,)).fetchone()[0]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_changes_are_written_together_after_the_interval(db):
+    buffer = make_buffer(db, flush_interval_ms=INTERVAL_MS)
+    users = [db.create_user(f'fan{index}', f'F{index}') for index in range(5)]
+
+    for user_id in users:
+        assert db.like_post(db.post, user_id)
+    assert stored_likes(db) == 0
+    assert db.get_posts()[0]['likes'] == len(users)
+
+    assert wait_for(lambda: stored_likes(db) == len(users))
+    assert buffer.flushes == 1
+
+
+def test_idle_flusher_does_not_wake_up(db):
+    buffer = make_buffer(db, flush_interval_ms=INTERVAL_MS)
+    db.like_post(db.post, db.create_user('fan', 'F'))
+    assert wait_for(lambda: stored_likes(db) == 1)
+
+    time.sleep(INTERVAL_MS / 1000 * 6)
+    assert buffer.flushes == 1
+
+    db.unlike_post(db.post, db.get_user_by_sleeper_username('fan')['id'])
+    assert wait_for(lambda: stored_likes(db) == 0)
+    assert buffer.flushes == 2
+
+
+def test_stop_writes_pending_changes(db):
+    # Far longer than the test: only stop() can write the like
+    buffer = make_buffer(db, flush_interval_ms=60000)
+    fan = db.create_user('fan', 'F')
+    db.like_post(db.post, fan)
+
+    start = time.monotonic()
+    buffer.stop()
+
+    assert time.monotonic() - start < 5
+    assert stored_likes(db) == 1
+    assert not buffer._worker.is_alive()
+
+    # Nothing flushes in the background any more, so later changes are written at once
+    db.unlike_post(db.post, fan)
+    assert stored_likes(db) == 0
+    assert buffer.pending_delta(db.post) == 0
+
+
+def test_max_pending_flushes_without_waiting(db):
+    buffer = make_buffer(db, flush_interval_ms=60000, max_pending=3)
+    for index in range(3):
+        db.like_post(db.post, db.create_user(f'fan{index}', f'F{index}'))
+
+    assert stored_likes(db) == 3
+    buffer.stop()
@@ -0,0 +1,82 @@
+"""
+PlayerDirectory: same answers as the raw player dicts it replaced, in less memory
+"""
+import gc
+import json
+import tracemalloc
+
+import pytest
+
+from utils.player_directory import PlayerDirectory, PlayerRecord
+
+from conftest import FIXTURES
+
+FIELDS = PlayerRecord.__slots__
+
+
+@pytest.fixture(scope='module')
+def players() -> dict:
+    return json.loads((FIXTURES / 'players_nfl.json').read_bytes())
+
+
+@pytest.fixture(scope='module')
+def directory(players) -> PlayerDirectory:
+    return PlayerDirectory.from_payload(players)
+
+
+def test_record_get_matches_dict_get(players, directory):
+    assert len(directory) == len(players)
+    for player_id, player in players.items():
+        record = directory.get(player_id)
+        for field in FIELDS:
+            assert record.get(field) == player.get(field)
+            assert getattr(record, field) == player.get(field)
+        assert record.get('full_name') is None
+        assert record.get('full_name', 'n/a') == 'n/a'
+        assert record.to_dict() == {field: player.get(field) for field in FIELDS}
+
+
+def test_directory_lookups_match_dict_lookups(players, directory):
+    ids = list(players) + ['0', 'not-a-player']
+    assert list(directory) == list(players)
+    for player_id in ids:
+        assert (player_id in directory) == (player_id in players)
+        assert (directory.get(player_id) is None) == (players.get(player_id) is None)
+    assert directory.get('0', 'missing') == 'missing'
+    assert set(directory.lookup(ids)) == set(players)
+
+
+def test_from_rows_matches_from_payload(players, directory):
+    rows = [(player_id, *(player.get(field) for field in FIELDS)) for player_id, player in players.items()]
+    from_rows = PlayerDirectory.from_rows(rows)
+    assert {player_id: from_rows.get(player_id).to_dict() for player_id in from_rows} == \
+        {player_id: directory.get(player_id).to_dict() for player_id in directory}
+
+
+def retained(build) -> int:
+    """Bytes still allocated by build()'s result once it returns"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        del result
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def test_directory_is_smaller_than_player_dicts(players):
+    # Repeat the sample under fresh ids to get a directory of realistic size
+    samples = list(players.values())
+    payload = json.dumps({str(index): samples[index % len(samples)] for index in range(5000)})
+
+    full = retained(lambda: json.loads(payload))
+    projected = retained(lambda: {player_id: {field: player.get(field) for field in FIELDS}
+                                  for player_id, player in json.loads(payload).items()})
+    compact = retained(lambda: PlayerDirectory.from_payload(json.loads(payload)))
+
+    # ~10x below what get_all_players used to cache, and still well below dicts of just the five fields
+    assert compact < full / 5, (compact, full)
+    assert compact < projected * 0.7, (compact, projected)
@@ -0,0 +1,85 @@
+"""
+Streaming /players/nfl parsing: correctness against json.loads, and memory
+
+players_nfl.json is a small sample in the /players/nfl response shape: full
+player records, team defenses keyed by abbreviation, nulls, nested metadata,
+escapes and multi-byte UTF-8.
+"""
+import gc
+import json
+import tracemalloc
+
+import pytest
+
+from utils import http_client
+from utils.json_stream import iter_object_items
+from utils.player_store import PLAYER_FIELDS, PlayerStore
+
+from conftest import FIXTURES
+
+PLAYERS_PATH = '/v1/players/nfl'
+
+
+@pytest.fixture(scope='module')
+def payload() -> bytes:
+    return (FIXTURES / 'players_nfl.json').read_bytes()
+
+
+def chunked(data: bytes, size: int):
+    return (data[start:start + size] for start in range(0, len(data), size))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1000, 1 << 20])
+def test_iter_object_items_matches_json_loads(payload, chunk_size):
+    assert list(iter_object_items(chunked(payload, chunk_size))) == list(json.loads(payload).items())
+
+
+@pytest.mark.parametrize('document', [b'{}', b' { } ', b'{"a": -1.5e3, "b": [1, {"c": null}], "d": "\\u00e9\\""}'])
+def test_iter_object_items_small_documents(document):
+    for chunk_size in (1, 2, len(document)):
+        assert dict(iter_object_items(chunked(document, chunk_size))) == json.loads(document)
+
+
+@pytest.mark.parametrize('document', [b'[]', b'{"a": 1', b'{"a" 1}', b'{"a": 1,}'])
+def test_iter_object_items_rejects_malformed_documents(document):
+    with pytest.raises(ValueError):
+        list(iter_object_items(chunked(document, 3)))
+
+
+def test_refresh_stores_projected_fields(stub_server, payload, tmp_path):
+    stub_server.routes[PLAYERS_PATH] = payload
+    store = PlayerStore(str(tmp_path / 'players.db'))
+
+    assert store.refresh(stub_server.url(PLAYERS_PATH), force=True)
+
+    expected = json.loads(payload)
+    stored = store.lookup(expected)
+    assert set(stored) == set(expected)
+    for player_id, record in stored.items():
+        for field in PLAYER_FIELDS:
+            assert getattr(record, field) == expected[player_id].get(field)
+
+
+def traced_peak(call) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_refresh_peak_memory_is_well_below_response_json(stub_server, payload, tmp_path):
+    # Repeat the sample under fresh ids to get a directory of realistic size (~5 MB)
+    players = list(json.loads(payload).values())
+    directory = {str(index): players[index % len(players)] for index in range(5000)}
+    stub_server.routes[PLAYERS_PATH] = json.dumps(directory).encode()
+    url = stub_server.url(PLAYERS_PATH)
+    store = PlayerStore(str(tmp_path / 'players.db'))
+
+    baseline = traced_peak(lambda: http_client.get(url, 'players').json())
+    streamed = traced_peak(lambda: store.refresh(url, force=True))
+
+    assert len(store.lookup(directory)) == len(directory)
+    assert streamed < baseline / 4, (streamed, baseline)
@@ -0,0 +1,56 @@
+"""
+Prefetch cycles refresh everything that would expire before the next cycle
+"""
+import time
+
+import pytest
+
+from utils import api_cache, prefetch
+from utils.api_cache import ENDPOINT_TTLS, MemoryLRU, SQLiteCacheStore, TieredCache, ARCHIVE_TABLE
+from utils.prefetch import PREFETCH_SLACK, PrefetchScheduler, RequestBudget
+from utils.sleeper_api import SleeperAPI
+
+ROSTERS_PATH = '/league/L1/rosters'
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.db')
+    cache = TieredCache(shared=SQLiteCacheStore(path), front=MemoryLRU(),
+                        archive=SQLiteCacheStore(path, table=ARCHIVE_TABLE))
+    monkeypatch.setattr(api_cache, '_cache', cache)
+    return cache
+
+
+@pytest.mark.parametrize('endpoint', sorted(ENDPOINT_TTLS))
+@pytest.mark.parametrize('interval', [prefetch.PREFETCH_INTERVAL, prefetch.GAME_DAY_PREFETCH_INTERVAL])
+def test_refresh_window_covers_the_cycle_interval(endpoint, interval):
+    ttl = ENDPOINT_TTLS[endpoint]
+    budget = RequestBudget(1, horizon=interval + PREFETCH_SLACK)
+    assert ttl * budget.refresh_ahead(ttl) >= interval
+
+
+def test_run_once_sets_the_horizon_from_the_interval():
+    budgets = []
+    scheduler = PrefetchScheduler(lambda user_id, budget: budgets.append(budget),
+                                  interval=240, game_day_interval=240)
+    scheduler.track('u1')
+
+    scheduler.run_once()
+
+    assert budgets[0].horizon >= 240 + PREFETCH_SLACK
+
+
+@pytest.mark.parametrize('age, reloaded', [(100, True), (10, False)])
+def test_warm_reloads_entries_expiring_before_the_next_cycle(stub_server, cache, monkeypatch, age, reloaded):
+    monkeypatch.setattr(SleeperAPI, 'BASE_URL', stub_server.url('/v1'))
+    stub_server.routes['/v1' + ROSTERS_PATH] = b'[{"roster_id": 1}]'
+    # A 300s roster entry with 200s left would have been skipped under a fixed
+    # refresh_ahead of 0.25, then expired before a cycle 240s later
+    cache.put('league_rosters', ROSTERS_PATH, [], fetched_at=time.time() - age)
+    budget = RequestBudget(10, horizon=prefetch.PREFETCH_INTERVAL + PREFETCH_SLACK)
+
+    SleeperAPI._warm_json(ROSTERS_PATH, 'league_rosters', budget)
+
+    assert stub_server.hits['/v1' + ROSTERS_PATH] == (1 if reloaded else 0)
+    assert budget.spent == (1 if reloaded else 0)
@@ -0,0 +1,202 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot read paths
+
+Each test calls the real Database method, records every statement it runs,
+and asserts that SQLite answers each one from an index: every table access is
+a SEARCH or SCAN using an index or primary key, and nothing is sorted in a
+temp B-tree.
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from utils import database
+from utils.database import Database, LEADERBOARD_ORDERINGS
+
+
+class RecordingConnection:
+    """Wraps a pooled connection and records (sql, params) for each execute()"""
+
+    def __init__(self, conn, statements):
+        self._conn = conn
+        self._statements = statements
+
+    def execute(self, sql, params=()):
+        self._statements.append((sql, params))
+        return self._conn.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+@contextmanager
+def recorded_queries(db: Database):
+    statements = []
+    original = db.connection
+
+    @contextmanager
+    def connection():
+        with original() as conn:
+            yield RecordingConnection(conn, statements)
+
+    db.connection = connection
+    try:
+        yield statements
+    finally:
+        db.connection = original
+
+
+def query_plan(db: Database, sql: str, params) -> list:
+    with db.connection() as conn:
+        return [row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def assert_indexed(db: Database, call):
+    """Run call() and check the plan of every SELECT it issues"""
+    with recorded_queries(db) as statements:
+        call()
+    selects = [(sql, params) for sql, params in statements if sql.lstrip().upper().startswith('SELECT')]
+    assert selects, "no queries were recorded"
+
+    for sql, params in selects:
+        plan = query_plan(db, sql, params)
+        assert not [step for step in plan if 'TEMP B-TREE' in step], (sql, plan)
+        table_steps = [step for step in plan if step.startswith(('SEARCH', 'SCAN'))
+                       and 'subquery' not in step and 'CONSTANT ROW' not in step]
+        assert table_steps, (sql, plan)
+        for step in table_steps:
+            assert 'INDEX' in step or 'PRIMARY KEY' in step, (sql, plan)
+        assert any(step.startswith('SEARCH') for step in table_steps), (sql, plan)
+
+
+def populate(db: Database, users: int = 30, posts_per_user: int = 10):
+    ids = [db.create_user(f"user{i}", f"sleeper{i}", f"User {i}") for i in range(users)]
+    for index, follower in enumerate(ids):
+        for following in ids[index + 1:index + 6]:
+            db.follow_user(follower, following)
+    post_ids = []
+    for round_ in range(posts_per_user):
+        for index, author in enumerate(ids):
+            visibility = 'private' if (round_ + index) % 3 == 0 else 'public'
+            post_ids.append(db.create_post(author, f"post {round_} by {author}", visibility=visibility))
+    for post_id in post_ids[::4]:
+        db.add_comment(post_id, ids[0], "nice")
+    with db.connection() as conn:
+        conn.executemany('''
+            INSERT INTO leaderboard (season, user_id, leagues, wins, losses, win_pct, points_for, points_against)
+            VALUES ('2025', ?, 1, ?, ?, ?, ?, ?)
+        ''', [(user_id, user_id % 7, 7 - user_id % 7, (user_id % 7) / 7, 1000 + user_id, 900 + user_id)
+              for user_id in ids])
+    return ids, post_ids
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "plans.db"))
+    db.ids, db.post_ids = populate(db)
+    return db
+
+
+@pytest.fixture
+def small_fanout_db(tmp_path):
+    # Everyone with more than 2 followers is merged in at read time
+    db = Database(str(tmp_path / "timelines.db"), fanout_follower_limit=2)
+    db.ids, db.post_ids = populate(db)
+    return db
+
+
+def first_and_next_page(fetch):
+    """Fetch page 1, then page 2 from its cursor (both shapes of the keyset query)"""
+    def call():
+        _, cursor = fetch(None)
+        assert cursor
+        fetch(cursor)
+    return call
+
+
+def test_public_feed_uses_indexes(db):
+    viewer = db.ids[3]
+    assert_indexed(db, first_and_next_page(
+        lambda cursor: db.get_feed_page(viewer, 'public', cursor=cursor, page_size=5)))
+
+
+def test_private_feed_without_timelines_uses_indexes(tmp_path):
+    db = Database(str(tmp_path / "private.db"), use_timelines=False)
+    ids, _ = populate(db)
+    assert_indexed(db, first_and_next_page(
+        lambda cursor: db.get_feed_page(ids[3], 'private', cursor=cursor, page_size=5)))
+
+
+@pytest.mark.parametrize('max_merged_authors', [database.TIMELINE_MAX_MERGED_AUTHORS, 0])
+def test_timeline_feed_uses_indexes(small_fanout_db, monkeypatch, max_merged_authors):
+    monkeypatch.setattr(database, 'TIMELINE_MAX_MERGED_AUTHORS', max_merged_authors)
+    db = small_fanout_db
+    viewer = db.ids[3]
+    # The viewer follows authors on both sides of the fan-out limit
+    assert_indexed(db, first_and_next_page(
+        lambda cursor: db.get_feed_page(viewer, 'private', cursor=cursor, page_size=5)))
+
+
+def test_profile_posts_use_indexes(db):
+    author = db.ids[5]
+    assert_indexed(db, first_and_next_page(
+        lambda cursor: db.get_posts_page(user_id=author, cursor=cursor, page_size=3)))
+
+
+def test_all_posts_use_indexes(db):
+    assert_indexed(db, first_and_next_page(
+        lambda cursor: db.get_posts_page(cursor=cursor, page_size=5)))
+
+
+def test_comment_counts_use_indexes(db):
+    assert_indexed(db, lambda: db.get_comment_counts(db.post_ids[:20]))
+
+
+def test_most_active_users_use_indexes(db):
+    assert_indexed(db, lambda: db.get_most_active_users(limit=10))
+
+
+@pytest.mark.parametrize('metric', sorted(LEADERBOARD_ORDERINGS))
+def test_leaderboards_use_indexes(db, metric):
+    assert_indexed(db, lambda: db.get_leaderboard('2025', metric, limit=10))
+
+
+def all_pages(db: Database, viewer: int, mode: str) -> list:
+    post_ids, cursor = [], None
+    while True:
+        page, cursor = db.get_feed_page(viewer, mode, cursor=cursor, page_size=7)
+        post_ids.extend(post['id'] for post in page)
+        if not cursor:
+            return post_ids
+
+
+def test_feed_pages_match_an_unindexed_query(db):
+    """The index-driven pages return the same posts, in the same order, as a plain filter"""
+    viewer = db.ids[3]
+    pages = all_pages(db, viewer, 'public')
+    with db.connection() as conn:
+        expected = [row[0] for row in conn.execute('''
+            SELECT p.id FROM posts p
+            WHERE p.visibility = 'public'
+               OR p.user_id = ?1
+               OR p.user_id IN (SELECT following_id FROM follows WHERE follower_id = ?1)
+            ORDER BY p.created_at DESC, p.id DESC
+        ''', (viewer,))]
+    assert pages == expected
+
+
+@pytest.mark.parametrize('max_merged_authors', [database.TIMELINE_MAX_MERGED_AUTHORS, 0])
+def test_timeline_pages_match_an_unindexed_query(small_fanout_db, monkeypatch, max_merged_authors):
+    """Fanned-out and read-time authors merge into one feed with no gaps or repeats"""
+    monkeypatch.setattr(database, 'TIMELINE_MAX_MERGED_AUTHORS', max_merged_authors)
+    db = small_fanout_db
+    viewer = db.ids[3]
+    pages = all_pages(db, viewer, 'private')
+    with db.connection() as conn:
+        expected = [row[0] for row in conn.execute('''
+            SELECT p.id FROM posts p
+            WHERE p.user_id = ?1
+               OR p.user_id IN (SELECT following_id FROM follows WHERE follower_id = ?1)
+            ORDER BY p.created_at DESC, p.id DESC
+        ''', (viewer,))]
+    assert expected and pages == expected
@@ -0,0 +1,121 @@
+"""
+Rate limiter lanes: background work that an interactive caller joins is promoted
+"""
+import threading
+import time
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import BACKGROUND, INTERACTIVE, Promotion, TokenBucket
+from utils.single_flight import SingleFlight
+
+RATE = 20   # tokens per second
+
+
+@pytest.fixture
+def bucket():
+    bucket = TokenBucket(rate=RATE, burst=1)
+    assert bucket.acquire()     # start empty
+    return bucket
+
+
+@pytest.fixture
+def interactive_traffic(bucket):
+    """A steady stream of page loads that keeps the interactive queue non-empty"""
+    stop = threading.Event()
+
+    def page_loads():
+        while not stop.is_set():
+            bucket.acquire(INTERACTIVE, timeout=1)
+
+    threads = [threading.Thread(target=page_loads, daemon=True) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    yield
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+def in_background(target):
+    done = threading.Event()
+
+    def run():
+        with rate_limiter.lane(BACKGROUND):
+            target()
+        done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return done
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_background_waits_while_interactive_queue_is_busy(bucket, interactive_traffic):
+    done = in_background(lambda: bucket.acquire())
+    assert not done.wait(0.5)
+    assert bucket.queue_depth()[BACKGROUND] == 1
+
+
+def test_promotion_moves_a_queued_request_to_the_interactive_lane(bucket, interactive_traffic):
+    promotion = Promotion()
+
+    def request():
+        with rate_limiter.promotable(promotion):
+            bucket.acquire()
+
+    done = in_background(request)
+    wait_until(lambda: bucket.queue_depth()[BACKGROUND] == 1)
+
+    assert promotion.promote()
+    assert not promotion.promote()
+    # Behind at most the three page loads already queued
+    assert done.wait(4 / RATE + 0.5)
+    assert bucket.snapshot()[BACKGROUND]['promoted'] == 1
+
+
+def test_requests_after_promotion_start_interactive(bucket):
+    promotion = Promotion()
+    promotion.promote()
+    with rate_limiter.lane(BACKGROUND), rate_limiter.promotable(promotion):
+        bucket.acquire()
+    stats = bucket.snapshot()
+    assert stats[BACKGROUND]['acquired'] == 0
+    assert stats[INTERACTIVE]['acquired'] == 2
+
+
+def test_interactive_caller_joining_a_background_flight_promotes_it(bucket, interactive_traffic):
+    flight = SingleFlight()
+    result = {}
+
+    def refresh():
+        result['background'] = flight.do('rosters:L1', lambda: bucket.acquire() and 'rosters')
+
+    in_background(refresh)
+    wait_until(lambda: bucket.queue_depth()[BACKGROUND] == 1)
+
+    start = time.monotonic()
+    assert flight.do('rosters:L1', lambda: pytest.fail("joined caller must not run its own call")) == 'rosters'
+    assert time.monotonic() - start < 4 / RATE + 0.5
+    wait_until(lambda: 'background' in result)
+    assert flight.stats() == {'calls': 1, 'coalesced': 1, 'promoted': 1}
+
+
+def test_background_caller_joining_does_not_promote(bucket):
+    flight = SingleFlight()
+    release = threading.Event()
+    in_background(lambda: flight.do('key', release.wait))
+    wait_until(lambda: flight.in_flight() == 1)
+
+    joined = in_background(lambda: flight.do('key', lambda: None))
+    wait_until(lambda: flight.stats()['coalesced'] == 1)
+    release.set()
+
+    assert joined.wait(2)
+    assert flight.stats()['promoted'] == 0
@@ -0,0 +1,80 @@
+"""
+Roster lookups follow the API cache, and name resolution is memoized per roster version
+"""
+import pytest
+
+from utils import api_cache, roster_index
+from utils.api_cache import MemoryLRU, SQLiteCacheStore, TieredCache, ARCHIVE_TABLE
+from utils.player_directory import PlayerRecord
+from utils.roster_index import resolve_league
+from utils.sleeper_api import SleeperAPI
+
+PLAYERS = {
+    '4046': PlayerRecord('Jordan', 'Example', 'QB', 'KC', None),
+    '6794': PlayerRecord('Casey', 'Sample', 'WR', 'MIN', 'Questionable'),
+}
+
+
+def rosters(*players):
+    return [{'roster_id': 1, 'owner_id': 'u1', 'players': list(players), 'starters': list(players[:1])},
+            {'roster_id': 2, 'owner_id': 'u2', 'players': [], 'starters': []}]
+
+
+class Lookup:
+    def __init__(self, players):
+        self.players = players
+        self.calls = 0
+
+    def __call__(self, player_ids):
+        self.calls += 1
+        return {player_id: self.players[player_id] for player_id in player_ids if player_id in self.players}
+
+
+@pytest.fixture(autouse=True)
+def empty_resolution_cache(monkeypatch):
+    monkeypatch.setattr(roster_index, '_resolved', type(roster_index._resolved)())
+
+
+def names(roster):
+    return [detail['name'] for detail in roster.get('player_details', [])]
+
+
+def test_resolution_is_reused_while_rosters_are_unchanged():
+    lookup = Lookup(PLAYERS)
+    first = resolve_league('L1', rosters('4046'), lookup)
+    second = resolve_league('L1', rosters('4046'), lookup)
+    assert second is first
+    assert lookup.calls == 1
+    assert names(first[1]) == ['Jordan Example']
+
+
+def test_changed_rosters_are_resolved_again():
+    lookup = Lookup(PLAYERS)
+    resolve_league('L1', rosters('4046'), lookup)
+    resolved = resolve_league('L1', rosters('4046', '6794'), lookup)
+    assert lookup.calls == 2
+    assert names(resolved[1]) == ['Jordan Example', 'Casey Sample']
+
+
+def test_failed_player_lookup_is_not_cached():
+    resolved = resolve_league('L1', rosters('4046'), Lookup({}))
+    assert names(resolved[1]) == []
+
+    retried = resolve_league('L1', rosters('4046'), Lookup(PLAYERS))
+    assert names(retried[1]) == ['Jordan Example']
+
+
+def test_roster_lookups_see_a_cache_refresh_immediately(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.db')
+    cache = TieredCache(shared=SQLiteCacheStore(path), front=MemoryLRU(),
+                        archive=SQLiteCacheStore(path, table=ARCHIVE_TABLE))
+    monkeypatch.setattr(api_cache, '_cache', cache)
+    monkeypatch.setattr(SleeperAPI, 'lookup_players', staticmethod(Lookup(PLAYERS)))
+
+    cache.put('league_rosters', '/league/L1/rosters', rosters('4046'))
+    assert names(SleeperAPI.get_user_roster_with_names('u1', 'L1')) == ['Jordan Example']
+
+    # A background refresh lands new rosters in the API cache
+    cache.put('league_rosters', '/league/L1/rosters', rosters('6794'))
+    assert SleeperAPI.get_user_roster_in_league('u1', 'L1')['players'] == ['6794']
+    assert names(SleeperAPI.get_user_roster_with_names('u1', 'L1')) == ['Casey Sample']
@@ -0,0 +1,100 @@
+"""
+Post search: relevance order, (score, id) paging, visibility and the candidate cap
+"""
+import pytest
+
+from utils import database
+from utils.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'search.db'))
+    db.viewer = db.create_user('viewer', 'V')
+    db.friend = db.create_user('friend', 'F')
+    db.stranger = db.create_user('stranger', 'S')
+    db.follow_user(db.viewer, db.friend)
+    return db
+
+
+def search_all(db, query, viewer_id, page_size):
+    """Every page of a search, following the cursors"""
+    posts, cursor = db.search_posts(query, viewer_id, page_size=page_size)
+    pages = [posts]
+    while cursor:
+        posts, cursor = db.search_posts(query, viewer_id, cursor=cursor, page_size=page_size)
+        pages.append(posts)
+    return pages
+
+
+def ids(posts):
+    return [post['id'] for post in posts]
+
+
+def test_best_matches_come_first(db):
+    passing = db.create_post(db.friend, 'Waiver wire thoughts and a long note about nothing in particular')
+    player = db.create_post(db.friend, 'Who do I start?', metadata={'players': [{'name': 'Waiver Hopeful'}]})
+    repeated = db.create_post(db.friend, 'Waiver waiver waiver')
+    db.create_post(db.friend, 'Trade talk only')
+
+    posts, cursor = db.search_posts('waiver', db.viewer)
+
+    assert cursor is None
+    assert set(ids(posts)) == {passing, player, repeated}
+    assert ids(posts)[-1] == passing
+    scores = [post['score'] for post in posts]
+    assert scores == sorted(scores)
+
+
+def test_last_word_matches_as_a_prefix(db):
+    post = db.create_post(db.friend, 'Quarterback controversy')
+    assert ids(db.search_posts('quarterb', db.viewer)[0]) == [post]
+    assert ids(db.search_posts('controversy quar', db.viewer)[0]) == [post]
+    # Too short to expand as a prefix
+    assert db.search_posts('qu', db.viewer)[0] == []
+
+
+@pytest.mark.parametrize('page_size', [1, 3, 4, 50])
+def test_pages_walk_every_match_once_in_score_then_id_order(db, page_size):
+    # Equal scores exercise the id tiebreak in the cursor
+    for index in range(10):
+        db.create_post(db.friend, 'Sleeper pick of the week')
+        db.create_post(db.friend, 'Sleeper sleeper pick' if index % 2 else f'Deep {index} sleeper pick with more words')
+
+    pages = search_all(db, 'sleeper', db.viewer, page_size)
+    walked = [post for page in pages for post in page]
+
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert len(walked) == 20
+    assert [(post['score'], post['id']) for post in walked] == sorted((post['score'], post['id']) for post in walked)
+    assert ids(walked) == ids(db.search_posts('sleeper', db.viewer, page_size=100)[0])
+
+
+def test_private_posts_follow_feed_visibility(db):
+    public = db.create_post(db.stranger, 'Bye week blues', visibility='public')
+    hidden = db.create_post(db.stranger, 'Bye week secret', visibility='private')
+    friends = db.create_post(db.friend, 'Bye week plan', visibility='private')
+    own = db.create_post(db.viewer, 'Bye week notes', visibility='private')
+
+    assert set(ids(db.search_posts('bye week', db.viewer)[0])) == {public, friends, own}
+    assert set(ids(db.search_posts('bye week', db.stranger)[0])) == {public, hidden}
+
+    db.unfollow_user(db.viewer, db.friend)
+    assert set(ids(db.search_posts('bye week', db.viewer)[0])) == {public, own}
+
+
+def test_hidden_posts_do_not_use_up_the_candidate_cap(db, monkeypatch):
+    monkeypatch.setattr(database, 'SEARCH_MAX_CANDIDATES', 3)
+    visible = [db.create_post(db.stranger, 'Injury update', visibility='public') for _ in range(2)]
+    # Newer than every visible match, and more of them than the cap
+    for _ in range(5):
+        db.create_post(db.stranger, 'Injury update', visibility='private')
+
+    assert set(ids(db.search_posts('injury', db.viewer)[0])) == set(visible)
+
+
+def test_only_the_newest_visible_matches_are_ranked(db, monkeypatch):
+    monkeypatch.setattr(database, 'SEARCH_MAX_CANDIDATES', 3)
+    posts = [db.create_post(db.friend, 'Trade deadline') for _ in range(5)]
+
+    assert set(ids(db.search_posts('trade', db.viewer)[0])) == set(posts[-3:])
@@ -0,0 +1,91 @@
+"""
+User search: every page of the merged result groups against a brute-force match
+"""
+import pytest
+
+from utils import migrations
+from utils.database import TRIGRAM_LENGTH, Database
+
+USERS = [
+    ('TheDude', 'Big Lebowski'),
+    ('thedog', 'Dog Days'),
+    ('DudeMan', 'the dude abides'),
+    ('dudley', 'Dudley Do-Right'),
+    ('anchorman', 'Ron B'),
+    ('Annie', 'Dudette'),
+    ('bobby', 'THE BOSS'),
+    ('zed', 'Zed Dude'),
+    ('theodore', None),
+    ('xander', 'Alex'),
+    ('DUDE99', 'dude'),
+    ('mo', 'Mo Money'),
+]
+
+QUERIES = ['', 'd', 'D', 'du', 'dud', 'DUDE', ' dude ', 'the', 'THE', 'ude', 'an', 'Do-R', 'mo', 'zzz']
+
+
+@pytest.fixture(params=[True, False], ids=['trigram', 'prefix-only'])
+def db(request, tmp_path, monkeypatch):
+    if not request.param:
+        # As on a SQLite without the trigram tokenizer
+        monkeypatch.setattr(migrations, 'TRIGRAM_MIN_SQLITE_VERSION', (999,))
+    db = Database(str(tmp_path / 'users.db'))
+    assert db.user_trigram_search is request.param
+    db.viewer = db.create_user('viewer_dude', 'V', 'Viewer Dude')
+    for index, (username, display_name) in enumerate(USERS):
+        user_id = db.create_user(username, f'S{index}')
+        db.update_user(user_id, display_name=display_name)
+    return db
+
+
+def brute_force(db, query):
+    """The ids search_users should return, in order"""
+    with db.connection() as conn:
+        users = [dict(row) for row in conn.execute('SELECT * FROM users WHERE id != ?', (db.viewer,))]
+    term = query.strip().lower()
+    if not term:
+        return sorted((user['id'] for user in users), reverse=True)
+
+    def lower(value):
+        return (value or '').lower()
+
+    first = sorted((user for user in users if lower(user['sleeper_username']).startswith(term)),
+                   key=lambda user: (lower(user['sleeper_username']), user['id']))
+    rest = [user for user in users if user not in first]
+    if len(term) >= TRIGRAM_LENGTH and db.user_trigram_search:
+        then = sorted((user for user in rest
+                       if term in lower(user['sleeper_username']) or term in lower(user['display_name'])),
+                      key=lambda user: user['id'], reverse=True)
+    else:
+        then = sorted((user for user in rest if user['display_name'] and lower(user['display_name']).startswith(term)),
+                      key=lambda user: (lower(user['display_name']), user['id']))
+    return [user['id'] for user in first + then]
+
+
+def search_all(db, query, page_size):
+    users, cursor = db.search_users(query, db.viewer, page_size=page_size)
+    pages = [users]
+    while cursor:
+        users, cursor = db.search_users(query, db.viewer, cursor=cursor, page_size=page_size)
+        pages.append(users)
+    return pages
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 50])
+@pytest.mark.parametrize('query', QUERIES)
+def test_pages_match_brute_force(db, query, page_size):
+    pages = search_all(db, query, page_size)
+
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert [user['id'] for page in pages for user in page] == brute_force(db, query)
+
+
+def test_results_carry_counts_and_follow_state(db):
+    dude = db.get_user_by_sleeper_username('TheDude')['id']
+    db.follow_user(db.viewer, dude)
+
+    users, _ = db.search_users('thedude', db.viewer)
+
+    assert [user['id'] for user in users] == [dude]
+    assert users[0]['is_following'] is True
+    assert (users[0]['followers'], users[0]['following'], users[0]['posts']) == (1, 0, 0)
@@ -0,0 +1,95 @@
+"""
+Private feeds as an author crosses the fan-out follower limit in both directions
+"""
+import pytest
+
+from utils import database
+from utils.database import Database
+
+FANOUT_LIMIT = 2
+BACKFILL = 3
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'TIMELINE_BACKFILL_POSTS', BACKFILL)
+    db = Database(str(tmp_path / 'timelines.db'), fanout_follower_limit=FANOUT_LIMIT)
+    db.author = db.create_user('author', 'A')
+    db.followers = [db.create_user(f'fan{index}', f'F{index}') for index in range(FANOUT_LIMIT + 1)]
+    return db
+
+
+def feed(db, user_id, page_size=100):
+    return [post['id'] for post in db.get_feed_page(user_id, view_mode='private', page_size=page_size)[0]]
+
+
+def expected_feed(db, user_id):
+    """The private feed resolved from follows, newest first"""
+    with db.connection() as conn:
+        return [row[0] for row in conn.execute('''
+            SELECT id FROM posts
+            WHERE user_id = ? OR user_id IN (SELECT following_id FROM follows WHERE follower_id = ?)
+            ORDER BY created_at DESC, id DESC
+        ''', (user_id, user_id))]
+
+
+def timeline_posts(db, user_id):
+    with db.connection() as conn:
+        return {row[0] for row in conn.execute(
+            'SELECT post_id FROM timeline WHERE user_id = ? AND author_id = ?', (user_id, db.author))}
+
+
+def posts(db, count):
+    return [db.create_post(db.author, f'Post {index}', visibility='private') for index in range(count)]
+
+
+def test_author_crossing_the_limit_and_back(db):
+    *regulars, extra = db.followers
+    for follower in regulars:
+        db.follow_user(follower, db.author)
+    fanned_out = posts(db, 2)
+
+    # Over the limit: new posts stay out of timelines and are merged in at read time
+    db.follow_user(extra, db.author)
+    merged = posts(db, 6)
+    for follower in db.followers:
+        assert feed(db, follower) == expected_feed(db, follower)
+        assert timeline_posts(db, follower) == (set(fanned_out) if follower != extra else set())
+
+    # Back at the limit: followers get the newest posts written in between, and no more
+    db.unfollow_user(extra, db.author)
+    for follower in regulars:
+        assert timeline_posts(db, follower) == set(fanned_out) | set(merged[-BACKFILL:])
+        assert feed(db, follower, page_size=BACKFILL) == expected_feed(db, follower)[:BACKFILL]
+    assert timeline_posts(db, extra) == set()
+    assert feed(db, extra) == expected_feed(db, extra) == []
+
+    # New posts fan out on write again
+    latest = db.create_post(db.author, 'Back to fan-out', visibility='private')
+    for follower in regulars:
+        assert latest in timeline_posts(db, follower)
+        assert feed(db, follower, page_size=1) == [latest]
+
+    # A rebuild restores the older posts the backfill left out
+    db.rebuild_timelines()
+    for follower in regulars:
+        assert feed(db, follower) == expected_feed(db, follower)
+
+    # Over the limit again: reads merge the author back in for everyone
+    db.follow_user(extra, db.author)
+    posts(db, 2)
+    for follower in db.followers:
+        assert feed(db, follower) == expected_feed(db, follower)
+
+
+def test_backfill_covers_everything_for_a_small_author(db):
+    *regulars, extra = db.followers
+    for follower in db.followers:
+        db.follow_user(follower, db.author)
+    written = posts(db, BACKFILL - 1)
+
+    db.unfollow_user(extra, db.author)
+
+    for follower in regulars:
+        assert timeline_posts(db, follower) == set(written)
+        assert feed(db, follower) == expected_feed(db, follower)
@@ -0,0 +1,496 @@
+"""
+Shared response cache for Sleeper API calls
+
+st.cache_data is per process, so every Streamlit replica on a host used to
+fetch and hold its own copy of every league, roster and user list. Responses
+now go through two tiers: a size-bounded in-process LRU in front of a SQLite
+file shared by every process on the host. SQLite's file locking (WAL plus a
+busy timeout) makes concurrent writes from different processes safe, so N
+workers share one warm cache and hit the upstream API once per TTL.
+
+Values are kept as JSON text and decoded on every read, so each caller gets
+its own copy and can't mutate a cached response (same as st.cache_data).
+
+Responses that can never change again (a finished season's leagues, rosters
+and users) go to a separate archive table with no TTL and are never pruned.
+
+A lookup that finds nothing (a 404 for an unknown username, or an upstream
+failure) is remembered for NEGATIVE_TTL seconds, so a page that reruns
+doesn't ask upstream again on every rerun.
+"""
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from utils import rate_limiter
+from utils.connection_pool import ConnectionPool
+from utils.single_flight import SingleFlight
+
+DEFAULT_CACHE_PATH = "sleeper_cache.db"
+CACHE_TABLE = "api_cache"
+ARCHIVE_TABLE = "api_archive"
+DEFAULT_TTL = 300           # seconds
+FRONT_MAX_BYTES = 32 * 1024 * 1024
+MAX_ENTRY_AGE = 24 * 3600   # shared entries older than this are pruned
+PRUNE_INTERVAL = 600
+PERMANENT = float('inf')    # fetched_at of archived entries in the front tier: always fresh
+NEGATIVE_TTL = 30           # seconds a None loader result is cached
+MISSING = 'null'            # stored text of a None loader result
+REFRESH_WORKERS = 4
+
+# Seconds a response stays fresh, by endpoint (metrics bucket name)
+ENDPOINT_TTLS = {
+    'user': 3600,
+    'user_leagues': 300,
+    'league': 600,
+    'league_rosters': 300,
+    'league_users': 600,
+    'state': 3600,
+}
+
+# Seconds past its TTL that an entry may still be served while a background
+# refresh runs (stale-while-revalidate). Past this the caller waits for a
+# live fetch. 0 turns stale serving off for an endpoint.
+ENDPOINT_MAX_STALENESS = {
+    'user': 6 * 3600,
+    'user_leagues': 3600,
+    'league': 3600,
+    'league_rosters': 1800,
+    'league_users': 3600,
+    'state': 6 * 3600,
+}
+
+# (JSON text, unix time it was fetched)
+Entry = Tuple[str, float]
+
+
+class CacheBackend(ABC):
+    """One tier of the response cache"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Entry]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, endpoint: str, text: str, fetched_at: float):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def prune(self, older_than: float):
+        """Drop entries fetched before older_than (unix time)"""
+
+
+class MemoryLRU(CacheBackend):
+    """In-process LRU bounded by the total size of the cached JSON text"""
+
+    def __init__(self, max_bytes: int = FRONT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Entry]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, endpoint: str, text: str, fetched_at: float):
+        with self._lock:
+            self._discard(key)
+            # A single response bigger than the whole tier only lives in the shared store
+            if len(text) > self.max_bytes:
+                return
+            self._entries[key] = (text, fetched_at)
+            self._size += len(text)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    def prune(self, older_than: float):
+        with self._lock:
+            for key in [key for key, (_, fetched_at) in self._entries.items() if fetched_at < older_than]:
+                self._discard(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
+class SQLiteCacheStore(CacheBackend):
+    """Cache tier in a SQLite file shared by every process on the host"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, table: str = CACHE_TABLE):
+        self.db_path = db_path
+        self.table = table
+        self.pool = ConnectionPool.for_path(db_path)
+        with self.pool.connection() as conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_fetched_at ON {table}(fetched_at)')
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self.pool.connection() as conn:
+            row = conn.execute(f'SELECT value, fetched_at FROM {self.table} WHERE key = ?', (key,)).fetchone()
+        return (row['value'], row['fetched_at']) if row else None
+
+    def has(self, key: str) -> bool:
+        with self.pool.connection() as conn:
+            return conn.execute(f'SELECT 1 FROM {self.table} WHERE key = ?', (key,)).fetchone() is not None
+
+    def set(self, key: str, endpoint: str, text: str, fetched_at: float):
+        with self.pool.connection() as conn:
+            # A slower process finishing an older fetch must not overwrite a newer one
+            conn.execute(f'''
+                INSERT INTO {self.table} (key, endpoint, value, fetched_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    endpoint = excluded.endpoint,
+                    value = excluded.value,
+                    fetched_at = excluded.fetched_at
+                WHERE excluded.fetched_at >= {self.table}.fetched_at
+            ''', (key, endpoint, text, fetched_at))
+
+    def delete(self, key: str):
+        with self.pool.connection() as conn:
+            conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def prune(self, older_than: float):
+        with self.pool.connection() as conn:
+            conn.execute(f'DELETE FROM {self.table} WHERE fetched_at < ?', (older_than,))
+
+
+class TieredCache:
+    """
+    Front LRU over a shared store, with per-endpoint TTLs
+
+    A read checks the front tier, then the shared store (copying a fresh
+    shared entry to the front), and only calls the loader when neither has a
+    fresh copy. An expired entry still within the endpoint's max staleness is
+    returned straight away and refreshed on a background worker, so only a
+    cold or too-stale key makes the caller wait on upstream. A loader result
+    of None is cached for NEGATIVE_TTL (capped at the endpoint's TTL) and is
+    never served stale; a None from a refresh leaves the previous value alone.
+
+    Loads are single-flight per key: concurrent misses (and a background
+    refresh racing them) share one loader call and its result. A miss that
+    joins a background refresh moves it to the interactive rate limiter lane.
+
+    The archive tier holds permanent entries (see get_permanent); they are
+    copied to the front tier as always-fresh and are never pruned.
+    """
+
+    def __init__(self, shared: CacheBackend = None, front: CacheBackend = None,
+                 ttls: Dict[str, int] = None, default_ttl: int = DEFAULT_TTL,
+                 max_staleness: Dict[str, int] = None, refresh_workers: int = REFRESH_WORKERS,
+                 archive: CacheBackend = None):
+        self.shared = shared if shared is not None else SQLiteCacheStore()
+        self.front = front if front is not None else MemoryLRU()
+        self.archive = archive if archive is not None else SQLiteCacheStore(
+            getattr(self.shared, 'db_path', DEFAULT_CACHE_PATH), table=ARCHIVE_TABLE
+        )
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_staleness_by_endpoint = dict(ENDPOINT_MAX_STALENESS if max_staleness is None else max_staleness)
+        self.refresh_workers = refresh_workers
+        self._stats = {
+            'front_hits': 0,
+            'shared_hits': 0,
+            'archive_hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'warm_hits': 0,
+            'prefetch_loads': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'total_staleness': 0.0,
+            'max_staleness': 0.0,
+            'total_refresh_latency': 0.0,
+            'max_refresh_latency': 0.0,
+        }
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+        self._flight = SingleFlight()
+        self._warmed: Dict[str, float] = {}
+        self._last_prune = time.time()
+
+    def ttl(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def max_staleness(self, endpoint: str) -> int:
+        return self.max_staleness_by_endpoint.get(endpoint, 0)
+
+    def _entry_ttl(self, endpoint: str, entry: Entry) -> float:
+        ttl = self.ttl(endpoint)
+        return min(ttl, NEGATIVE_TTL) if entry[0] == MISSING else ttl
+
+    def _is_fresh(self, endpoint: str, entry: Entry, now: float, refresh_ahead: float = 0.0) -> bool:
+        """Whether entry has more than refresh_ahead of its TTL left"""
+        return now - entry[1] < self._entry_ttl(endpoint, entry) * (1 - refresh_ahead)
+
+    def _count(self, name: str, key: str = None):
+        """Bump a read counter; reads of prefetched keys also count as warm hits"""
+        with self._lock:
+            self._stats[name] += 1
+            if key is not None and key in self._warmed:
+                self._stats['warm_hits'] += 1
+
+    def get_or_load(self, endpoint: str, key: str, loader: Callable[[], object]):
+        """Cached value for key if it is fresh (or usably stale), else loader()'s result"""
+        ttl = self.ttl(endpoint)
+        now = time.time()
+
+        entry = self.front.get(key)
+        if entry is not None and self._is_fresh(endpoint, entry, now):
+            self._count('front_hits', key)
+            return json.loads(entry[0])
+
+        shared_entry = self.shared.get(key)
+        if shared_entry is not None and self._is_fresh(endpoint, shared_entry, now):
+            self._count('shared_hits', key)
+            self.front.set(key, endpoint, *shared_entry)
+            return json.loads(shared_entry[0])
+
+        # Serve the newest expired copy while it is within the staleness bound
+        if shared_entry is not None and (entry is None or shared_entry[1] > entry[1]):
+            entry = shared_entry
+        if entry is not None and entry[0] != MISSING and now - entry[1] < ttl + self.max_staleness(endpoint):
+            self._count('stale_hits', key)
+            self._record_staleness(now - entry[1] - ttl)
+            self._refresh_in_background(endpoint, key, loader)
+            return json.loads(entry[0])
+
+        self._count('misses')
+        text = self._flight.do(key, lambda: self._load(endpoint, key, loader, remember_missing=True))
+        return json.loads(text) if text is not None else None
+
+    def warm(self, endpoint: str, key: str, loader: Callable[[], object],
+             refresh_ahead: float = 0.25, allow_load: Callable[[], bool] = None):
+        """
+        Make sure key stays fresh ahead of its TTL, for prefetching
+
+        Reloads key if it is missing or has used more than (1 - refresh_ahead)
+        of its TTL; otherwise leaves it alone. allow_load() is asked before
+        any upstream call (e.g. to enforce a request budget); if it says no,
+        whatever is cached is returned as is. Later reads of key count as
+        warm hits. Returns the current value, or None if there is none.
+        """
+        now = time.time()
+        with self._lock:
+            self._warmed[key] = now
+        entry = self.front.get(key)
+        if entry is None or not self._is_fresh(endpoint, entry, now, refresh_ahead):
+            entry = self.shared.get(key) or entry
+        if entry is not None and self._is_fresh(endpoint, entry, now, refresh_ahead):
+            return json.loads(entry[0])
+        if allow_load is not None and not allow_load():
+            return json.loads(entry[0]) if entry is not None else None
+
+        self._count('prefetch_loads')
+        text = self._flight.do(key, lambda: self._load(endpoint, key, loader, refresh_ahead=refresh_ahead,
+                                                       remember_missing=entry is None))
+        if text is None and entry is not None:
+            return json.loads(entry[0])
+        return json.loads(text) if text is not None else None
+
+    def _load(self, endpoint: str, key: str, loader: Callable[[], object], refresh_ahead: float = 0.0,
+              remember_missing: bool = False) -> Optional[str]:
+        """
+        Call the loader and store its result; returns the stored JSON text
+
+        The tiers are checked again first: a caller that missed just as
+        another load (in this process or another) finished takes that result
+        instead of fetching again. A None result is stored only with
+        remember_missing, so a failed refresh never replaces a cached value.
+        """
+        now = time.time()
+        entry = self.front.get(key)
+        if entry is not None and self._is_fresh(endpoint, entry, now, refresh_ahead):
+            return entry[0]
+        entry = self.shared.get(key)
+        if entry is not None and self._is_fresh(endpoint, entry, now, refresh_ahead):
+            self.front.set(key, endpoint, *entry)
+            return entry[0]
+
+        value = loader()
+        if value is None and not remember_missing:
+            return None
+        # Coalesced callers each decode their own copy of the text
+        text = json.dumps(value, separators=(',', ':'))
+        self._store(endpoint, key, text, time.time())
+        return text
+
+    def _record_staleness(self, staleness: float):
+        with self._lock:
+            self._stats['total_staleness'] += staleness
+            self._stats['max_staleness'] = max(self._stats['max_staleness'], staleness)
+
+    def _refresh_in_background(self, endpoint: str, key: str, loader: Callable[[], object]):
+        """Queue one refresh per key; callers arriving while it runs keep getting the stale copy"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                    thread_name_prefix="api-cache-refresh")
+            executor = self._executor
+        executor.submit(self._refresh, endpoint, key, loader)
+
+    def _refresh(self, endpoint: str, key: str, loader: Callable[[], object]):
+        start = time.perf_counter()
+        error = False
+        try:
+            # Refreshes yield to interactive requests at the rate limiter
+            with rate_limiter.lane(rate_limiter.BACKGROUND):
+                self._flight.do(key, lambda: self._load(endpoint, key, loader))
+        except Exception:
+            # Keep serving the stale copy; the next read past TTL tries again
+            error = True
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._refreshing.discard(key)
+                self._stats['refreshes'] += 1
+                self._stats['total_refresh_latency'] += latency
+                self._stats['max_refresh_latency'] = max(self._stats['max_refresh_latency'], latency)
+                if error:
+                    self._stats['refresh_errors'] += 1
+
+    def put(self, endpoint: str, key: str, value, fetched_at: float = None):
+        """Store a value in both tiers"""
+        text = json.dumps(value, separators=(',', ':'))
+        self._store(endpoint, key, text, time.time() if fetched_at is None else fetched_at)
+
+    def _store(self, endpoint: str, key: str, text: str, fetched_at: float):
+        self.shared.set(key, endpoint, text, fetched_at)
+        self.front.set(key, endpoint, text, fetched_at)
+        self._maybe_prune(fetched_at)
+
+    def get_permanent(self, endpoint: str, key: str, loader: Callable[[], object]):
+        """
+        Value for a key whose response never changes, fetched at most once
+
+        Checks the front tier and then the archive; only a key never seen
+        before calls the loader. There is no TTL, so use this only for data
+        that is final (e.g. a completed season).
+        """
+        entry = self.front.get(key)
+        if entry is not None and entry[1] == PERMANENT:
+            self._count('front_hits', key)
+            return json.loads(entry[0])
+
+        entry = self.archive.get(key)
+        if entry is not None:
+            self._count('archive_hits', key)
+            self.front.set(key, endpoint, entry[0], PERMANENT)
+            return json.loads(entry[0])
+
+        self._count('misses')
+        text = self._flight.do(key, lambda: self._load_permanent(endpoint, key, loader))
+        return json.loads(text) if text is not None else None
+
+    def _load_permanent(self, endpoint: str, key: str, loader: Callable[[], object]) -> Optional[str]:
+        value = loader()
+        if value is None:
+            return None
+        return self._archive(endpoint, key, json.dumps(value, separators=(',', ':')))
+
+    def archive_value(self, endpoint: str, key: str, value):
+        """Store a value permanently, e.g. a finished league that arrived inside another response"""
+        self._archive(endpoint, key, json.dumps(value, separators=(',', ':')))
+
+    def _archive(self, endpoint: str, key: str, text: str) -> str:
+        self.archive.set(key, endpoint, text, time.time())
+        self.front.set(key, endpoint, text, PERMANENT)
+        # The TTL'd copy is now redundant
+        self.shared.delete(key)
+        return text
+
+    def is_archived(self, key: str) -> bool:
+        entry = self.front.get(key)
+        if entry is not None and entry[1] == PERMANENT:
+            return True
+        return self.archive.has(key)
+
+    def invalidate(self, key: str):
+        self.front.delete(key)
+        self.shared.delete(key)
+        self.archive.delete(key)
+
+    def _maybe_prune(self, now: float):
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        self.front.prune(now - MAX_ENTRY_AGE)
+        self.shared.prune(now - MAX_ENTRY_AGE)
+        with self._lock:
+            for key in [key for key, warmed_at in self._warmed.items() if warmed_at < now - MAX_ENTRY_AGE]:
+                del self._warmed[key]
+
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss, staleness, background refresh, coalescing and promotion counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        flight = self._flight.stats()
+        stats['loads'] = flight['calls']
+        stats['coalesced'] = flight['coalesced']
+        stats['promoted'] = flight['promoted']
+        reads = (stats['front_hits'] + stats['shared_hits'] + stats['archive_hits']
+                 + stats['stale_hits'] + stats['misses'])
+        stats['warm_hit_rate'] = stats['warm_hits'] / reads if reads else 0.0
+        stats['avg_staleness'] = stats['total_staleness'] / stats['stale_hits'] if stats['stale_hits'] else 0.0
+        stats['avg_refresh_latency'] = (
+            stats['total_refresh_latency'] / stats['refreshes'] if stats['refreshes'] else 0.0
+        )
+        return stats
+
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_api_cache() -> TieredCache:
+    """Get the process-wide API cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TieredCache()
+    return _cache
+
+
+def set_api_cache(cache: TieredCache):
+    """Swap the process-wide API cache (e.g. a different store or TTLs)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
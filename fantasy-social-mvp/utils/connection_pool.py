@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# PRAGMAs applied to every pooled connection. WAL lets readers keep going while
+# a writer holds the lock, and NORMAL sync is safe in WAL mode.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,       # ~16MB page cache per connection
+    'mmap_size': 134217728,     # 128MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,       # wait up to 5s for the writer lock
+}
+DEFAULT_MAX_SIZE = 8
+
+
+def _pool_size(db_path: str, max_size: int) -> int:
+    # Every connection to ":memory:" is a separate database, so only share one
+    return 1 if db_path == ":memory:" else max_size
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections"""
+
+    _pools: Dict[str, 'ConnectionPool'] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path: str, max_size: int = DEFAULT_MAX_SIZE, pragmas: Dict = None):
+        self.db_path = db_path
+        self.max_size = _pool_size(db_path, max_size)
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def for_path(cls, db_path: str, max_size: int = None, pragmas: Dict = None) -> 'ConnectionPool':
+        """
+        Get the process-wide pool for a database file, creating it on first use
+
+        Settings left as None mean "whatever the pool has" (the defaults on
+        first use). There is one pool per file, so asking for a different
+        max_size or pragmas than it was created with raises ValueError.
+        """
+        with cls._pools_lock:
+            pool = cls._pools.get(db_path)
+            if pool is None:
+                pool = cls(db_path, DEFAULT_MAX_SIZE if max_size is None else max_size, pragmas)
+                cls._pools[db_path] = pool
+                return pool
+        if max_size is not None and _pool_size(db_path, max_size) != pool.max_size:
+            raise ValueError(f"{db_path} already has a pool of {pool.max_size} connections, not {max_size}")
+        if pragmas is not None and dict(pragmas) != pool.pragmas:
+            raise ValueError(f"{db_path} already has a pool with different pragmas")
+        return pool
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and tune a new connection"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Pool is at capacity, wait for a connection to be returned
+        return self._idle.get()
+
+    def _release(self, conn: sqlite3.Connection):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a connection for the duration of a with-block
+
+        Commits on success and rolls back on error. Nested use on the same thread
+        reuses the outer connection, and only the outermost block commits.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def close_all(self):
+        """Close idle connections (connections currently borrowed are left alone)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
@@ -2,256 +2,396 @@ import sqlite3
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import json
+import base64
+
+from utils import migrations
+from utils.connection_pool import ConnectionPool
+from utils.like_buffer import LikeBuffer
+
+# Search ranks at most this many of the newest matching posts, so a very
+# common word costs the same as a rare one
+SEARCH_MAX_CANDIDATES = 10000
+SEARCH_MIN_PREFIX = 3
+
+# FTS5 trigram tokens are 3 characters; shorter user searches use prefix indexes
+TRIGRAM_LENGTH = 3
+
+# Home timelines merge one index scan per followed author above the fan-out
+# limit; past this many they share a single scan of the global post index
+TIMELINE_MAX_MERGED_AUTHORS = 100
+
+# When an author drops back to the fan-out limit, each follower's timeline gets
+# this many of their newest posts; rebuild_timelines restores the rest
+TIMELINE_BACKFILL_POSTS = 50
+
+# Leaderboard metric -> ORDER BY, each matching an index on the leaderboard table
+LEADERBOARD_ORDERINGS = {
+    'win_pct': 'l.win_pct DESC, l.points_for DESC',
+    'points_for': 'l.points_for DESC',
+    'points_against': 'l.points_against DESC',
+}
+
+def encode_cursor(created_at: str, post_id: int) -> str:
+    """Encode a (created_at, id) position as an opaque pagination cursor"""
+    raw = json.dumps([created_at, post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor produced by encode_cursor"""
+    created_at, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return created_at, int(post_id)
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression
+
+    Each word is quoted (so FTS syntax characters in user input are literal)
+    and all must match. The last word also matches as a prefix once it is
+    long enough that the expansion stays small.
+    """
+    words = [word.replace('"', '""') for word in text.split()]
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= SEARCH_MIN_PREFIX:
+        terms[-1] += '*'
+    return ' '.join(terms)
 
 class Database:
     """Simple SQLite database for social features"""
 
-    def __init__(self, db_path: str = "fantasy_social.db"):
+    def __init__(self, db_path: str = "fantasy_social.db", pool_size: int = 8,
+                 use_timelines: bool = True, fanout_follower_limit: int = 5000):
+        """
+        use_timelines: serve the private feed from materialized home timelines
+            (fan-out-on-write) instead of resolving follows on every read
+        fanout_follower_limit: authors with more followers than this are not
+            fanned out; their posts are merged into timelines at read time
+        """
         self.db_path = db_path
+        self.use_timelines = use_timelines
+        self.fanout_follower_limit = fanout_follower_limit
+        self.pool = ConnectionPool.for_path(db_path, max_size=pool_size)
         self.init_db()
+        with self.connection() as conn:
+            # Absent where migration 8 ran on a SQLite without the trigram tokenizer
+            self.user_trigram_search = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+            ).fetchone() is not None
+        self.like_buffer = LikeBuffer.for_pool(self.pool)
 
     def get_connection(self):
-        """Get database connection"""
+        """Get a standalone database connection (not pooled)"""
         return sqlite3.connect(self.db_path)
 
-    def init_db(self):
-        """Initialize database tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sleeper_username TEXT UNIQUE NOT NULL,
-                sleeper_user_id TEXT UNIQUE NOT NULL,
-                display_name TEXT,
-                bio TEXT,
-                avatar_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Posts table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                post_type TEXT DEFAULT 'general',
-                league_id TEXT,
-                metadata TEXT,
-                likes INTEGER DEFAULT 0,
-                visibility TEXT DEFAULT 'public',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-
-        # Add visibility column if it doesn't exist (for existing databases)
-        try:
-            cursor.execute("SELECT visibility FROM posts LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE posts ADD COLUMN visibility TEXT DEFAULT 'public'")
-            conn.commit()
-
-        # Follows table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS follows (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                follower_id INTEGER NOT NULL,
-                following_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (follower_id) REFERENCES users (id),
-                FOREIGN KEY (following_id) REFERENCES users (id),
-                UNIQUE(follower_id, following_id)
-            )
-        ''')
-
-        # Comments table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS comments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                post_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (post_id) REFERENCES posts (id),
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+    def connection(self):
+        """Borrow a pooled connection; use as a context manager"""
+        return self.pool.connection()
 
-        conn.commit()
-        conn.close()
+    def init_db(self):
+        """Initialize database tables (applies pending schema migrations)"""
+        with self.connection() as conn:
+            migrations.migrate(conn)
 
     # User operations
     def create_user(self, sleeper_username: str, sleeper_user_id: str,
                    display_name: str = None, bio: str = None, avatar_url: str = None) -> Optional[int]:
         """Create a new user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-                INSERT INTO users (sleeper_username, sleeper_user_id, display_name, bio, avatar_url)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (sleeper_username, sleeper_user_id, display_name or sleeper_username, bio, avatar_url))
-            conn.commit()
-            user_id = cursor.lastrowid
-            conn.close()
-            return user_id
+            with self.connection() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO users (sleeper_username, sleeper_user_id, display_name, bio, avatar_url)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (sleeper_username, sleeper_user_id, display_name or sleeper_username, bio, avatar_url))
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
-            conn.close()
             return None
 
     def get_user_by_sleeper_username(self, sleeper_username: str) -> Optional[Dict]:
         """Get user by Sleeper username"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE sleeper_username = ?', (sleeper_username,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            row = conn.execute('SELECT * FROM users WHERE sleeper_username = ?', (sleeper_username,)).fetchone()
         return dict(row) if row else None
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
         return dict(row) if row else None
 
     def update_user(self, user_id: int, display_name: str = None, bio: str = None):
         """Update user profile"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        if display_name:
-            cursor.execute('UPDATE users SET display_name = ? WHERE id = ?', (display_name, user_id))
-        if bio:
-            cursor.execute('UPDATE users SET bio = ? WHERE id = ?', (bio, user_id))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            if display_name:
+                conn.execute('UPDATE users SET display_name = ? WHERE id = ?', (display_name, user_id))
+            if bio:
+                conn.execute('UPDATE users SET bio = ? WHERE id = ?', (bio, user_id))
 
     # Post operations
     def create_post(self, user_id: int, content: str, post_type: str = 'general',
                    league_id: str = None, metadata: Dict = None, visibility: str = 'public') -> int:
         """Create a new post"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
         metadata_json = json.dumps(metadata) if metadata else None
-        cursor.execute('''
-            INSERT INTO posts (user_id, content, post_type, league_id, metadata, visibility)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, content, post_type, league_id, metadata_json, visibility))
-        conn.commit()
-        post_id = cursor.lastrowid
-        conn.close()
-        return post_id
+        # Indexed for search alongside the content
+        player_names = ' '.join(
+            player['name'] for player in (metadata or {}).get('players') or [] if player.get('name')
+        ) or None
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO posts (user_id, content, post_type, league_id, metadata, visibility, player_names)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, content, post_type, league_id, metadata_json, visibility, player_names))
+            post_id = cursor.lastrowid
+            if self.use_timelines:
+                self._fan_out_post(conn, post_id, user_id)
+            return post_id
+
+    def _is_fanout_author(self, conn, user_id: int) -> bool:
+        """Whether an author's posts are pushed to follower timelines on write"""
+        row = conn.execute('SELECT follower_count FROM user_counters WHERE user_id = ?', (user_id,)).fetchone()
+        return (row[0] if row else 0) <= self.fanout_follower_limit
+
+    def _fan_out_post(self, conn, post_id: int, author_id: int):
+        """Push a new post to the author's timeline and, unless they're too big, their followers'"""
+        conn.execute('''
+            INSERT OR IGNORE INTO timeline (user_id, post_id, author_id, created_at)
+            SELECT user_id, id, user_id, created_at FROM posts WHERE id = ?
+        ''', (post_id,))
+        if self._is_fanout_author(conn, author_id):
+            conn.execute('''
+                INSERT OR IGNORE INTO timeline (user_id, post_id, author_id, created_at)
+                SELECT f.follower_id, p.id, p.user_id, p.created_at
+                FROM posts p
+                JOIN follows f ON f.following_id = p.user_id
+                WHERE p.id = ?
+            ''', (post_id,))
+
+    def _fetch_post_page(self, where: str, params: Tuple, cursor: Optional[str],
+                         page_size: int) -> Tuple[List[Dict], Optional[str]]:
+        """Run a keyset-paginated post query, newest first"""
+        return self._fetch_merged_post_page([(where, params)], cursor, page_size)
+
+    def _fetch_merged_post_page(self, branches: List[Tuple[str, Tuple]], cursor: Optional[str],
+                                page_size: int, timeline_user_id: Optional[int] = None
+                                ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Run a keyset-paginated post query over several (where, params) branches, newest first
 
-    def get_posts(self, limit: int = 50, user_id: int = None) -> List[Dict]:
-        """Get posts (optionally filtered by user)"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        Each branch should be answerable by a range scan of one index in
+        (created_at, id) order. The branches are combined with UNION ALL, which
+        SQLite merges without sorting and stops reading once the page is full,
+        so a page never costs more than page_size + 1 rows per branch. (An OR
+        across the branches would instead collect and sort every match.)
 
-        if user_id:
-            cursor.execute('''
-                SELECT p.*, u.display_name, u.sleeper_username, u.avatar_url
-                FROM posts p
+        With timeline_user_id, that user's timeline rows are merged in as one
+        more branch and duplicates are dropped (UNION instead of UNION ALL).
+        """
+        position = decode_cursor(cursor) if cursor else None
+        selects, all_params = [], []
+        # Every branch leads with its sort key so the ORDER BY can name it by
+        # position. The timeline branch reads the key from the timeline's primary
+        # key, which SQLite knows is ordered; p.created_at, p.id there would not be
+        if timeline_user_id is not None:
+            conditions = ['t.user_id = ?']
+            all_params.append(timeline_user_id)
+            if position:
+                conditions.append('(t.created_at, t.post_id) < (?, ?)')
+                all_params.extend(position)
+            selects.append(f'''
+                SELECT t.created_at AS created_at, t.post_id AS id,
+                       p.*, u.display_name, u.sleeper_username, u.avatar_url
+                FROM timeline t
+                JOIN posts p ON p.id = t.post_id
                 JOIN users u ON p.user_id = u.id
-                WHERE p.user_id = ?
-                ORDER BY p.created_at DESC
-                LIMIT ?
-            ''', (user_id, limit))
-        else:
-            cursor.execute('''
-                SELECT p.*, u.display_name, u.sleeper_username, u.avatar_url
+                WHERE {' AND '.join(conditions)}
+            ''')
+        for where, params in branches:
+            conditions = [where] if where else []
+            all_params.extend(params)
+            if position:
+                conditions.append('(p.created_at, p.id) < (?, ?)')
+                all_params.extend(position)
+            where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            selects.append(f'''
+                SELECT p.created_at, p.id,
+                       p.*, u.display_name, u.sleeper_username, u.avatar_url
                 FROM posts p
                 JOIN users u ON p.user_id = u.id
-                ORDER BY p.created_at DESC
+                {where_sql}
+            ''')
+
+        compound = 'UNION' if timeline_user_id is not None else 'UNION ALL'
+        with self.connection() as conn:
+            # Fetch one extra row to learn whether another page exists
+            rows = conn.execute(f'''
+                {compound.join(selects)}
+                ORDER BY 1 DESC, 2 DESC
                 LIMIT ?
-            ''', (limit,))
+            ''', (*all_params, page_size + 1)).fetchall()
+        return self._page_result(rows, page_size)
 
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+    def _fetch_timeline_page(self, user_id: int, cursor: Optional[str],
+                             page_size: int) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Read one page of a user's home timeline
 
-    def get_feed_for_user(self, user_id: int, limit: int = 50, view_mode: str = 'public') -> List[Dict]:
+        Fanned-out posts come from a range scan of the user's timeline rows. Posts by
+        followed authors above fanout_follower_limit are read from posts directly
+        (fan-out-on-read), one idx_posts_user_created scan per author, and merged in.
+        """
+        with self.connection() as conn:
+            large_authors = [row[0] for row in conn.execute('''
+                SELECT f.following_id FROM follows f
+                JOIN user_counters c ON c.user_id = f.following_id
+                WHERE f.follower_id = ? AND c.follower_count > ?
+            ''', (user_id, self.fanout_follower_limit))]
+        if len(large_authors) > TIMELINE_MAX_MERGED_AUTHORS:
+            # The unary + keeps this branch on idx_posts_created_at, in feed order
+            placeholders = ','.join('?' * len(large_authors))
+            branches = [(f'+p.user_id IN ({placeholders})', tuple(large_authors))]
+        else:
+            branches = [('p.user_id = ?', (author_id,)) for author_id in large_authors]
+        return self._fetch_merged_post_page(branches, cursor, page_size, timeline_user_id=user_id)
+
+    def _page_result(self, rows: List, page_size: int) -> Tuple[List[Dict], Optional[str]]:
+        """Turn page_size + 1 fetched rows into (posts, next_cursor)"""
+        posts = [dict(row) for row in rows[:page_size]]
+        for post in posts:
+            # Include likes that are still waiting in the write-behind buffer
+            post['likes'] += self.like_buffer.pending_delta(post['id'])
+        next_cursor = None
+        if len(rows) > page_size:
+            last = posts[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return posts, next_cursor
+
+    def get_posts_page(self, user_id: int = None, cursor: str = None,
+                       page_size: int = 20) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of posts (optionally filtered by user) and the cursor for the next page"""
+        if user_id:
+            return self._fetch_post_page('p.user_id = ?', (user_id,), cursor, page_size)
+        return self._fetch_post_page('', (), cursor, page_size)
+
+    def get_posts(self, limit: int = 50, user_id: int = None) -> List[Dict]:
+        """Get posts (optionally filtered by user)"""
+        return self.get_posts_page(user_id=user_id, page_size=limit)[0]
+
+    def get_feed_page(self, user_id: int, view_mode: str = 'public', cursor: str = None,
+                      page_size: int = 20) -> Tuple[List[Dict], Optional[str]]:
         """
-        Get feed for a user based on view mode
+        Get one page of a user's feed and the cursor for the next page
 
         Public mode: All public posts + private posts from people you follow
         Private mode: Only posts from people you follow (public + private) + your own posts
         """
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
+        followed_or_own = '''(
+            p.user_id = ? OR p.user_id IN (
+                SELECT following_id FROM follows WHERE follower_id = ?
+            )
+        )'''
         if view_mode == 'public':
-            # Public mode: All public posts + private posts from people you follow
-            cursor.execute('''
-                SELECT p.*, u.display_name, u.sleeper_username, u.avatar_url
-                FROM posts p
-                JOIN users u ON p.user_id = u.id
-                WHERE (
-                    p.visibility = 'public'
-                    OR (
-                        p.visibility = 'private' AND (
-                            p.user_id = ? OR p.user_id IN (
-                                SELECT following_id FROM follows WHERE follower_id = ?
+            # Public mode: All public posts + private posts from people you follow.
+            # Two branches, each read in order from idx_posts_visibility_created
+            return self._fetch_merged_post_page([
+                ("p.visibility = 'public'", ()),
+                (f"p.visibility = 'private' AND {followed_or_own}", (user_id, user_id)),
+            ], cursor, page_size)
+        if self.use_timelines:
+            # Private mode: Only posts from people you follow + your own posts
+            return self._fetch_timeline_page(user_id, cursor, page_size)
+        # Private mode without timelines: resolve follows on every read. The unary +
+        # keeps SQLite on idx_posts_created_at (already in feed order) instead of
+        # gathering every followed author's posts and sorting them
+        where = followed_or_own.replace('p.user_id', '+p.user_id')
+        return self._fetch_post_page(where, (user_id, user_id), cursor, page_size)
+
+    def search_posts(self, query: str, viewer_id: int, cursor: str = None,
+                     page_size: int = 20) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Full-text search over posts, best matches first, one page at a time
+
+        Matches post content, post type and the names of attached players
+        (ranked by BM25, player names weighted highest). Every word must
+        match; the last one also matches as a prefix, so results update as
+        you type. Visibility follows the public feed: public posts plus
+        private posts from people the viewer follows. Only the newest
+        SEARCH_MAX_CANDIDATES matches the viewer can see are ranked.
+        """
+        match = fts_query(query)
+        if not match:
+            return [], None
+        score, last_id = decode_cursor(cursor) if cursor else (None, None)
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT p.*, u.display_name, u.sleeper_username, u.avatar_url, m.score
+                FROM (
+                    -- FTS walks matches newest first and stops once it has the
+                    -- limit of posts the viewer can see, so only those are scored
+                    SELECT f.rowid AS post_id, bm25(posts_fts, 1.0, 0.5, 2.0) AS score
+                    FROM posts_fts f
+                    JOIN posts v ON v.id = f.rowid
+                    WHERE posts_fts MATCH ?1
+                    AND (
+                        v.visibility = 'public'
+                        OR (
+                            v.visibility = 'private' AND (
+                                v.user_id = ?2 OR v.user_id IN (
+                                    SELECT following_id FROM follows WHERE follower_id = ?2
+                                )
                             )
                         )
                     )
-                )
-                ORDER BY p.created_at DESC
-                LIMIT ?
-            ''', (user_id, user_id, limit))
-        else:
-            # Private mode: Only posts from people you follow + your own posts
-            cursor.execute('''
-                SELECT p.*, u.display_name, u.sleeper_username, u.avatar_url
-                FROM posts p
+                    ORDER BY f.rowid DESC
+                    LIMIT ?6
+                ) m
+                JOIN posts p ON p.id = m.post_id
                 JOIN users u ON p.user_id = u.id
-                WHERE p.user_id = ? OR p.user_id IN (
-                    SELECT following_id FROM follows WHERE follower_id = ?
-                )
-                ORDER BY p.created_at DESC
-                LIMIT ?
-            ''', (user_id, user_id, limit))
+                WHERE ?3 IS NULL OR m.score > ?3 OR (m.score = ?3 AND p.id > ?4)
+                ORDER BY m.score, p.id
+                LIMIT ?5
+            ''', (match, viewer_id, score, last_id, page_size + 1, SEARCH_MAX_CANDIDATES)).fetchall()
+
+        posts = [dict(row) for row in rows[:page_size]]
+        for post in posts:
+            post['likes'] += self.like_buffer.pending_delta(post['id'])
+        next_cursor = None
+        if len(rows) > page_size:
+            # BM25 scores are lower-is-better; the cursor resumes after the last (score, id)
+            next_cursor = encode_cursor(posts[-1]['score'], posts[-1]['id'])
+        return posts, next_cursor
 
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+    def get_feed_for_user(self, user_id: int, limit: int = 50, view_mode: str = 'public') -> List[Dict]:
+        """Get the first page of a user's feed (see get_feed_page)"""
+        return self.get_feed_page(user_id, view_mode=view_mode, page_size=limit)[0]
+
+    def like_post(self, post_id: int, user_id: int) -> bool:
+        """Like a post (buffered write); returns False if the user already likes it"""
+        return self.like_buffer.like(user_id, post_id)
+
+    def unlike_post(self, post_id: int, user_id: int) -> bool:
+        """Remove a user's like (buffered write); returns False if they hadn't liked it"""
+        return self.like_buffer.unlike(user_id, post_id)
 
-    def like_post(self, post_id: int):
-        """Increment likes on a post"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE posts SET likes = likes + 1 WHERE id = ?', (post_id,))
-        conn.commit()
-        conn.close()
+    def get_liked_post_ids(self, user_id: int, post_ids: List[int]) -> set:
+        """Get which of the given posts a user has liked"""
+        return self.like_buffer.liked_post_ids(user_id, post_ids)
+
+    def flush_likes(self):
+        """Write buffered likes to the database now"""
+        self.like_buffer.flush()
 
     def delete_post(self, post_id: int, user_id: int) -> bool:
         """Delete a post (only if it belongs to the user)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # First check if the post belongs to the user
-        cursor.execute('SELECT user_id FROM posts WHERE id = ?', (post_id,))
-        result = cursor.fetchone()
-
-        if result and result[0] == user_id:
-            # Delete associated comments first
-            cursor.execute('DELETE FROM comments WHERE post_id = ?', (post_id,))
-            # Then delete the post
-            cursor.execute('DELETE FROM posts WHERE id = ?', (post_id,))
-            conn.commit()
-            conn.close()
-            return True
-        else:
-            conn.close()
+        with self.connection() as conn:
+            # First check if the post belongs to the user
+            result = conn.execute('SELECT user_id FROM posts WHERE id = ?', (post_id,)).fetchone()
+
+            if result and result[0] == user_id:
+                # Delete associated comments first
+                conn.execute('DELETE FROM comments WHERE post_id = ?', (post_id,))
+                # Then delete the post
+                conn.execute('DELETE FROM posts WHERE id = ?', (post_id,))
+                return True
             return False
 
     # Follow operations
@@ -259,129 +399,382 @@ class Database:
         """Follow a user"""
         if follower_id == following_id:
             return False
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-                INSERT INTO follows (follower_id, following_id)
-                VALUES (?, ?)
-            ''', (follower_id, following_id))
-            conn.commit()
-            conn.close()
+            with self.connection() as conn:
+                conn.execute('''
+                    INSERT INTO follows (follower_id, following_id)
+                    VALUES (?, ?)
+                ''', (follower_id, following_id))
+                # Backfill the new follow's posts unless they're merged in at read time
+                if self.use_timelines and self._is_fanout_author(conn, following_id):
+                    conn.execute('''
+                        INSERT OR IGNORE INTO timeline (user_id, post_id, author_id, created_at)
+                        SELECT ?, id, user_id, created_at FROM posts WHERE user_id = ?
+                    ''', (follower_id, following_id))
             return True
         except sqlite3.IntegrityError:
-            conn.close()
             return False
 
     def unfollow_user(self, follower_id: int, following_id: int):
         """Unfollow a user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM follows
-            WHERE follower_id = ? AND following_id = ?
-        ''', (follower_id, following_id))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            conn.execute('''
+                DELETE FROM follows
+                WHERE follower_id = ? AND following_id = ?
+            ''', (follower_id, following_id))
+            if self.use_timelines:
+                conn.execute('''
+                    DELETE FROM timeline WHERE user_id = ? AND author_id = ?
+                ''', (follower_id, following_id))
+                # An author dropping back to the limit goes from fan-out-on-read to
+                # fan-out-on-write. Posts written while they were over it never reached
+                # timelines, so push their newest posts to the followers they have now.
+                # Bounded so this unfollow stays one small write however prolific they were
+                row = conn.execute('''
+                    SELECT follower_count FROM user_counters WHERE user_id = ?
+                ''', (following_id,)).fetchone()
+                if row and row[0] == self.fanout_follower_limit:
+                    conn.execute('''
+                        INSERT OR IGNORE INTO timeline (user_id, post_id, author_id, created_at)
+                        SELECT f.follower_id, p.id, p.user_id, p.created_at
+                        FROM (
+                            SELECT id, user_id, created_at FROM posts
+                            WHERE user_id = ?
+                            ORDER BY created_at DESC, id DESC
+                            LIMIT ?
+                        ) p
+                        JOIN follows f ON f.following_id = p.user_id
+                    ''', (following_id, TIMELINE_BACKFILL_POSTS))
 
     def is_following(self, follower_id: int, following_id: int) -> bool:
         """Check if user is following another user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(*) FROM follows
-            WHERE follower_id = ? AND following_id = ?
-        ''', (follower_id, following_id))
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self.connection() as conn:
+            count = conn.execute('''
+                SELECT COUNT(*) FROM follows
+                WHERE follower_id = ? AND following_id = ?
+            ''', (follower_id, following_id)).fetchone()[0]
         return count > 0
 
     def get_followers(self, user_id: int) -> List[Dict]:
         """Get followers of a user"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT u.* FROM users u
-            JOIN follows f ON u.id = f.follower_id
-            WHERE f.following_id = ?
-        ''', (user_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT u.* FROM users u
+                JOIN follows f ON u.id = f.follower_id
+                WHERE f.following_id = ?
+            ''', (user_id,)).fetchall()
         return [dict(row) for row in rows]
 
     def get_following(self, user_id: int) -> List[Dict]:
         """Get users that a user is following"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT u.* FROM users u
-            JOIN follows f ON u.id = f.following_id
-            WHERE f.follower_id = ?
-        ''', (user_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT u.* FROM users u
+                JOIN follows f ON u.id = f.following_id
+                WHERE f.follower_id = ?
+            ''', (user_id,)).fetchall()
         return [dict(row) for row in rows]
 
     def get_user_stats(self, user_id: int) -> Dict:
-        """Get user statistics"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        """Get user statistics (primary-key read from user_counters)"""
+        return self.get_user_stats_bulk([user_id])[user_id]
+
+    def get_user_stats_bulk(self, user_ids: List[int]) -> Dict[int, Dict]:
+        """Get statistics for many users in one query, keyed by user id"""
+        if not user_ids:
+            return {}
+        placeholders = ','.join('?' * len(user_ids))
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT user_id, post_count, following_count, follower_count, total_likes_received
+                FROM user_counters
+                WHERE user_id IN ({placeholders})
+            ''', tuple(user_ids)).fetchall()
+        stats = {
+            user_id: {'posts': 0, 'following': 0, 'followers': 0, 'likes_received': 0}
+            for user_id in user_ids
+        }
+        for row in rows:
+            stats[row['user_id']] = {
+                'posts': row['post_count'],
+                'following': row['following_count'],
+                'followers': row['follower_count'],
+                'likes_received': row['total_likes_received']
+            }
+        return stats
+
+    def get_most_active_users(self, limit: int = 10) -> List[Dict]:
+        """Get users ranked by activity (posts + followers), with their stats attached"""
+        with self.connection() as conn:
+            # ORDER BY matches idx_user_counters_activity, so this is an index walk
+            rows = conn.execute('''
+                SELECT u.*,
+                       c.post_count AS posts,
+                       c.follower_count AS followers,
+                       c.post_count + c.follower_count AS total_activity
+                FROM user_counters c
+                JOIN users u ON u.id = c.user_id
+                ORDER BY c.post_count + c.follower_count DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        return [dict(row) for row in rows]
 
-        cursor.execute('SELECT COUNT(*) FROM posts WHERE user_id = ?', (user_id,))
-        post_count = cursor.fetchone()[0]
+    def get_leaderboard(self, season: str, metric: str = 'win_pct', limit: int = 10) -> List[Dict]:
+        """
+        Get the top users for a season by 'win_pct', 'points_for' or 'points_against'
 
-        cursor.execute('SELECT COUNT(*) FROM follows WHERE follower_id = ?', (user_id,))
-        following_count = cursor.fetchone()[0]
+        Reads the leaderboard table built by utils.leaderboards; each ordering
+        matches one of its indexes, so this is a top-K index walk.
+        """
+        order_by = LEADERBOARD_ORDERINGS[metric]
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT u.id, u.sleeper_username, u.display_name, u.avatar_url,
+                       l.leagues, l.wins, l.losses, l.ties, l.win_pct, l.points_for, l.points_against
+                FROM leaderboard l
+                JOIN users u ON u.id = l.user_id
+                WHERE l.season = ?
+                ORDER BY {order_by}
+                LIMIT ?
+            ''', (season, limit)).fetchall()
+        return [dict(row) for row in rows]
 
-        cursor.execute('SELECT COUNT(*) FROM follows WHERE following_id = ?', (user_id,))
-        followers_count = cursor.fetchone()[0]
+    def rebuild_user_counters(self):
+        """Recompute user_counters from posts and follows (repairs any drift)"""
+        with self.connection() as conn:
+            migrations.rebuild_user_counters(conn)
 
-        conn.close()
+    def rebuild_timelines(self):
+        """Recompute every home timeline (run after changing fanout_follower_limit)"""
+        with self.connection() as conn:
+            migrations.rebuild_timelines(conn, self.fanout_follower_limit)
 
-        return {
-            'posts': post_count,
-            'following': following_count,
-            'followers': followers_count
-        }
+    def get_following_ids(self, user_id: int) -> set:
+        """Get the ids of every user that a user is following"""
+        with self.connection() as conn:
+            rows = conn.execute('SELECT following_id FROM follows WHERE follower_id = ?', (user_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def _user_search_streams(self, term: str) -> List[Tuple[str, str, Tuple, str, Optional[str]]]:
+        """
+        The ordered result groups for a user search, as
+        (from, where, params, sort key, start)
+
+        Groups with a start are read in ascending sort key order from there;
+        the others newest first. Each is read in the order of an index, so a
+        page is a top-K walk no matter how many users match.
+        """
+        if not term:
+            return [('users u', '1', (), 'u.id', None)]
+
+        # Prefix range: from the term up to the term with its last character incremented
+        end = term[:-1] + chr(ord(term[-1]) + 1)
+        username_prefix = 'lower(u.sleeper_username) >= ? AND lower(u.sleeper_username) < ?'
+        streams = [('users u', 'lower(u.sleeper_username) < ?', (end,), 'lower(u.sleeper_username)', term)]
+        if len(term) >= TRIGRAM_LENGTH and self.user_trigram_search:
+            match = '"' + term.replace('"', '""') + '"'
+            streams.append((
+                'users_fts JOIN users u ON u.id = users_fts.rowid',
+                f'users_fts MATCH ? AND NOT ({username_prefix})',
+                (match, term, end), 'users_fts.rowid', None,
+            ))
+        else:
+            streams.append((
+                'users u',
+                f'lower(u.display_name) < ? AND NOT ({username_prefix})',
+                (end, term, end), 'lower(u.display_name)', term,
+            ))
+        return streams
+
+    def search_users(self, query: str, viewer_id: int, cursor: str = None,
+                     page_size: int = 20) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Find users by username or display name, one page at a time
+
+        Usernames starting with the query come first, alphabetically. Then
+        come the rest: for queries of 3+ characters, users with the query
+        anywhere in either name (users_fts trigram index), newest first; for
+        shorter ones, or without the trigram index, users whose display name
+        starts with it, alphabetically. An empty query
+        lists every user, newest first. The viewer is left out.
+
+        Each user comes with their post/follower/following counts and whether
+        the viewer follows them, so a results page needs no further queries.
+        """
+        streams = self._user_search_streams(query.strip().lower())
+        (stream, key), last_id = decode_cursor(cursor) if cursor else ((0, None), None)
+
+        found = []
+        with self.connection() as conn:
+            for index in range(stream, len(streams)):
+                source, where, params, key_sql, start = streams[index]
+                conditions = [where, 'u.id != ?']
+                params = [*params, viewer_id]
+                resume = index == stream and last_id is not None
+                if start is None:
+                    if resume:
+                        conditions.append(f'{key_sql} < ?')
+                        params.append(key)
+                elif resume:
+                    # The cursor is the group's only lower bound, so its index seeks straight to it
+                    conditions.append(f'{key_sql} >= ? AND ({key_sql} > ? OR u.id > ?)')
+                    params.extend((key, key, last_id))
+                else:
+                    conditions.append(f'{key_sql} >= ?')
+                    params.append(start)
+                order_by = f'{key_sql} DESC' if start is None else f'{key_sql}, u.id'
+
+                # Fetch one extra row to learn whether another page exists
+                rows = conn.execute(f'''
+                    SELECT u.*,
+                           {key_sql} AS sort_key,
+                           COALESCE(c.post_count, 0) AS posts,
+                           COALESCE(c.follower_count, 0) AS followers,
+                           COALESCE(c.following_count, 0) AS following,
+                           EXISTS (
+                               SELECT 1 FROM follows f WHERE f.follower_id = ? AND f.following_id = u.id
+                           ) AS is_following
+                    FROM {source}
+                    LEFT JOIN user_counters c ON c.user_id = u.id
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY {order_by}
+                    LIMIT ?
+                ''', (viewer_id, *params, page_size + 1 - len(found))).fetchall()
+                found.extend((index, row) for row in rows)
+                if len(found) > page_size:
+                    break
+
+        users = []
+        for _, row in found[:page_size]:
+            user = dict(row)
+            del user['sort_key']
+            user['is_following'] = bool(user['is_following'])
+            users.append(user)
+        next_cursor = None
+        if len(found) > page_size:
+            index, row = found[page_size - 1]
+            next_cursor = encode_cursor([index, row['sort_key']], row['id'])
+        return users, next_cursor
+
+    def get_users_bulk(self, user_ids: List[int], viewer_id: int) -> Dict[int, Dict]:
+        """
+        Get many users in one query, keyed by user id
+
+        Each comes with the same counts and follow state as search_users.
+        """
+        if not user_ids:
+            return {}
+        placeholders = ','.join('?' * len(user_ids))
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT u.*,
+                       COALESCE(c.post_count, 0) AS posts,
+                       COALESCE(c.follower_count, 0) AS followers,
+                       COALESCE(c.following_count, 0) AS following,
+                       EXISTS (
+                           SELECT 1 FROM follows f WHERE f.follower_id = ? AND f.following_id = u.id
+                       ) AS is_following
+                FROM users u
+                LEFT JOIN user_counters c ON c.user_id = u.id
+                WHERE u.id IN ({placeholders})
+            ''', (viewer_id, *user_ids)).fetchall()
+        users = {}
+        for row in rows:
+            user = dict(row)
+            user['is_following'] = bool(user['is_following'])
+            users[user['id']] = user
+        return users
 
     def get_all_users(self, limit: int = 100) -> List[Dict]:
         """Get all users for discovery"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users ORDER BY created_at DESC LIMIT ?', (limit,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            rows = conn.execute('SELECT * FROM users ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
         return [dict(row) for row in rows]
 
     # Comment operations
     def add_comment(self, post_id: int, user_id: int, content: str) -> int:
         """Add a comment to a post"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO comments (post_id, user_id, content)
-            VALUES (?, ?, ?)
-        ''', (post_id, user_id, content))
-        conn.commit()
-        comment_id = cursor.lastrowid
-        conn.close()
-        return comment_id
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO comments (post_id, user_id, content)
+                VALUES (?, ?, ?)
+            ''', (post_id, user_id, content))
+            return cursor.lastrowid
 
     def get_comments(self, post_id: int) -> List[Dict]:
         """Get comments for a post"""
-        conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT c.*, u.display_name, u.sleeper_username
-            FROM comments c
-            JOIN users u ON c.user_id = u.id
-            WHERE c.post_id = ?
-            ORDER BY c.created_at ASC
-        ''', (post_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT c.*, u.display_name, u.sleeper_username
+                FROM comments c
+                JOIN users u ON c.user_id = u.id
+                WHERE c.post_id = ?
+                ORDER BY c.created_at ASC
+            ''', (post_id,)).fetchall()
         return [dict(row) for row in rows]
+
+    def get_comment_counts(self, post_ids: List[int]) -> Dict[int, int]:
+        """Get comment counts for many posts in one grouped query"""
+        if not post_ids:
+            return {}
+        placeholders = ','.join('?' * len(post_ids))
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT post_id, COUNT(*) FROM comments
+                WHERE post_id IN ({placeholders})
+                GROUP BY post_id
+            ''', tuple(post_ids)).fetchall()
+        counts = {post_id: 0 for post_id in post_ids}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def get_comments_for_posts(self, post_ids: List[int], limit_per_post: int = None) -> Dict[int, List[Dict]]:
+        """Get comments for many posts in one query (optionally only the first N per post)"""
+        if not post_ids:
+            return {}
+        placeholders = ','.join('?' * len(post_ids))
+        params = list(post_ids)
+        limit_sql = ""
+        if limit_per_post is not None:
+            limit_sql = "WHERE rn <= ?"
+            params.append(limit_per_post)
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT * FROM (
+                    SELECT c.*, u.display_name, u.sleeper_username,
+                           ROW_NUMBER() OVER (PARTITION BY c.post_id ORDER BY c.created_at, c.id) AS rn
+                    FROM comments c
+                    JOIN users u ON c.user_id = u.id
+                    WHERE c.post_id IN ({placeholders})
+                )
+                {limit_sql}
+                ORDER BY post_id, rn
+            ''', tuple(params)).fetchall()
+        comments = {post_id: [] for post_id in post_ids}
+        for row in rows:
+            comment = dict(row)
+            del comment['rn']
+            comments[comment['post_id']].append(comment)
+        return comments
+
+    def hydrate_posts(self, posts: List[Dict], preview_comments: int = 0, viewer_id: int = None) -> List[Dict]:
+        """
+        Attach comment counts (and optionally the first few comments) to a page of posts
+
+        Sets post['comment_count'], post['comments'] if preview_comments > 0, and
+        post['liked'] if viewer_id is given. Costs a fixed number of queries per
+        call regardless of page size.
+        """
+        post_ids = [post['id'] for post in posts]
+        counts = self.get_comment_counts(post_ids)
+        comments = {}
+        if preview_comments > 0:
+            comments = self.get_comments_for_posts(post_ids, limit_per_post=preview_comments)
+        liked = self.get_liked_post_ids(viewer_id, post_ids) if viewer_id is not None else set()
+        for post in posts:
+            post['comment_count'] = counts[post['id']]
+            if preview_comments > 0:
+                post['comments'] = comments[post['id']]
+            if viewer_id is not None:
+                post['liked'] = post['id'] in liked
+        return posts
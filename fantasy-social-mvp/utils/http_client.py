@@ -0,0 +1,148 @@
+"""
+Shared HTTP session for outbound API calls
+
+One pooled requests.Session per process keeps TCP/TLS connections alive
+between calls. Requests get connect/read timeouts and bounded retries with
+jittered exponential backoff on 429 and 5xx responses. Every attempt first
+takes a token from the process-wide rate limiter.
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.rate_limiter import limiter
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.25     # seconds; doubled on each retry
+BACKOFF_CAP = 4.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint latency, error and retry counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def _entry(self, endpoint: str) -> Dict:
+        if endpoint not in self._stats:
+            self._stats[endpoint] = {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'total_latency': 0.0,
+                'max_latency': 0.0,
+            }
+        return self._stats[endpoint]
+
+    def record(self, endpoint: str, latency: float, error: bool = False):
+        """Record one completed request (including all of its retries)"""
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry['requests'] += 1
+            entry['total_latency'] += latency
+            entry['max_latency'] = max(entry['max_latency'], latency)
+            if error:
+                entry['errors'] += 1
+
+    def record_retry(self, endpoint: str):
+        with self._lock:
+            self._entry(endpoint)['retries'] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Copy of the counters with average latency filled in"""
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._stats.items():
+                result[endpoint] = dict(entry)
+                result[endpoint]['avg_latency'] = (
+                    entry['total_latency'] / entry['requests'] if entry['requests'] else 0.0
+                )
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+metrics = RequestMetrics()
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _build_session(pool_size: int = 16) -> requests.Session:
+    session = requests.Session()
+    # Retries are handled in get() so they can be counted and jittered
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+        'User-Agent': 'fantasy-social-mvp',
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Get the process-wide session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _backoff_delay(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends one"""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def get(url: str, endpoint: str, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        max_retries: int = MAX_RETRIES, headers: Dict = None, stream: bool = False,
+        lane: str = None) -> requests.Response:
+    """
+    GET a URL through the shared session
+
+    endpoint names the metrics bucket (e.g. "league_rosters"). Returns the
+    final response, which may still be a 429/5xx once retries run out; raises
+    the last connection error if every attempt failed to connect. With
+    stream=True the body is left unread (latency then covers headers only).
+    lane picks the rate limiter lane (defaults to rate_limiter.current_lane()).
+    """
+    session = get_session()
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        response = None
+        limiter.acquire(lane)
+        try:
+            response = session.get(url, timeout=timeout, headers=headers, stream=stream)
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                metrics.record(endpoint, time.perf_counter() - start,
+                               error=response.status_code >= 400 and response.status_code != 404)
+                return response
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                metrics.record(endpoint, time.perf_counter() - start, error=True)
+                raise
+        metrics.record_retry(endpoint)
+        delay = _backoff_delay(attempt, response)
+        if response is not None:
+            # An unread streamed body would otherwise keep its pooled connection checked out
+            response.close()
+        time.sleep(delay)
+        attempt += 1
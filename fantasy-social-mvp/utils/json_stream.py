@@ -0,0 +1,93 @@
+"""
+Incremental parsing of large top-level JSON objects
+
+Parses {"key": value, ...} from a stream of byte chunks and yields one
+(key, value) pair at a time, so only the current value and a small read
+buffer are in memory rather than the whole document.
+"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Tuple
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+
+class _Buffer:
+    """Text buffer over a chunk iterator that grows on demand"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read another chunk; returns False at end of stream"""
+        if self.eof:
+            return False
+        # Drop what has already been consumed before appending
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._utf8.decode(chunk)
+                return True
+        self.text += self._utf8.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise ValueError("Unexpected end of JSON stream")
+        return self.text[self.pos]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of JSON stream")
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        """Decode the next complete JSON value, reading more input until it fits"""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number cut off by a chunk boundary ("-1" of "-1.5e3") still decodes,
+            # so only accept a value once the character after it is in the buffer
+            if not self.eof and (end == len(self.text) or self.text[end] not in _DELIMITERS):
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+
+def iter_object_items(chunks: Iterable[bytes]) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) pairs from a JSON object streamed as byte chunks"""
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+    while True:
+        key = buffer.decode_value()
+        buffer.expect(':')
+        yield key, buffer.decode_value()
+        if buffer.peek() == ',':
+            buffer.pos += 1
+            continue
+        buffer.expect('}')
+        return
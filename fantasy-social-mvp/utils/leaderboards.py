@@ -0,0 +1,299 @@
+"""
+Cross-league leaderboards
+
+A batch job walks every connected user's Sleeper leagues, snapshots each
+league's team records into league_team_stats, and aggregates them per user
+into the leaderboard table. Leagues whose rosters haven't changed since the
+last run (same roster version) are skipped, and only the users in changed
+leagues (plus newly connected users already in a snapshotted league) are
+re-aggregated, so a run after a quiet period writes nothing. A league whose
+rosters can't be fetched keeps its previous snapshot, and a league none of
+its connected owners is in any more is removed. The
+Leaderboards page then reads a top-K slice off an index instead of fanning
+out to every user's leagues live.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import rate_limiter
+
+REFRESH_INTERVAL = 900      # seconds between background runs
+TEAM_COLUMNS = ['league_id', 'owner_id', 'wins', 'losses', 'ties',
+                'fpts', 'fpts_decimal', 'fpts_against', 'fpts_against_decimal']
+
+
+def _chunks(items: List, size: int = 500) -> Iterable[List]:
+    """Stay well under SQLite's bound-parameter limit"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _team_rows(league_id: str, rosters: List[Dict]) -> List[tuple]:
+    rows = []
+    for roster in rosters or []:
+        owner_id = roster.get('owner_id')
+        if not owner_id:
+            continue
+        settings = roster.get('settings') or {}
+        rows.append((league_id, owner_id, *(settings.get(column) or 0 for column in TEAM_COLUMNS[2:])))
+    return rows
+
+
+def _version(rows: List[tuple]) -> str:
+    return hashlib.blake2b(json.dumps(rows, separators=(',', ':')).encode(), digest_size=16).hexdigest()
+
+
+class LeaderboardJob:
+    """
+    Incremental batch aggregation of team records into the leaderboard table
+
+    get_user_leagues(sleeper_user_id, sport, season) and
+    get_league_rosters(league_id) supply the Sleeper data (normally the cached
+    SleeperAPI methods).
+    """
+
+    def __init__(self, db, get_user_leagues: Callable, get_league_rosters: Callable):
+        self.db = db
+        self.get_user_leagues = get_user_leagues
+        self.get_league_rosters = get_league_rosters
+
+    def run(self, season: str) -> Dict[str, int]:
+        """Bring the season's leaderboard up to date; returns what changed"""
+        with self.db.connection() as conn:
+            users = conn.execute('SELECT sleeper_user_id FROM users').fetchall()
+
+        league_ids = {}
+        # Owners whose league list came back non-empty; an empty list may be a failed fetch
+        listed_owners = set()
+        for user in users:
+            leagues = self.get_user_leagues(user['sleeper_user_id'], "nfl", season) or []
+            if leagues:
+                listed_owners.add(user['sleeper_user_id'])
+            for league in leagues:
+                if league.get('league_id'):
+                    league_ids[league['league_id']] = None
+
+        # Snapshot every league and keep only the ones whose rosters changed. A
+        # league whose rosters didn't load keeps its previous snapshot
+        snapshots = {}
+        skipped = 0
+        for league_id in league_ids:
+            rosters = self.get_league_rosters(league_id)
+            if not rosters:
+                skipped += 1
+                continue
+            rows = _team_rows(league_id, rosters)
+            snapshots[league_id] = (_version(rows), rows)
+        stored = self._stored_versions(list(snapshots))
+        changed = [league_id for league_id, (version, _) in snapshots.items() if stored.get(league_id) != version]
+
+        dirty_owners = set()
+        if changed:
+            dirty_owners = self._replace_team_stats(season, changed, snapshots)
+        departed = self._departed_leagues(season, league_ids, listed_owners)
+        if departed:
+            dirty_owners.update(self._remove_leagues(departed))
+        dirty_owners.update(self._unranked_owners(season))
+        updated = self._aggregate(season, sorted(dirty_owners)) if dirty_owners else 0
+        return {'leagues': len(snapshots), 'changed_leagues': len(changed), 'skipped_leagues': skipped,
+                'removed_leagues': len(departed), 'updated_users': updated}
+
+    def _stored_versions(self, league_ids: List[str]) -> Dict[str, str]:
+        versions = {}
+        with self.db.connection() as conn:
+            for chunk in _chunks(league_ids):
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT league_id, roster_version FROM league_snapshots WHERE league_id IN ({placeholders})
+                ''', chunk).fetchall()
+                versions.update({row['league_id']: row['roster_version'] for row in rows})
+        return versions
+
+    def _departed_leagues(self, season: str, seen: Dict[str, None], listed_owners: set) -> List[str]:
+        """
+        Snapshotted leagues for the season that no connected user is in any more
+
+        A league this run didn't see is only dropped once every connected owner
+        in it returned a (non-empty) league list without it, or none is left.
+        """
+        with self.db.connection() as conn:
+            rows = conn.execute('''
+                SELECT s.league_id, u.sleeper_user_id
+                FROM league_snapshots s
+                LEFT JOIN league_team_stats t ON t.league_id = s.league_id
+                LEFT JOIN users u ON u.sleeper_user_id = t.owner_id
+                WHERE s.season = ?
+            ''', (season,)).fetchall()
+        keep = {}
+        for row in rows:
+            if row['league_id'] in seen:
+                continue
+            owner_unconfirmed = row['sleeper_user_id'] is not None and row['sleeper_user_id'] not in listed_owners
+            keep[row['league_id']] = keep.get(row['league_id'], False) or owner_unconfirmed
+        return sorted(league_id for league_id, kept in keep.items() if not kept)
+
+    def _remove_leagues(self, league_ids: List[str]) -> set:
+        """Delete these leagues' snapshots and team stats; returns the owners who were in them"""
+        dirty = set()
+        with self.db.connection() as conn:
+            for chunk in _chunks(league_ids):
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT owner_id FROM league_team_stats WHERE league_id IN ({placeholders})
+                ''', chunk).fetchall()
+                dirty.update(row['owner_id'] for row in rows)
+                conn.execute(f'DELETE FROM league_team_stats WHERE league_id IN ({placeholders})', chunk)
+                conn.execute(f'DELETE FROM league_snapshots WHERE league_id IN ({placeholders})', chunk)
+        return dirty
+
+    def _unranked_owners(self, season: str) -> List[str]:
+        """
+        Connected users with team stats but no leaderboard row
+
+        e.g. someone who signed up after their league was last snapshotted:
+        the league's rosters haven't changed, so it isn't rewritten, but they
+        still need aggregating.
+        """
+        with self.db.connection() as conn:
+            rows = conn.execute('''
+                SELECT DISTINCT t.owner_id
+                FROM league_team_stats t
+                JOIN users u ON u.sleeper_user_id = t.owner_id
+                LEFT JOIN leaderboard l ON l.season = t.season AND l.user_id = u.id
+                WHERE t.season = ? AND l.user_id IS NULL
+            ''', (season,)).fetchall()
+        return [row['owner_id'] for row in rows]
+
+    def _replace_team_stats(self, season: str, changed: List[str], snapshots: Dict) -> set:
+        """Rewrite the changed leagues' team stats; returns every owner whose totals may have moved"""
+        frame = pd.DataFrame.from_records(
+            [row for league_id in changed for row in snapshots[league_id][1]], columns=TEAM_COLUMNS
+        )
+        if frame.empty:
+            frame = frame.assign(points_for=[], points_against=[])
+        else:
+            values = frame[TEAM_COLUMNS[2:]].to_numpy(dtype=np.float64)
+            frame['points_for'] = values[:, 3] + values[:, 4] / 100
+            frame['points_against'] = values[:, 5] + values[:, 6] / 100
+
+        records = list(zip(
+            frame['league_id'], frame['owner_id'], [season] * len(frame),
+            frame['wins'].astype(int).tolist(), frame['losses'].astype(int).tolist(),
+            frame['ties'].astype(int).tolist(),
+            frame['points_for'].tolist(), frame['points_against'].tolist(),
+        ))
+
+        with self.db.connection() as conn:
+            dirty = set(frame['owner_id'])
+            for chunk in _chunks(changed):
+                placeholders = ','.join('?' * len(chunk))
+                # Owners who were in these leagues before (e.g. since replaced) need re-aggregating too
+                rows = conn.execute(f'''
+                    SELECT owner_id FROM league_team_stats WHERE league_id IN ({placeholders})
+                ''', chunk).fetchall()
+                dirty.update(row['owner_id'] for row in rows)
+                conn.execute(f'DELETE FROM league_team_stats WHERE league_id IN ({placeholders})', chunk)
+            conn.executemany('''
+                INSERT INTO league_team_stats
+                    (league_id, owner_id, season, wins, losses, ties, points_for, points_against)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', records)
+            conn.executemany('''
+                INSERT OR REPLACE INTO league_snapshots (league_id, season, roster_version, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', [(league_id, season, snapshots[league_id][0]) for league_id in changed])
+        return dirty
+
+    def _aggregate(self, season: str, owner_ids: List[str]) -> int:
+        """Recompute leaderboard rows for these Sleeper owners (connected users only)"""
+        rows = []
+        with self.db.connection() as conn:
+            for chunk in _chunks(owner_ids):
+                placeholders = ','.join('?' * len(chunk))
+                rows.extend(conn.execute(f'''
+                    SELECT u.id AS user_id, t.wins, t.losses, t.ties, t.points_for, t.points_against
+                    FROM league_team_stats t
+                    JOIN users u ON u.sleeper_user_id = t.owner_id
+                    WHERE t.season = ? AND t.owner_id IN ({placeholders})
+                ''', [season, *chunk]).fetchall())
+
+        frame = pd.DataFrame.from_records(
+            [tuple(row) for row in rows],
+            columns=['user_id', 'wins', 'losses', 'ties', 'points_for', 'points_against']
+        )
+        totals = frame.groupby('user_id').agg(
+            leagues=('wins', 'size'), wins=('wins', 'sum'), losses=('losses', 'sum'), ties=('ties', 'sum'),
+            points_for=('points_for', 'sum'), points_against=('points_against', 'sum'),
+        )
+        games = (totals['wins'] + totals['losses']).to_numpy(dtype=np.float64)
+        totals['win_pct'] = np.divide(totals['wins'].to_numpy(dtype=np.float64), games,
+                                      out=np.zeros_like(games), where=games > 0)
+
+        records = [
+            (season, int(user_id), int(row.leagues), int(row.wins), int(row.losses), int(row.ties),
+             float(row.win_pct), float(row.points_for), float(row.points_against))
+            for user_id, row in totals.iterrows()
+        ]
+        with self.db.connection() as conn:
+            # Connected users left with no leagues drop off the board
+            for chunk in _chunks(owner_ids):
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute(f'''
+                    DELETE FROM leaderboard
+                    WHERE season = ? AND user_id IN (SELECT id FROM users WHERE sleeper_user_id IN ({placeholders}))
+                ''', [season, *chunk])
+            conn.executemany('''
+                INSERT INTO leaderboard
+                    (season, user_id, leagues, wins, losses, ties, win_pct, points_for, points_against, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', records)
+        return len(records)
+
+
+_last_run: Dict[str, float] = {}
+_running = set()
+_runs_lock = threading.Lock()
+
+
+def ensure_fresh(job: LeaderboardJob, season: str, interval: int = REFRESH_INTERVAL) -> bool:
+    """
+    Run the job for a season in a background thread if it hasn't run recently
+
+    Returns True if a run was started. At most one run per season is in
+    flight per process; it uses the rate limiter's background lane.
+    """
+    with _runs_lock:
+        if season in _running or time.time() - _last_run.get(season, 0) < interval:
+            return False
+        _running.add(season)
+
+    def run():
+        try:
+            with rate_limiter.lane(rate_limiter.BACKGROUND):
+                job.run(season)
+        except Exception:
+            # Keep the previous board; try again next interval
+            pass
+        finally:
+            with _runs_lock:
+                _running.discard(season)
+                _last_run[season] = time.time()
+
+    threading.Thread(target=run, name=f"leaderboards-{season}", daemon=True).start()
+    return True
+
+
+def is_running(season: str) -> bool:
+    with _runs_lock:
+        return season in _running
+
+
+def last_run(season: str) -> Optional[float]:
+    with _runs_lock:
+        return _last_run.get(season)
@@ -0,0 +1,169 @@
+import atexit
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple
+
+from utils.connection_pool import ConnectionPool
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer for likes and unlikes
+
+    Likes are recorded in memory and group-committed to the likes table and
+    posts.likes flush_interval_ms after the first unwritten change, or as soon
+    as max_pending changes are waiting. The flusher thread sleeps until there
+    is something to write. Readers add pending_delta() to posts.likes so counts
+    stay exact before the flush lands. stop() (also run at interpreter exit)
+    writes whatever is still pending.
+    """
+
+    _buffers: Dict[str, 'LikeBuffer'] = {}
+    _buffers_lock = threading.Lock()
+
+    def __init__(self, pool: ConnectionPool, flush_interval_ms: int = 250, max_pending: int = 100):
+        self.pool = pool
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        # (user_id, post_id) -> True for a pending like, False for a pending unlike
+        self._pending: Dict[Tuple[int, int], bool] = {}
+        self._deltas: Dict[int, int] = defaultdict(int)
+        self._lock = threading.RLock()
+        self._worker = None
+        # Set when changes are waiting, so an idle flusher never wakes up
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        atexit.register(self.stop)
+
+    @classmethod
+    def for_pool(cls, pool: ConnectionPool, **kwargs) -> 'LikeBuffer':
+        """Get the process-wide buffer for a pool's database, creating it on first use"""
+        with cls._buffers_lock:
+            buffer = cls._buffers.get(pool.db_path)
+            if buffer is None:
+                buffer = cls(pool, **kwargs)
+                cls._buffers[pool.db_path] = buffer
+            return buffer
+
+    def _is_liked(self, user_id: int, post_id: int) -> bool:
+        """Current like state, pending changes included"""
+        key = (user_id, post_id)
+        if key in self._pending:
+            return self._pending[key]
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT 1 FROM likes WHERE user_id = ? AND post_id = ?', (user_id, post_id)
+            ).fetchone()
+        return row is not None
+
+    def _set(self, user_id: int, post_id: int, liked: bool) -> bool:
+        """Queue a change of like state; returns False if it's already in that state"""
+        with self._lock:
+            if self._is_liked(user_id, post_id) == liked:
+                return False
+            key = (user_id, post_id)
+            if key in self._pending:
+                # Reverting a change that hasn't been written yet
+                del self._pending[key]
+            else:
+                self._pending[key] = liked
+            self._deltas[post_id] += 1 if liked else -1
+            pending = len(self._pending)
+
+        if pending >= self.max_pending or self._stopped.is_set():
+            self.flush()
+        else:
+            self._ensure_worker()
+            self._changed.set()
+        return True
+
+    def like(self, user_id: int, post_id: int) -> bool:
+        """Like a post; returns False if the user already likes it"""
+        return self._set(user_id, post_id, True)
+
+    def unlike(self, user_id: int, post_id: int) -> bool:
+        """Remove a like; returns False if the user doesn't like the post"""
+        return self._set(user_id, post_id, False)
+
+    def pending_delta(self, post_id: int) -> int:
+        """Likes change for a post that hasn't been flushed yet"""
+        with self._lock:
+            return self._deltas.get(post_id, 0)
+
+    def liked_post_ids(self, user_id: int, post_ids: Iterable[int]) -> Set[int]:
+        """Which of the given posts a user likes, pending changes included"""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return set()
+        placeholders = ','.join('?' * len(post_ids))
+        with self._lock:
+            with self.pool.connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT post_id FROM likes
+                    WHERE user_id = ? AND post_id IN ({placeholders})
+                ''', (user_id, *post_ids)).fetchall()
+            liked = {row[0] for row in rows}
+            for (pending_user, post_id), state in self._pending.items():
+                if pending_user == user_id and post_id in post_ids:
+                    if state:
+                        liked.add(post_id)
+                    else:
+                        liked.discard(post_id)
+        return liked
+
+    def flush(self):
+        """Write every pending change in a single transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            deltas = defaultdict(int)
+            with self.pool.connection() as conn:
+                for (user_id, post_id), liked in self._pending.items():
+                    if liked:
+                        cursor = conn.execute('''
+                            INSERT OR IGNORE INTO likes (user_id, post_id)
+                            SELECT ?, id FROM posts WHERE id = ?
+                        ''', (user_id, post_id))
+                    else:
+                        cursor = conn.execute(
+                            'DELETE FROM likes WHERE user_id = ? AND post_id = ?', (user_id, post_id)
+                        )
+                    # Only count rows that actually changed (another process may have got there first)
+                    if cursor.rowcount == 1:
+                        deltas[post_id] += 1 if liked else -1
+                conn.executemany(
+                    'UPDATE posts SET likes = likes + ? WHERE id = ?',
+                    [(delta, post_id) for post_id, delta in deltas.items() if delta]
+                )
+            self._pending.clear()
+            self._deltas.clear()
+
+    def _ensure_worker(self):
+        """Start the background flusher on first use"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="like-buffer-flush", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._changed.wait()
+            # Let more changes join the batch; stop() cuts the wait short and flushes itself
+            if self._stopped.wait(self.flush_interval):
+                return
+            # Changes made from here on set it again and get their own flush
+            self._changed.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Leave changes pending and retry after another interval
+                self._changed.set()
+
+    def stop(self):
+        """Stop the flusher and write every pending change; later changes are written straight away"""
+        self._stopped.set()
+        self._changed.set()
+        worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+        self.flush()
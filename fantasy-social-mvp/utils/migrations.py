@@ -0,0 +1,472 @@
+"""
+Versioned schema migrations keyed on SQLite's PRAGMA user_version
+
+Each migration runs exactly once per database file. To change the schema,
+append a new function to MIGRATIONS; never edit one that has already shipped.
+"""
+import sqlite3
+from typing import Callable, List
+
+# The FTS5 trigram tokenizer arrived in SQLite 3.34.0
+TRIGRAM_MIN_SQLITE_VERSION = (3, 34, 0)
+
+
+def _create_base_tables(conn: sqlite3.Connection):
+    """Version 1: users, posts, follows and comments"""
+    # Users table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sleeper_username TEXT UNIQUE NOT NULL,
+            sleeper_user_id TEXT UNIQUE NOT NULL,
+            display_name TEXT,
+            bio TEXT,
+            avatar_url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Posts table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            post_type TEXT DEFAULT 'general',
+            league_id TEXT,
+            metadata TEXT,
+            likes INTEGER DEFAULT 0,
+            visibility TEXT DEFAULT 'public',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Add visibility column if it doesn't exist (databases created before versioning)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(posts)")]
+    if 'visibility' not in columns:
+        conn.execute("ALTER TABLE posts ADD COLUMN visibility TEXT DEFAULT 'public'")
+
+    # Follows table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS follows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            follower_id INTEGER NOT NULL,
+            following_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (follower_id) REFERENCES users (id),
+            FOREIGN KEY (following_id) REFERENCES users (id),
+            UNIQUE(follower_id, following_id)
+        )
+    ''')
+
+    # Comments table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (post_id) REFERENCES posts (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _add_feed_indexes(conn: sqlite3.Connection):
+    """Version 2: secondary indexes for feed, profile, stats and comment queries"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_user_created ON posts (user_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_visibility_created ON posts (visibility, created_at)')
+    # follows(follower_id, ...) is already covered by the UNIQUE(follower_id, following_id) index
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_follows_following ON follows (following_id, follower_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_post_created ON comments (post_id, created_at)')
+
+
+def rebuild_user_counters(conn: sqlite3.Connection):
+    """Recompute every row of user_counters from the source tables"""
+    conn.execute('DELETE FROM user_counters')
+    conn.execute('''
+        INSERT INTO user_counters (user_id, post_count, follower_count, following_count, total_likes_received)
+        SELECT u.id,
+               COALESCE(p.n, 0),
+               COALESCE(fr.n, 0),
+               COALESCE(fg.n, 0),
+               COALESCE(p.likes, 0)
+        FROM users u
+        LEFT JOIN (SELECT user_id, COUNT(*) AS n, SUM(likes) AS likes FROM posts GROUP BY user_id) p
+            ON p.user_id = u.id
+        LEFT JOIN (SELECT following_id, COUNT(*) AS n FROM follows GROUP BY following_id) fr
+            ON fr.following_id = u.id
+        LEFT JOIN (SELECT follower_id, COUNT(*) AS n FROM follows GROUP BY follower_id) fg
+            ON fg.follower_id = u.id
+    ''')
+
+
+def _add_user_counters(conn: sqlite3.Connection):
+    """Version 3: trigger-maintained per-user counters"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_counters (
+            user_id INTEGER PRIMARY KEY,
+            post_count INTEGER NOT NULL DEFAULT 0,
+            follower_count INTEGER NOT NULL DEFAULT 0,
+            following_count INTEGER NOT NULL DEFAULT 0,
+            total_likes_received INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Expression index backing the "most active" leaderboard ordering
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_counters_activity
+        ON user_counters ((post_count + follower_count) DESC)
+    ''')
+
+    # Executed one by one: executescript() would commit the migration transaction
+    triggers = [
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_insert AFTER INSERT ON users
+        BEGIN
+            INSERT OR IGNORE INTO user_counters (user_id) VALUES (NEW.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_delete AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_counters WHERE user_id = OLD.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_counters_insert AFTER INSERT ON posts
+        BEGIN
+            INSERT OR IGNORE INTO user_counters (user_id) VALUES (NEW.user_id);
+            UPDATE user_counters
+            SET post_count = post_count + 1,
+                total_likes_received = total_likes_received + COALESCE(NEW.likes, 0)
+            WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_counters_delete AFTER DELETE ON posts
+        BEGIN
+            UPDATE user_counters
+            SET post_count = post_count - 1,
+                total_likes_received = total_likes_received - COALESCE(OLD.likes, 0)
+            WHERE user_id = OLD.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_counters_likes AFTER UPDATE OF likes ON posts
+        BEGIN
+            UPDATE user_counters
+            SET total_likes_received = total_likes_received + COALESCE(NEW.likes, 0) - COALESCE(OLD.likes, 0)
+            WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_follows_counters_insert AFTER INSERT ON follows
+        BEGIN
+            INSERT OR IGNORE INTO user_counters (user_id) VALUES (NEW.follower_id);
+            INSERT OR IGNORE INTO user_counters (user_id) VALUES (NEW.following_id);
+            UPDATE user_counters SET following_count = following_count + 1 WHERE user_id = NEW.follower_id;
+            UPDATE user_counters SET follower_count = follower_count + 1 WHERE user_id = NEW.following_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_follows_counters_delete AFTER DELETE ON follows
+        BEGIN
+            UPDATE user_counters SET following_count = following_count - 1 WHERE user_id = OLD.follower_id;
+            UPDATE user_counters SET follower_count = follower_count - 1 WHERE user_id = OLD.following_id;
+        END
+        ''',
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    rebuild_user_counters(conn)
+
+
+def rebuild_timelines(conn: sqlite3.Connection, fanout_follower_limit: int = None):
+    """
+    Recompute every home timeline from posts and follows
+
+    Authors with more than fanout_follower_limit followers are left out, matching
+    the fan-out-on-read path used for them at write time.
+    """
+    conn.execute('DELETE FROM timeline')
+    # Everyone's own posts
+    conn.execute('''
+        INSERT INTO timeline (user_id, post_id, author_id, created_at)
+        SELECT user_id, id, user_id, created_at FROM posts
+    ''')
+    # Posts from everyone they follow
+    conn.execute('''
+        INSERT OR IGNORE INTO timeline (user_id, post_id, author_id, created_at)
+        SELECT f.follower_id, p.id, p.user_id, p.created_at
+        FROM follows f
+        JOIN posts p ON p.user_id = f.following_id
+        LEFT JOIN user_counters c ON c.user_id = f.following_id
+        WHERE ? IS NULL OR COALESCE(c.follower_count, 0) <= ?
+    ''', (fanout_follower_limit, fanout_follower_limit))
+
+
+def _add_timelines(conn: sqlite3.Connection):
+    """Version 4: materialized home timelines for the private feed"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS timeline (
+            user_id INTEGER NOT NULL,
+            post_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, created_at, post_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_timeline_post ON timeline (post_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_timeline_user_author ON timeline (user_id, author_id)')
+
+    # Deleted posts leave every timeline they were fanned out to
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_timeline_delete AFTER DELETE ON posts
+        BEGIN
+            DELETE FROM timeline WHERE post_id = OLD.id;
+        END
+    ''')
+
+    rebuild_timelines(conn)
+
+
+def _add_likes(conn: sqlite3.Connection):
+    """Version 5: per-user likes for dedupe and unlike"""
+    # posts.likes stays the aggregate count; likes made before this table existed
+    # have no owner and remain in the count
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS likes (
+            user_id INTEGER NOT NULL,
+            post_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, post_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_likes_post ON likes (post_id)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_likes_delete AFTER DELETE ON posts
+        BEGIN
+            DELETE FROM likes WHERE post_id = OLD.id;
+        END
+    ''')
+
+
+def _add_leaderboards(conn: sqlite3.Connection):
+    """Version 6: per-league team stat snapshots and the cross-league leaderboard"""
+    # One row per league we've aggregated, with the roster version it was built from
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS league_snapshots (
+            league_id TEXT PRIMARY KEY,
+            season TEXT NOT NULL,
+            roster_version TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Columnar snapshot of every team's record in those leagues, keyed by Sleeper owner
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS league_team_stats (
+            league_id TEXT NOT NULL,
+            owner_id TEXT NOT NULL,
+            season TEXT NOT NULL,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            ties INTEGER NOT NULL DEFAULT 0,
+            points_for REAL NOT NULL DEFAULT 0,
+            points_against REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (league_id, owner_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_league_team_stats_owner ON league_team_stats (season, owner_id)')
+
+    # Totals across each connected user's leagues, one row per user per season
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            season TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            leagues INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            ties INTEGER NOT NULL DEFAULT 0,
+            win_pct REAL NOT NULL DEFAULT 0,
+            points_for REAL NOT NULL DEFAULT 0,
+            points_against REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (season, user_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+    # One index per ranking, so each board is a top-K index walk
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_win_pct ON leaderboard (season, win_pct DESC, points_for DESC)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_points_for ON leaderboard (season, points_for DESC)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_points_against ON leaderboard (season, points_against DESC)')
+
+
+def _add_post_search(conn: sqlite3.Connection):
+    """Version 7: full-text search over post content, type and attached player names"""
+    # Attached players' names, denormalized so the FTS index can read them as a column
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(posts)').fetchall()}
+    if 'player_names' not in columns:
+        conn.execute('ALTER TABLE posts ADD COLUMN player_names TEXT')
+    conn.execute('''
+        UPDATE posts SET player_names = (
+            SELECT group_concat(json_extract(value, '$.name'), ' ')
+            FROM json_each(posts.metadata, '$.players')
+        )
+        WHERE metadata IS NOT NULL AND json_valid(metadata)
+    ''')
+
+    # External-content index: the text lives in posts, FTS only stores the index
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+            content, post_type, player_names,
+            content='posts',
+            content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_fts_insert AFTER INSERT ON posts
+        BEGIN
+            INSERT INTO posts_fts (rowid, content, post_type, player_names)
+            VALUES (NEW.id, NEW.content, NEW.post_type, NEW.player_names);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_fts_delete AFTER DELETE ON posts
+        BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, content, post_type, player_names)
+            VALUES ('delete', OLD.id, OLD.content, OLD.post_type, OLD.player_names);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_posts_fts_update AFTER UPDATE OF content, post_type, player_names ON posts
+        BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, content, post_type, player_names)
+            VALUES ('delete', OLD.id, OLD.content, OLD.post_type, OLD.player_names);
+            INSERT INTO posts_fts (rowid, content, post_type, player_names)
+            VALUES (NEW.id, NEW.content, NEW.post_type, NEW.player_names);
+        END
+    ''')
+    conn.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+
+def _add_user_search(conn: sqlite3.Connection):
+    """Version 8: substring search over usernames and display names"""
+    # Trigrams need 3 characters; shorter queries are prefix range scans on these.
+    # They are also all there is where SQLite predates the trigram tokenizer
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users (lower(sleeper_username))')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_display_name_lower ON users (lower(display_name))')
+    if sqlite3.sqlite_version_info < TRIGRAM_MIN_SQLITE_VERSION:
+        return
+
+    # Trigram index: any 3+ character fragment of either name is an index lookup
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            sleeper_username, display_name,
+            content='users',
+            content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO users_fts (rowid, sleeper_username, display_name)
+            VALUES (NEW.id, NEW.sleeper_username, NEW.display_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, sleeper_username, display_name)
+            VALUES ('delete', OLD.id, OLD.sleeper_username, OLD.display_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_update AFTER UPDATE OF sleeper_username, display_name ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, sleeper_username, display_name)
+            VALUES ('delete', OLD.id, OLD.sleeper_username, OLD.display_name);
+            INSERT INTO users_fts (rowid, sleeper_username, display_name)
+            VALUES (NEW.id, NEW.sleeper_username, NEW.display_name);
+        END
+    ''')
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+
+def _add_follow_events(conn: sqlite3.Connection):
+    """Version 9: append-only log of follows and unfollows"""
+    # In-memory follow graphs tail this log to stay current without rereading follows
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS follow_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            follower_id INTEGER NOT NULL,
+            following_id INTEGER NOT NULL,
+            followed INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_follows_events_insert AFTER INSERT ON follows
+        BEGIN
+            INSERT INTO follow_events (follower_id, following_id, followed)
+            VALUES (NEW.follower_id, NEW.following_id, 1);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_follows_events_delete AFTER DELETE ON follows
+        BEGIN
+            INSERT INTO follow_events (follower_id, following_id, followed)
+            VALUES (OLD.follower_id, OLD.following_id, 0);
+        END
+    ''')
+
+
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _create_base_tables,
+    _add_feed_indexes,
+    _add_user_counters,
+    _add_timelines,
+    _add_likes,
+    _add_leaderboards,
+    _add_post_search,
+    _add_user_search,
+    _add_follow_events,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Read the schema version stored in the database file"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply any pending migrations and return the resulting schema version
+
+    Up-to-date databases cost a single PRAGMA read. Pending migrations run
+    inside one write transaction so concurrent processes can't apply them twice.
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Re-check now that we hold the write lock
+        version = get_schema_version(conn)
+        for migration in MIGRATIONS[version:]:
+            migration(conn)
+            version += 1
+        conn.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return version
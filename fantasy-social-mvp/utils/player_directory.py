@@ -0,0 +1,75 @@
+"""
+Compact in-memory player directory
+
+Holds the five player fields the app reads in __slots__ records instead of the
+full dict Sleeper returns for each player. Position, team and injury status
+repeat across thousands of players and are interned, so each distinct value is
+stored once.
+"""
+import sys
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class PlayerRecord:
+    """One player's display fields"""
+
+    __slots__ = ('first_name', 'last_name', 'position', 'team', 'injury_status')
+
+    def __init__(self, first_name: str = None, last_name: str = None, position: str = None,
+                 team: str = None, injury_status: str = None):
+        self.first_name = first_name
+        self.last_name = last_name
+        self.position = _intern(position)
+        self.team = _intern(team)
+        self.injury_status = _intern(injury_status)
+
+    def get(self, field: str, default=None):
+        """dict-style access, so records can stand in for raw player dicts"""
+        return getattr(self, field, default) if field in self.__slots__ else default
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class PlayerDirectory:
+    """Player records keyed by Sleeper player id, with batch lookup"""
+
+    __slots__ = ('_players',)
+
+    def __init__(self, players: Dict[str, PlayerRecord] = None):
+        self._players = players or {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> 'PlayerDirectory':
+        """Build from (player_id, first_name, last_name, position, team, injury_status) tuples"""
+        return cls({player_id: PlayerRecord(*fields) for player_id, *fields in rows})
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Dict]) -> 'PlayerDirectory':
+        """Build from a raw /players/nfl response, dropping every other field"""
+        return cls({
+            player_id: PlayerRecord(*(player.get(field) for field in PlayerRecord.__slots__))
+            for player_id, player in payload.items()
+            if isinstance(player, dict)
+        })
+
+    def get(self, player_id: str, default=None) -> Optional[PlayerRecord]:
+        return self._players.get(player_id, default)
+
+    def lookup(self, player_ids: Iterable[str]) -> Dict[str, PlayerRecord]:
+        """Get records for the given ids (unknown ids are left out)"""
+        players = self._players
+        return {player_id: players[player_id] for player_id in player_ids if player_id in players}
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self._players
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._players)
@@ -0,0 +1,202 @@
+"""
+Persistent on-disk NFL player directory
+
+The /players/nfl payload is several megabytes and changes at most a few times
+a day. Rather than every process downloading it and holding the whole thing in
+memory, it is stored once in a local SQLite file shared by all processes and
+refreshed in the background with conditional requests. Lookups read only the
+player ids they need.
+"""
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from utils import http_client, rate_limiter
+from utils.json_stream import iter_object_items
+from utils.connection_pool import ConnectionPool
+from utils.player_directory import PlayerDirectory, PlayerRecord
+
+# Only these fields are kept; the app never reads the rest of a player record
+PLAYER_FIELDS = PlayerRecord.__slots__
+
+DEFAULT_STORE_PATH = "sleeper_players.db"
+REFRESH_INTERVAL = 3600     # seconds between conditional refreshes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PlayerStore:
+    """SQLite-backed player directory refreshed from the Sleeper API"""
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH, refresh_interval: int = REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.pool = ConnectionPool.for_path(db_path)
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+        self._directory = None
+        self._init_db()
+
+    def _init_db(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS players (
+                    player_id TEXT PRIMARY KEY,
+                    first_name TEXT,
+                    last_name TEXT,
+                    position TEXT,
+                    team TEXT,
+                    injury_status TEXT
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+
+    def _get_meta(self, conn, key: str) -> Optional[str]:
+        row = conn.execute('SELECT value FROM store_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key: str, value):
+        if value is None:
+            return
+        conn.execute('INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def last_refreshed(self) -> float:
+        """Unix time of the last successful refresh (0 if never)"""
+        with self.pool.connection() as conn:
+            value = self._get_meta(conn, 'fetched_at')
+        return float(value) if value else 0.0
+
+    def is_stale(self) -> bool:
+        return time.time() - self.last_refreshed() > self.refresh_interval
+
+    def refresh(self, url: str, force: bool = False) -> bool:
+        """
+        Download the player directory if it has changed
+
+        Sends If-None-Match / If-Modified-Since from the previous download, so an
+        unchanged directory costs a 304. Returns True if players were rewritten.
+        """
+        with self._refresh_lock:
+            # Another thread or process may have refreshed while we waited
+            if not force and not self.is_stale():
+                return False
+
+            with self.pool.connection() as conn:
+                etag = self._get_meta(conn, 'etag')
+                last_modified = self._get_meta(conn, 'last_modified')
+                has_players = conn.execute('SELECT 1 FROM players LIMIT 1').fetchone() is not None
+
+            headers = {}
+            if has_players and etag:
+                headers['If-None-Match'] = etag
+            if has_players and last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+            response = http_client.get(url, "players", headers=headers, stream=True)
+            with response:
+                if response.status_code == 304:
+                    with self.pool.connection() as conn:
+                        self._set_meta(conn, 'fetched_at', time.time())
+                    return False
+                if response.status_code != 200:
+                    return False
+
+                # Parse the body chunk by chunk and keep only the projected fields,
+                # so the raw document is never held in memory
+                rows = [
+                    (player_id, *(player.get(field) for field in PLAYER_FIELDS))
+                    for player_id, player in iter_object_items(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+                    if isinstance(player, dict)
+                ]
+            # Swap the whole directory in one transaction so readers never see half of it
+            with self.pool.connection() as conn:
+                conn.execute('DELETE FROM players')
+                conn.executemany('INSERT INTO players VALUES (?, ?, ?, ?, ?, ?)', rows)
+                self._set_meta(conn, 'etag', response.headers.get('ETag'))
+                self._set_meta(conn, 'last_modified', response.headers.get('Last-Modified'))
+                self._set_meta(conn, 'fetched_at', time.time())
+            return True
+
+    def ensure_fresh(self, url: str):
+        """
+        Make sure the store can serve lookups
+
+        An empty store is filled synchronously. A stale one keeps serving while
+        the background refresher downloads a new copy.
+        """
+        if self.last_refreshed() == 0:
+            self.refresh(url, force=True)
+        self.start_refresher(url)
+
+    def start_refresher(self, url: str):
+        """Start the background refresh thread (once per process)"""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    with rate_limiter.lane(rate_limiter.BACKGROUND):
+                        self.refresh(url)
+                except Exception:
+                    # Keep serving the copy we have; try again next interval
+                    pass
+                time.sleep(min(self.refresh_interval, 300))
+
+        self._refresher = threading.Thread(target=run, name="player-store-refresh", daemon=True)
+        self._refresher.start()
+
+    def lookup(self, player_ids: Iterable[str]) -> Dict[str, PlayerRecord]:
+        """Get the stored fields for the given player ids (unknown ids are left out)"""
+        player_ids = list(dict.fromkeys(player_ids))
+        if not player_ids:
+            return {}
+        players = {}
+        with self.pool.connection() as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(player_ids), 500):
+                chunk = player_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f'SELECT * FROM players WHERE player_id IN ({placeholders})', chunk
+                ).fetchall()
+                for row in rows:
+                    players[row['player_id']] = PlayerRecord(*(row[field] for field in PLAYER_FIELDS))
+        return players
+
+    def all_players(self) -> PlayerDirectory:
+        """
+        Every stored player as a compact in-memory directory
+
+        The directory is rebuilt only when the store has been refreshed since
+        the last call. Prefer lookup() for anything on a page render path.
+        """
+        version = self.last_refreshed()
+        cached = self._directory
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT player_id, {', '.join(PLAYER_FIELDS)} FROM players"
+            ).fetchall()
+        directory = PlayerDirectory.from_rows(tuple(row) for row in rows)
+        self._directory = (version, directory)
+        return directory
+
+
+_store: Optional[PlayerStore] = None
+_store_lock = threading.Lock()
+
+
+def get_player_store() -> PlayerStore:
+    """Get the process-wide player store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PlayerStore()
+    return _store
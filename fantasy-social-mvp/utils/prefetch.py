@@ -0,0 +1,186 @@
+"""
+Background prefetching for recently active users
+
+Every first page view after login used to pay cold-cache latency for the
+user's leagues, rosters and league members. The scheduler remembers who has
+been active recently and, on a fixed cadence, refreshes their Sleeper data in
+the API cache shortly before it expires. It runs more often on NFL game days
+and never spends more than a fixed number of upstream requests per cycle.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+    _GAME_TZ = ZoneInfo("America/New_York")
+except Exception:
+    # No tz database available; game-day detection falls back to local time
+    _GAME_TZ = None
+
+from utils import rate_limiter
+
+PREFETCH_INTERVAL = 240             # seconds between cycles; under the 300s roster TTL
+GAME_DAY_PREFETCH_INTERVAL = 90
+PREFETCH_SLACK = 30                 # minimum allowance for a cycle's own run time
+ACTIVE_WINDOW = 2 * 3600            # users seen within this many seconds are prefetched
+MAX_TRACKED_USERS = 1000
+REQUEST_BUDGET = 150                # upstream requests per cycle, across all users
+MIN_REFRESH_AHEAD = 0.25            # never refresh later than the last quarter of a TTL
+GAME_DAYS = {0, 3, 6}               # Monday, Thursday, Sunday (US Eastern)
+
+
+class RequestBudget:
+    """
+    Counts down upstream requests allowed in one prefetch cycle
+
+    horizon is how many seconds this cycle has to cover: anything that would
+    expire sooner must be refreshed now, because the next cycle is too late.
+    """
+
+    def __init__(self, limit: int, horizon: float = 0):
+        self.limit = limit
+        self.horizon = horizon
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.spent >= self.limit:
+                return False
+            self.spent += 1
+            return True
+
+    @property
+    def exhausted(self) -> bool:
+        return self.spent >= self.limit
+
+    def refresh_ahead(self, ttl: float) -> float:
+        """Fraction of a TTL to refresh ahead so an entry can't expire before the next cycle"""
+        if ttl <= 0:
+            return 1.0
+        return min(1.0, max(MIN_REFRESH_AHEAD, self.horizon / ttl))
+
+
+def is_game_day(now: datetime = None) -> bool:
+    now = now or datetime.now(_GAME_TZ)
+    return now.weekday() in GAME_DAYS
+
+
+class PrefetchScheduler:
+    """
+    Keeps active users' Sleeper data warm in the API cache
+
+    warm_user(user_id, budget) does the actual prefetching for one user,
+    taking from the budget before each upstream call.
+    """
+
+    def __init__(self, warm_user: Callable[[str, RequestBudget], None],
+                 interval: int = PREFETCH_INTERVAL, game_day_interval: int = GAME_DAY_PREFETCH_INTERVAL,
+                 request_budget: int = REQUEST_BUDGET, active_window: int = ACTIVE_WINDOW):
+        self.warm_user = warm_user
+        self.interval = interval
+        self.game_day_interval = game_day_interval
+        self.request_budget = request_budget
+        self.active_window = active_window
+        self._active: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            'cycles': 0,
+            'users_warmed': 0,
+            'requests': 0,
+            'budget_exhausted': 0,
+            'errors': 0,
+            'last_cycle_at': 0.0,
+            'last_cycle_seconds': 0.0,
+        }
+
+    def track(self, user_id: str):
+        """Record that a user is active (called on every page load)"""
+        if not user_id:
+            return
+        with self._lock:
+            self._active[user_id] = time.time()
+            if len(self._active) > MAX_TRACKED_USERS:
+                oldest = min(self._active, key=self._active.get)
+                del self._active[oldest]
+
+    def active_users(self) -> List[str]:
+        """Users seen within the active window, most recent first"""
+        cutoff = time.time() - self.active_window
+        with self._lock:
+            for user_id in [u for u, seen in self._active.items() if seen < cutoff]:
+                del self._active[user_id]
+            return sorted(self._active, key=self._active.get, reverse=True)
+
+    def current_interval(self) -> int:
+        return self.game_day_interval if is_game_day() else self.interval
+
+    def run_once(self) -> RequestBudget:
+        """Warm every active user's data, most recent first, until the budget runs out"""
+        start = time.time()
+        # The next cycle starts an interval after this one ends, and reaches a
+        # given key about as far into its run as this one did
+        with self._lock:
+            run_time = max(PREFETCH_SLACK, self._stats['last_cycle_seconds'])
+        budget = RequestBudget(self.request_budget, horizon=self.current_interval() + run_time)
+        warmed = 0
+        errors = 0
+        with rate_limiter.lane(rate_limiter.BACKGROUND):
+            for user_id in self.active_users():
+                if budget.exhausted:
+                    break
+                try:
+                    self.warm_user(user_id, budget)
+                    warmed += 1
+                except Exception:
+                    errors += 1
+        with self._lock:
+            self._stats['cycles'] += 1
+            self._stats['users_warmed'] += warmed
+            self._stats['requests'] += budget.spent
+            self._stats['errors'] += errors
+            if budget.exhausted:
+                self._stats['budget_exhausted'] += 1
+            self._stats['last_cycle_at'] = start
+            self._stats['last_cycle_seconds'] = time.time() - start
+        return budget
+
+    def start(self):
+        """Start the prefetch thread (once per process)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.current_interval())
+                try:
+                    self.run_once()
+                except Exception:
+                    pass
+
+        self._thread = threading.Thread(target=run, name="sleeper-prefetch", daemon=True)
+        self._thread.start()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active_users'] = len(self._active)
+        return stats
+
+
+_scheduler: Optional[PrefetchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_prefetch_scheduler(warm_user: Callable[[str, RequestBudget], None]) -> PrefetchScheduler:
+    """Get the process-wide scheduler, creating and starting it on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = PrefetchScheduler(warm_user)
+                _scheduler.start()
+    return _scheduler
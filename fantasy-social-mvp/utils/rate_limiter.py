@@ -0,0 +1,234 @@
+"""
+Client-side rate limiting for outbound API calls
+
+A process-wide token bucket caps how fast we call Sleeper, so a burst of
+logins and profile loads queues briefly here instead of tripping 429s
+upstream. Waiters are served in two lanes: interactive page loads always go
+ahead of background work (stale refreshes, prefetching, the player store).
+Background work that an interactive caller starts waiting on can be promoted
+to the interactive lane, including a request already queued here.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+LANES = (INTERACTIVE, BACKGROUND)
+
+# Sleeper asks clients to stay under 1000 calls a minute; leave headroom
+DEFAULT_RATE = float(os.environ.get("SLEEPER_RATE_LIMIT", "12"))   # requests per second
+DEFAULT_BURST = int(os.environ.get("SLEEPER_RATE_BURST", "20"))
+
+_current_lane = contextvars.ContextVar('rate_limit_lane', default=INTERACTIVE)
+_current_promotion = contextvars.ContextVar('rate_limit_promotion', default=None)
+
+
+@contextmanager
+def lane(name: str) -> Iterator[None]:
+    """Run the enclosed requests in the given lane (requests default to interactive)"""
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane() -> str:
+    return _current_lane.get()
+
+
+class Promotion:
+    """
+    Handle for moving a unit of background work to the interactive lane
+
+    Requests made under promotable(promotion) use their normal lane until
+    promote() is called (from any thread). From then on they are interactive,
+    and any of them already waiting for a token moves to the interactive queue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.promoted = False
+        self._waiting = []
+
+    def promote(self) -> bool:
+        """Move the work to the interactive lane; False if it already was"""
+        with self._lock:
+            if self.promoted:
+                return False
+            self.promoted = True
+            waiting = list(self._waiting)
+        for bucket, ticket in waiting:
+            bucket._promote(ticket)
+        return True
+
+    def _register(self, bucket: 'TokenBucket', ticket: '_Ticket'):
+        with self._lock:
+            if self.promoted:
+                ticket.lane = INTERACTIVE
+            else:
+                self._waiting.append((bucket, ticket))
+
+    def _unregister(self, bucket: 'TokenBucket', ticket: '_Ticket'):
+        with self._lock:
+            if (bucket, ticket) in self._waiting:
+                self._waiting.remove((bucket, ticket))
+
+
+@contextmanager
+def promotable(promotion: Promotion) -> Iterator[None]:
+    """Let promotion.promote() move the enclosed requests to the interactive lane"""
+    token = _current_promotion.set(promotion)
+    try:
+        yield
+    finally:
+        _current_promotion.reset(token)
+
+
+class _Ticket:
+    """One waiter's place in a lane queue (the lane changes if it is promoted)"""
+    __slots__ = ('lane',)
+
+    def __init__(self, lane: str):
+        self.lane = lane
+
+
+class TokenBucket:
+    """
+    Token bucket with prioritised FIFO lanes
+
+    Tokens refill continuously at `rate` per second up to `burst`. Within a lane
+    waiters are served in arrival order, and a background waiter only gets a
+    token when no interactive waiter is queued. A promoted background waiter
+    joins the back of the interactive queue.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._queues = {name: deque() for name in LANES}
+        self._stats = {
+            name: {
+                'acquired': 0,
+                'timeouts': 0,
+                'total_wait': 0.0,
+                'max_wait': 0.0,
+                'max_queue_depth': 0,
+                'promoted': 0,
+            }
+            for name in LANES
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _is_next(self, ticket: _Ticket) -> bool:
+        if self._queues[ticket.lane][0] is not ticket:
+            return False
+        return ticket.lane == INTERACTIVE or not self._queues[INTERACTIVE]
+
+    def _promote(self, ticket: _Ticket):
+        """Move a waiting background ticket to the back of the interactive queue"""
+        with self._cond:
+            if ticket.lane == INTERACTIVE:
+                return
+            if ticket in self._queues[ticket.lane]:
+                self._queues[ticket.lane].remove(ticket)
+                self._stats[ticket.lane]['promoted'] += 1
+                ticket.lane = INTERACTIVE
+                self._enqueue(ticket)
+            else:
+                # Not queued yet (or already served): it will use the interactive lane
+                ticket.lane = INTERACTIVE
+            self._cond.notify_all()
+
+    def acquire(self, name: str = None, timeout: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for it if necessary
+
+        name defaults to the current lane(). Returns False if no token could be
+        had within timeout seconds (None waits indefinitely). Inside promotable(),
+        the request moves to the interactive lane once it is promoted.
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        ticket = _Ticket(name or current_lane())
+        promotion = _current_promotion.get()
+        with self._cond:
+            # Promotion never holds its own lock while taking ours, so this nesting is safe
+            if promotion is not None:
+                promotion._register(self, ticket)
+            self._enqueue(ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._is_next(ticket) and self._tokens >= 1:
+                        self._tokens -= 1
+                        waited = time.monotonic() - start
+                        stats = self._stats[ticket.lane]
+                        stats['acquired'] += 1
+                        stats['total_wait'] += waited
+                        stats['max_wait'] = max(stats['max_wait'], waited)
+                        return True
+
+                    # Sleep until the next token is due; a waiter that isn't
+                    # next in line is woken when someone ahead of it leaves
+                    wait = (1 - self._tokens) / self.rate if self._tokens < 1 else None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats[ticket.lane]['timeouts'] += 1
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._queues[ticket.lane].remove(ticket)
+                if promotion is not None:
+                    promotion._unregister(self, ticket)
+                self._cond.notify_all()
+
+    def _enqueue(self, ticket: _Ticket):
+        queue = self._queues[ticket.lane]
+        queue.append(ticket)
+        stats = self._stats[ticket.lane]
+        stats['max_queue_depth'] = max(stats['max_queue_depth'], len(queue))
+
+    def queue_depth(self) -> Dict[str, int]:
+        with self._cond:
+            return {name: len(queue) for name, queue in self._queues.items()}
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-lane acquisitions, timeouts, wait times, queue depth and promotions"""
+        with self._cond:
+            self._refill()
+            result = {}
+            for name, entry in self._stats.items():
+                result[name] = dict(entry)
+                result[name]['queue_depth'] = len(self._queues[name])
+                result[name]['avg_wait'] = entry['total_wait'] / entry['acquired'] if entry['acquired'] else 0.0
+            result['tokens'] = self._tokens
+            return result
+
+    def configure(self, rate: float = None, burst: int = None):
+        """Change the limit at runtime"""
+        with self._cond:
+            self._refill()
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+                self._tokens = min(self._tokens, burst)
+            self._cond.notify_all()
+
+
+limiter = TokenBucket()
@@ -0,0 +1,114 @@
+"""
+Per-league roster lookups
+
+A league's roster list is scanned once to build owner_id and roster_id
+indexes, and every roster's players are resolved to display details in one
+pass with a single player lookup. A player on several rosters (or listed as
+both a player and a starter) shares one detail dict.
+
+Building an index is linear in the number of rosters, so it is rebuilt from
+whatever the API cache currently returns. Only name resolution is memoized,
+per league and roster version, so fresh rosters are picked up immediately.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MAX_CACHED_LEAGUES = 512
+
+_resolved: 'OrderedDict[str, Tuple[str, Dict[int, Dict]]]' = OrderedDict()
+_resolved_lock = threading.Lock()
+
+
+def player_detail(player_id: str, player) -> Dict:
+    """Display details for one player record"""
+    return {
+        'id': player_id,
+        'name': f"{player.get('first_name', '')} {player.get('last_name', '')}".strip(),
+        'position': player.get('position', 'N/A'),
+        'team': player.get('team', 'N/A'),
+        'status': player.get('injury_status', 'Active')
+    }
+
+
+def attach_player_details(roster: Dict, details: Dict[str, Dict]) -> Dict:
+    """Copy of a roster with player_details / starter_details drawn from shared detail dicts"""
+    roster_copy = roster.copy()
+    if roster_copy.get('players'):
+        roster_copy['player_details'] = [details[pid] for pid in roster_copy['players'] if pid in details]
+    if roster_copy.get('starters'):
+        roster_copy['starter_details'] = [details[pid] for pid in roster_copy['starters'] if pid in details]
+    return roster_copy
+
+
+def roster_player_ids(rosters: Iterable[Dict]) -> List[str]:
+    """Every distinct player id across rosters (players and starters)"""
+    ids = {}
+    for roster in rosters:
+        for player_id in (roster.get('players') or []) + (roster.get('starters') or []):
+            ids[player_id] = None
+    return list(ids)
+
+
+def roster_version(rosters: List[Dict]) -> str:
+    """Fingerprint of a roster list; changes whenever any roster does"""
+    text = json.dumps(rosters or [], sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def resolve_rosters(rosters: List[Dict], players: Dict) -> Dict[int, Dict]:
+    """Every roster with player details from players ({id: record}), keyed by roster_id"""
+    details = {player_id: player_detail(player_id, player) for player_id, player in players.items()}
+    return {roster.get('roster_id'): attach_player_details(roster, details) for roster in rosters}
+
+
+class RosterIndex:
+    """A league's rosters indexed by owner_id and roster_id"""
+
+    def __init__(self, rosters: List[Dict]):
+        self.rosters = rosters or []
+        self.by_owner: Dict[str, Dict] = {}
+        self.by_roster_id: Dict[int, Dict] = {}
+        for roster in self.rosters:
+            if roster.get('owner_id') is not None:
+                self.by_owner[roster['owner_id']] = roster
+            if roster.get('roster_id') is not None:
+                self.by_roster_id[roster['roster_id']] = roster
+
+    def owner(self, owner_id: str) -> Optional[Dict]:
+        """Roster owned by a Sleeper user id"""
+        return self.by_owner.get(owner_id)
+
+    def roster(self, roster_id: int) -> Optional[Dict]:
+        return self.by_roster_id.get(roster_id)
+
+
+def resolve_league(league_id: str, rosters: List[Dict],
+                   lookup_players: Callable[[List[str]], Dict]) -> Dict[int, Dict]:
+    """
+    A league's rosters with player names attached, memoized per roster version
+
+    The result is shared between callers, so treat it as read-only. A lookup
+    that found none of the players (e.g. the player store couldn't be filled)
+    isn't cached, so the next call tries again.
+    """
+    version = roster_version(rosters)
+    with _resolved_lock:
+        cached = _resolved.get(league_id)
+        if cached is not None and cached[0] == version:
+            _resolved.move_to_end(league_id)
+            return cached[1]
+
+    rosters = rosters or []
+    player_ids = roster_player_ids(rosters)
+    players = lookup_players(player_ids)
+    resolved = resolve_rosters(rosters, players)
+    if players or not player_ids:
+        with _resolved_lock:
+            _resolved[league_id] = (version, resolved)
+            _resolved.move_to_end(league_id)
+            while len(_resolved) > MAX_CACHED_LEAGUES:
+                _resolved.popitem(last=False)
+    return resolved
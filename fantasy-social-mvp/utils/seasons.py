@@ -0,0 +1,54 @@
+"""
+NFL season status
+
+Decides whether a season is finished, in progress or not started yet, from
+Sleeper's /state/nfl response (falling back to the calendar when it isn't
+available). A finished season's leagues, rosters and users never change, so
+the API cache keeps them permanently instead of on a short TTL.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+COMPLETE = 'complete'
+LIVE = 'live'
+UPCOMING = 'upcoming'
+
+
+def calendar_season(today: date = None) -> str:
+    """Season by date alone: an NFL season runs from September into February"""
+    today = today or date.today()
+    return str(today.year if today.month >= 3 else today.year - 1)
+
+
+def current_season(state: Optional[Dict] = None) -> str:
+    """The season Sleeper is currently on"""
+    if state and state.get('season'):
+        return str(state['season'])
+    return calendar_season()
+
+
+def season_status(season: str, state: Optional[Dict] = None) -> str:
+    """COMPLETE for seasons before the current one, LIVE for it, UPCOMING after it"""
+    current = int(current_season(state))
+    try:
+        season = int(season)
+    except (TypeError, ValueError):
+        return LIVE
+    if season < current:
+        return COMPLETE
+    if season > current:
+        return UPCOMING
+    return LIVE
+
+
+def is_league_finished(league: Optional[Dict], state: Optional[Dict] = None) -> bool:
+    """A league is frozen once Sleeper marks it complete or its season has ended"""
+    if not league:
+        return False
+    return league.get('status') == 'complete' or season_status(league.get('season'), state) == COMPLETE
+
+
+def recent_seasons(state: Optional[Dict] = None, count: int = 5) -> List[str]:
+    """The current season and the ones before it, newest first"""
+    current = int(current_season(state))
+    return [str(current - offset) for offset in range(count)]
@@ -0,0 +1,87 @@
+"""
+Single-flight call coalescing
+
+When many threads ask for the same key at once (every session in a league
+opening it after waivers clear), only the first one runs the call. The rest
+wait for it and get its result, or its exception, instead of each sending an
+identical request upstream.
+
+A call runs in its leader's rate limiter lane. If an interactive caller joins
+a background call (a stale refresh or prefetch), the call is promoted to the
+interactive lane so the caller doesn't wait behind every other page load.
+"""
+import threading
+from typing import Callable, Dict, Hashable
+
+from utils import rate_limiter
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error', 'promotion')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.promotion = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {'calls': 0, 'coalesced': 0, 'promoted': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """
+        Run fn() unless a call for key is already in flight, then share its outcome
+
+        The result object is shared by every caller of that flight, so return
+        something immutable (or copy it) if callers may modify it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                if rate_limiter.current_lane() != rate_limiter.INTERACTIVE:
+                    call.promotion = rate_limiter.Promotion()
+                self._stats['calls'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            if call.promotion is not None and rate_limiter.current_lane() == rate_limiter.INTERACTIVE:
+                if call.promotion.promote():
+                    with self._lock:
+                        self._stats['promoted'] += 1
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            if call.promotion is not None:
+                with rate_limiter.promotable(call.promotion):
+                    call.value = fn()
+            else:
+                call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Calls actually run, calls that joined one already in flight, and promotions"""
+        with self._lock:
+            return dict(self._stats)
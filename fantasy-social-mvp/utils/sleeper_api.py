@@ -1,103 +1,270 @@
-import requests
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utils import http_client, rate_limiter, seasons
+from utils.api_cache import get_api_cache
+from utils.prefetch import PrefetchScheduler, RequestBudget, get_prefetch_scheduler
+from utils.player_directory import PlayerDirectory, PlayerRecord
+from utils.player_store import PlayerStore, get_player_store
+from utils.roster_index import (RosterIndex, attach_player_details, player_detail, resolve_league,
+                                roster_player_ids)
 
 class SleeperAPI:
     """Wrapper for Sleeper Fantasy Football API"""
-    BASE_URL = "https://api.sleeper.app/v1"
+    BASE_URL = os.environ.get("SLEEPER_API_BASE_URL", "https://api.sleeper.app/v1")
 
     @staticmethod
-    @st.cache_data(ttl=300)
-    def get_user(username: str) -> Optional[Dict]:
-        """Get user info by username"""
-        try:
-            response = requests.get(f"{SleeperAPI.BASE_URL}/user/{username}")
+    def _get_json(path: str, endpoint: str, permanent: bool = False):
+        """
+        GET a Sleeper API path through the shared cache; None unless it returns 200
+
+        Responses are shared with every process on the host through the API
+        cache. Once an endpoint's TTL passes, the expired copy keeps being
+        served while a background worker refreshes it, up to a hard max
+        staleness. Concurrent misses for the same path share one request.
+        permanent=True is for responses that can't change any more (finished
+        seasons): they are fetched once and kept with no TTL.
+        """
+        loader = SleeperAPI._loader(path, endpoint)
+        if permanent:
+            return get_api_cache().get_permanent(endpoint, path, loader)
+        return get_api_cache().get_or_load(endpoint, path, loader)
+
+    @staticmethod
+    def _loader(path: str, endpoint: str):
+        """Function that fetches a path: its JSON on 200, otherwise None"""
+        def load():
+            response = http_client.get(f"{SleeperAPI.BASE_URL}{path}", endpoint)
             if response.status_code == 200:
                 return response.json()
             return None
+        return load
+
+    @staticmethod
+    def _warm_json(path: str, endpoint: str, budget: RequestBudget):
+        """Refresh a path in the API cache if it would expire before the next cycle and the budget allows"""
+        cache = get_api_cache()
+        return cache.warm(endpoint, path, SleeperAPI._loader(path, endpoint),
+                          refresh_ahead=budget.refresh_ahead(cache.ttl(endpoint)), allow_load=budget.take)
+
+    @staticmethod
+    def warm_user(user_id: str, budget: RequestBudget, sport: str = "nfl", season: str = None):
+        """Prefetch a user's leagues, and each league's details, rosters and users (current season by default)"""
+        season = season or SleeperAPI.current_season()
+        leagues = SleeperAPI._warm_json(f"/user/{user_id}/leagues/{sport}/{season}", "user_leagues", budget) or []
+        for league in leagues:
+            league_id = league.get('league_id')
+            # Finished leagues are archived and never go stale
+            if not league_id or SleeperAPI._is_archived_league(league_id):
+                continue
+            for path, endpoint in ((f"/league/{league_id}", "league"),
+                                   (f"/league/{league_id}/rosters", "league_rosters"),
+                                   (f"/league/{league_id}/users", "league_users")):
+                if budget.exhausted:
+                    return
+                SleeperAPI._warm_json(path, endpoint, budget)
+
+    @staticmethod
+    def get_prefetch_scheduler() -> PrefetchScheduler:
+        """Get the process-wide prefetch scheduler (started on first use)"""
+        return get_prefetch_scheduler(SleeperAPI.warm_user)
+
+    @staticmethod
+    def track_active_user(user_id: str):
+        """Mark a Sleeper user as active so their leagues are kept warm"""
+        SleeperAPI.get_prefetch_scheduler().track(user_id)
+
+    @staticmethod
+    def get_cache_stats() -> Dict[str, float]:
+        """API cache hits (incl. warm hit rate), misses, stale serves, refresh latency and coalesced calls"""
+        return get_api_cache().stats()
+
+    @staticmethod
+    def get_request_metrics() -> Dict[str, Dict]:
+        """Per-endpoint request counts, errors, retries and latency"""
+        return http_client.metrics.snapshot()
+
+    @staticmethod
+    def get_rate_limit_stats() -> Dict[str, Dict]:
+        """Rate limiter queue depth and wait times, per priority lane"""
+        return rate_limiter.limiter.snapshot()
+
+    @staticmethod
+    def get_nfl_state() -> Optional[Dict]:
+        """Get Sleeper's current NFL season, week and season type"""
+        try:
+            return SleeperAPI._get_json("/state/nfl", "state")
+        except Exception:
+            # Season helpers fall back to the calendar
+            return None
+
+    @staticmethod
+    def current_season() -> str:
+        """The NFL season Sleeper is currently on, e.g. '2025'"""
+        return seasons.current_season(SleeperAPI.get_nfl_state())
+
+    @staticmethod
+    def season_status(season: str) -> str:
+        """seasons.COMPLETE, LIVE or UPCOMING"""
+        return seasons.season_status(season, SleeperAPI.get_nfl_state())
+
+    @staticmethod
+    def available_seasons(count: int = 5) -> List[str]:
+        """The current season and the ones before it, newest first"""
+        return seasons.recent_seasons(SleeperAPI.get_nfl_state(), count)
+
+    @staticmethod
+    def _is_archived_league(league_id: str) -> bool:
+        return get_api_cache().is_archived(f"/league/{league_id}")
+
+    @staticmethod
+    def _archive_finished_leagues(leagues: Optional[List[Dict]]):
+        """Archive finished leagues from a league list so their rosters and users are cached permanently"""
+        state = SleeperAPI.get_nfl_state()
+        cache = get_api_cache()
+        for league in leagues or []:
+            league_id = league.get('league_id')
+            if league_id and seasons.is_league_finished(league, state) and not SleeperAPI._is_archived_league(league_id):
+                cache.archive_value("league", f"/league/{league_id}", league)
+
+    @staticmethod
+    def get_user(username: str) -> Optional[Dict]:
+        """Get user info by username"""
+        try:
+            return SleeperAPI._get_json(f"/user/{username}", "user")
         except Exception as e:
             st.error(f"Error fetching user: {e}")
             return None
 
     @staticmethod
-    @st.cache_data(ttl=300)
-    def get_user_leagues(user_id: str, sport: str = "nfl", season: str = "2025") -> List[Dict]:
-        """Get all leagues for a user"""
+    def get_user_leagues(user_id: str, sport: str = "nfl", season: str = None) -> List[Dict]:
+        """Get all leagues for a user in a season (the current season by default)"""
         try:
-            response = requests.get(f"{SleeperAPI.BASE_URL}/user/{user_id}/leagues/{sport}/{season}")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            season = season or SleeperAPI.current_season()
+            finished = SleeperAPI.season_status(season) == seasons.COMPLETE
+            data = SleeperAPI._get_json(f"/user/{user_id}/leagues/{sport}/{season}", "user_leagues", permanent=finished)
+            SleeperAPI._archive_finished_leagues(data)
+            return data if data is not None else []
         except Exception as e:
             st.error(f"Error fetching leagues: {e}")
             return []
 
     @staticmethod
-    @st.cache_data(ttl=300)
     def get_league_rosters(league_id: str) -> List[Dict]:
         """Get all rosters in a league"""
         try:
-            response = requests.get(f"{SleeperAPI.BASE_URL}/league/{league_id}/rosters")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            data = SleeperAPI._get_json(f"/league/{league_id}/rosters", "league_rosters",
+                                        permanent=SleeperAPI._is_archived_league(league_id))
+            return data if data is not None else []
         except Exception as e:
             st.error(f"Error fetching rosters: {e}")
             return []
 
     @staticmethod
-    @st.cache_data(ttl=300)
     def get_league_users(league_id: str) -> List[Dict]:
         """Get all users in a league"""
         try:
-            response = requests.get(f"{SleeperAPI.BASE_URL}/league/{league_id}/users")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            data = SleeperAPI._get_json(f"/league/{league_id}/users", "league_users",
+                                        permanent=SleeperAPI._is_archived_league(league_id))
+            return data if data is not None else []
         except Exception as e:
             st.error(f"Error fetching league users: {e}")
             return []
 
     @staticmethod
-    @st.cache_data(ttl=300)
     def get_league(league_id: str) -> Optional[Dict]:
         """Get league details"""
         try:
-            response = requests.get(f"{SleeperAPI.BASE_URL}/league/{league_id}")
-            if response.status_code == 200:
-                return response.json()
-            return None
+            if SleeperAPI._is_archived_league(league_id):
+                return SleeperAPI._get_json(f"/league/{league_id}", "league", permanent=True)
+            league = SleeperAPI._get_json(f"/league/{league_id}", "league")
+            SleeperAPI._archive_finished_leagues([league] if league else None)
+            return league
         except Exception as e:
             st.error(f"Error fetching league: {e}")
             return None
 
+    @staticmethod
+    def hydrate_leagues(league_ids: List[str], max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        Fetch league, rosters and users for many leagues concurrently
+
+        Returns {league_id: {'league': ..., 'rosters': [...], 'users': [...]}}.
+        All requests share a bounded thread pool, so N leagues cost roughly one
+        round trip of latency per max_workers requests instead of 3 * N.
+        """
+        fetchers = {
+            'league': SleeperAPI.get_league,
+            'rosters': SleeperAPI.get_league_rosters,
+            'users': SleeperAPI.get_league_users,
+        }
+        # Worker threads need the script context for st.error
+        ctx = get_script_run_ctx(suppress_warning=True)
+
+        hydrated = {league_id: {} for league_id in league_ids}
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                initializer=lambda: add_script_run_ctx(None, ctx)) as executor:
+            futures = {
+                (league_id, key): executor.submit(fetch, league_id)
+                for league_id in hydrated
+                for key, fetch in fetchers.items()
+            }
+            for (league_id, key), future in futures.items():
+                hydrated[league_id][key] = future.result()
+        return hydrated
+
+    @staticmethod
+    def get_roster_index(league_id: str) -> RosterIndex:
+        """
+        Get a league's rosters indexed by owner and roster id
+
+        Built from the API cache on every call (it is linear in the number of
+        rosters), so it never lags behind a roster refresh.
+        """
+        return RosterIndex(SleeperAPI.get_league_rosters(league_id))
+
     @staticmethod
     def get_user_roster_in_league(user_id: str, league_id: str) -> Optional[Dict]:
         """Get a specific user's roster in a league"""
-        rosters = SleeperAPI.get_league_rosters(league_id)
-        for roster in rosters:
-            if roster.get('owner_id') == user_id:
-                return roster
-        return None
+        return SleeperAPI.get_roster_index(league_id).owner(user_id)
 
     @staticmethod
-    @st.cache_data(ttl=3600)
-    def get_all_players() -> Dict:
-        """Get all NFL players data (cached for 1 hour)"""
+    def get_user_roster_with_names(user_id: str, league_id: str) -> Optional[Dict]:
+        """Get a user's roster in a league with player names attached"""
+        index = SleeperAPI.get_roster_index(league_id)
+        roster = index.owner(user_id)
+        if roster is None:
+            return None
+        return resolve_league(league_id, index.rosters, SleeperAPI.lookup_players).get(roster.get('roster_id'))
+
+    @staticmethod
+    def get_player_store() -> PlayerStore:
+        """Get the on-disk player directory, filling it on first use"""
+        store = get_player_store()
         try:
-            response = requests.get(f"{SleeperAPI.BASE_URL}/players/nfl")
-            if response.status_code == 200:
-                return response.json()
-            return {}
+            store.ensure_fresh(f"{SleeperAPI.BASE_URL}/players/nfl")
         except Exception as e:
             st.error(f"Error fetching players: {e}")
-            return {}
+        return store
+
+    @staticmethod
+    def lookup_players(player_ids: List[str]) -> Dict[str, PlayerRecord]:
+        """Get name, position, team and injury status for just these player IDs"""
+        return SleeperAPI.get_player_store().lookup(player_ids)
+
+    @staticmethod
+    def get_all_players() -> PlayerDirectory:
+        """Get all NFL players as a compact directory (prefer lookup_players for a few IDs)"""
+        return SleeperAPI.get_player_store().all_players()
 
     @staticmethod
     def get_player_name(player_id: str, all_players: Dict = None) -> str:
         """Get player name from player ID"""
         if all_players is None:
-            all_players = SleeperAPI.get_all_players()
+            all_players = SleeperAPI.lookup_players([player_id])
 
         player = all_players.get(player_id, {})
         if player:
@@ -111,35 +278,14 @@ class SleeperAPI:
     @staticmethod
     def get_roster_with_names(roster: Dict, all_players: Dict = None) -> Dict:
         """Get roster with player names instead of IDs"""
+        player_ids = roster_player_ids([roster])
         if all_players is None:
-            all_players = SleeperAPI.get_all_players()
-
-        roster_copy = roster.copy()
-
-        if 'players' in roster_copy and roster_copy['players']:
-            roster_copy['player_details'] = []
-            for player_id in roster_copy['players']:
-                player = all_players.get(player_id, {})
-                if player:
-                    roster_copy['player_details'].append({
-                        'id': player_id,
-                        'name': f"{player.get('first_name', '')} {player.get('last_name', '')}".strip(),
-                        'position': player.get('position', 'N/A'),
-                        'team': player.get('team', 'N/A'),
-                        'status': player.get('injury_status', 'Active')
-                    })
-
-        if 'starters' in roster_copy and roster_copy['starters']:
-            roster_copy['starter_details'] = []
-            for player_id in roster_copy['starters']:
-                player = all_players.get(player_id, {})
-                if player:
-                    roster_copy['starter_details'].append({
-                        'id': player_id,
-                        'name': f"{player.get('first_name', '')} {player.get('last_name', '')}".strip(),
-                        'position': player.get('position', 'N/A'),
-                        'team': player.get('team', 'N/A'),
-                        'status': player.get('injury_status', 'Active')
-                    })
-
-        return roster_copy
+            all_players = SleeperAPI.lookup_players(player_ids)
+
+        # One detail dict per player, shared between player_details and starter_details
+        details = {}
+        for player_id in player_ids:
+            player = all_players.get(player_id, {})
+            if player:
+                details[player_id] = player_detail(player_id, player)
+        return attach_player_details(roster, details)
@@ -0,0 +1,325 @@
+"""
+Follow recommendations
+
+The follow graph is held in memory as CSR adjacency arrays (NumPy int32,
+indexed by user id), alongside the league memberships the leaderboard job
+has recorded. "People you may know" are ranked by how many of the people a
+user follows already follow them, plus how many Sleeper leagues they share.
+
+After the first load the graph never rereads the follows table: it tails
+the follow_events log, keeps new follows and unfollows in small per-user
+deltas, and folds them back into the arrays once enough pile up.
+Recommendations are memoized per user until the graph changes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+MUTUAL_WEIGHT = 1.0         # per person you follow who follows them
+LEAGUE_WEIGHT = 3.0         # per Sleeper league you're both in
+COMPACT_THRESHOLD = 10000   # pending follow changes before they're merged into the arrays
+MAX_CACHED_USERS = 10000
+
+EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def _fetch_int_pairs(conn, first: str, second: str, source: str) -> np.ndarray:
+    """
+    Read two integer columns into an (n, 2) int32 array
+
+    SQLite packs them into one string, so no Python tuple is built per row
+    (row-by-row reads are most of the load time on millions of follows).
+    """
+    packed = conn.execute(f"SELECT group_concat({first} || ',' || {second}) FROM {source}").fetchone()[0]
+    if not packed:
+        return EMPTY.reshape(0, 2)
+    return np.array(packed.split(','), dtype=np.int32).reshape(-1, 2)
+
+
+def build_csr(src: np.ndarray, dst: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (indptr, indices) for edges src -> dst over nodes 0..size-1
+
+    Row i's neighbors are indices[indptr[i]:indptr[i + 1]], sorted.
+    """
+    order = np.lexsort((dst, src))
+    counts = np.bincount(src, minlength=size)
+    indptr = np.zeros(size + 1, dtype=np.int32)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+def _row(indptr: np.ndarray, indices: np.ndarray, node: int) -> np.ndarray:
+    if node < 0 or node + 1 >= len(indptr):
+        return EMPTY
+    return indices[indptr[node]:indptr[node + 1]]
+
+
+def _contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Which of ids are in sorted_ids (a binary search each; cheaper than np.isin on small arrays)"""
+    if not len(sorted_ids):
+        return np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return sorted_ids[positions] == ids
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """The rows of several nodes concatenated, without a Python loop over them"""
+    nodes = nodes[nodes + 1 < len(indptr)]
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return EMPTY
+    # Shift each output position from where its row starts in the output to where it starts in indices
+    row_offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return indices[row_offsets + np.arange(total, dtype=np.int32)]
+
+
+class FollowGraph:
+    """
+    In-memory follow graph and league memberships for one database
+
+    Call refresh() to catch up with the database (cheap when nothing
+    changed), then recommend(user_id).
+    """
+
+    def __init__(self, db, compact_threshold: int = COMPACT_THRESHOLD):
+        self.db = db
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_event_id = 0
+        # follower -> following
+        self._indptr, self._indices = np.zeros(1, dtype=np.int32), EMPTY
+        # Follow changes since the arrays were built, per follower
+        self._added: Dict[int, Set[int]] = {}
+        self._removed: Dict[int, Set[int]] = {}
+        self._pending = 0
+        # user -> league and league -> user
+        self._league_version = None
+        self._user_leagues = (np.zeros(1, dtype=np.int32), EMPTY)
+        self._league_users = (np.zeros(1, dtype=np.int32), EMPTY)
+        self._cache: 'OrderedDict[int, Tuple[int, List[Dict]]]' = OrderedDict()
+        self._stats = {
+            'loads': 0,
+            'load_seconds': 0.0,
+            'events_applied': 0,
+            'compactions': 0,
+            'hits': 0,
+            'computed': 0,
+        }
+
+    @property
+    def ready(self) -> bool:
+        """Whether the first load has finished"""
+        return self._loaded
+
+    def refresh(self) -> int:
+        """Catch up with follows and league memberships; returns the follow events applied"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                return 0
+            with self.db.connection() as conn:
+                events = conn.execute('''
+                    SELECT id, follower_id, following_id, followed FROM follow_events
+                    WHERE id > ? ORDER BY id
+                ''', (self._last_event_id,)).fetchall()
+                league_version = self._read_league_version(conn)
+                if league_version != self._league_version:
+                    self._load_leagues(conn, league_version)
+                    self._cache.clear()
+
+            for event_id, follower_id, following_id, followed in events:
+                self._apply(follower_id, following_id, bool(followed))
+                self._last_event_id = event_id
+            if events:
+                self._stats['events_applied'] += len(events)
+                self._cache.clear()
+            if self._pending > self.compact_threshold:
+                self._compact()
+            return len(events)
+
+    def _load(self):
+        """Build everything from the follows table (first use only)"""
+        start = time.time()
+        with self.db.connection() as conn:
+            # Read the log position first: events already reflected in follows replay harmlessly
+            self._last_event_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM follow_events').fetchone()[0]
+            edges = _fetch_int_pairs(conn, 'follower_id', 'following_id', 'follows')
+            self._load_leagues(conn, self._read_league_version(conn))
+
+        size = int(edges.max()) + 1 if len(edges) else 0
+        self._indptr, self._indices = build_csr(edges[:, 0], edges[:, 1], size)
+        self._added, self._removed, self._pending = {}, {}, 0
+        self._cache.clear()
+        self._loaded = True
+        self._stats['loads'] += 1
+        self._stats['load_seconds'] = time.time() - start
+
+    def _read_league_version(self, conn) -> Tuple:
+        # Memberships change when the leaderboard job rewrites a league (INSERT OR
+        # REPLACE gives it a new rowid) or a user connects; both are index lookups
+        return tuple(conn.execute('''
+            SELECT (SELECT MAX(rowid) FROM league_snapshots), (SELECT MAX(id) FROM users)
+        ''').fetchone())
+
+    def _load_leagues(self, conn, version: Tuple):
+        rows = conn.execute('''
+            SELECT u.id, t.league_id
+            FROM (SELECT DISTINCT owner_id, league_id FROM league_team_stats) t
+            JOIN users u ON u.sleeper_user_id = t.owner_id
+        ''').fetchall()
+        users = np.array([row[0] for row in rows], dtype=np.int32)
+        _, leagues = np.unique(np.array([row[1] for row in rows], dtype=object), return_inverse=True)
+        leagues = leagues.astype(np.int32)
+
+        user_count = int(users.max()) + 1 if len(users) else 0
+        league_count = int(leagues.max()) + 1 if len(leagues) else 0
+        self._user_leagues = build_csr(users, leagues, user_count)
+        self._league_users = build_csr(leagues, users, league_count)
+        self._league_version = version
+
+    def _apply(self, follower_id: int, following_id: int, followed: bool):
+        added = self._added.setdefault(follower_id, set())
+        removed = self._removed.setdefault(follower_id, set())
+        before = len(added) + len(removed)
+        if followed:
+            removed.discard(following_id)
+            added.add(following_id)
+        else:
+            added.discard(following_id)
+            removed.add(following_id)
+        self._pending += len(added) + len(removed) - before
+
+    def _compact(self):
+        """Merge the pending follow changes into the CSR arrays"""
+        src = np.repeat(np.arange(len(self._indptr) - 1, dtype=np.int64), np.diff(self._indptr))
+        keys = (src << 32) | self._indices.astype(np.int64)
+
+        def edge_keys(deltas: Dict[int, Set[int]]) -> np.ndarray:
+            return np.array([(follower << 32) | following
+                             for follower, followings in deltas.items() for following in followings],
+                            dtype=np.int64)
+
+        keys = keys[~np.isin(keys, edge_keys(self._removed))]
+        keys = np.union1d(keys, edge_keys(self._added))
+        src = (keys >> 32).astype(np.int32)
+        dst = (keys & 0xFFFFFFFF).astype(np.int32)
+        size = max(len(self._indptr) - 1, int(src.max()) + 1 if len(src) else 0)
+        self._indptr, self._indices = build_csr(src, dst, size)
+        self._added, self._removed, self._pending = {}, {}, 0
+        self._stats['compactions'] += 1
+
+    def _has_changes(self, user_id: int) -> bool:
+        return bool(self._added.get(user_id) or self._removed.get(user_id))
+
+    def _following(self, user_id: int) -> np.ndarray:
+        following = _row(self._indptr, self._indices, user_id)
+        removed = self._removed.get(user_id)
+        if removed:
+            following = following[~np.isin(following, np.fromiter(removed, dtype=np.int32))]
+        added = self._added.get(user_id)
+        if added:
+            following = np.union1d(following, np.fromiter(added, dtype=np.int32)).astype(np.int32)
+        return following
+
+    def following(self, user_id: int) -> np.ndarray:
+        """Sorted ids of everyone a user follows"""
+        with self._lock:
+            return self._following(user_id)
+
+    def recommend(self, user_id: int, k: int = 10) -> List[Dict]:
+        """
+        Top-k people a user may know, best first
+
+        Each is {'user_id', 'score', 'mutual', 'shared_leagues'}: mutual is
+        how many of the people the user follows follow them. People the user
+        already follows are left out. Memoized until the graph changes.
+        """
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] >= k:
+                self._cache.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return cached[1][:k]
+
+            suggestions = self._compute(user_id, k)
+            self._cache[user_id] = (k, suggestions)
+            while len(self._cache) > MAX_CACHED_USERS:
+                self._cache.popitem(last=False)
+            self._stats['computed'] += 1
+            return suggestions
+
+    def _compute(self, user_id: int, k: int) -> List[Dict]:
+        following = self._following(user_id)
+        # Everyone the user's follows follow (with repeats), from the arrays plus any pending changes
+        changed = [followee for followee in following.tolist() if self._has_changes(followee)] if self._pending else []
+        unchanged = following[~np.isin(following, changed)] if changed else following
+        fof = np.concatenate([_gather(self._indptr, self._indices, unchanged),
+                              *(self._following(followee) for followee in changed)])
+        mates = _gather(*self._league_users, _row(*self._user_leagues, user_id))
+
+        candidates, inverse = np.unique(np.concatenate([fof, mates]), return_inverse=True)
+        size = len(candidates)
+        mutual = np.bincount(inverse[:len(fof)], minlength=size)
+        shared = np.bincount(inverse[len(fof):], minlength=size)
+        score = MUTUAL_WEIGHT * mutual + LEAGUE_WEIGHT * shared
+
+        keep = (candidates != user_id) & ~_contains(following, candidates)
+        candidates, score, mutual, shared = candidates[keep], score[keep], mutual[keep], shared[keep]
+        if len(candidates) > k:
+            # Everything scoring at least the k-th best, so ties at the cutoff are settled below
+            cutoff = score[np.argpartition(-score, k - 1)[k - 1]]
+            top = score >= cutoff
+            candidates, score, mutual, shared = candidates[top], score[top], mutual[top], shared[top]
+        # Best score first; ties go to the longest-standing account
+        order = np.lexsort((candidates, -score))[:k]
+        return [
+            {'user_id': int(candidates[i]), 'score': float(score[i]),
+             'mutual': int(mutual[i]), 'shared_leagues': int(shared[i])}
+            for i in order
+        ]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats, edges=len(self._indices), pending=self._pending,
+                        cached_users=len(self._cache), last_event_id=self._last_event_id)
+
+
+_graphs: Dict[str, FollowGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def _load_in_background(graph: FollowGraph):
+    try:
+        graph.refresh()
+    except Exception:
+        # Forget the graph so the next caller tries again
+        with _graphs_lock:
+            if _graphs.get(graph.db.db_path) is graph:
+                del _graphs[graph.db.db_path]
+
+
+def get_follow_graph(db) -> FollowGraph:
+    """
+    Get the process-wide follow graph for a database
+
+    The first call starts loading it in a background thread; check ready
+    before asking for recommendations. Later calls catch it up with the
+    follow log.
+    """
+    with _graphs_lock:
+        graph = _graphs.get(db.db_path)
+        if graph is None:
+            graph = _graphs[db.db_path] = FollowGraph(db)
+            threading.Thread(target=_load_in_background, args=(graph,), name="follow-graph-load",
+                             daemon=True).start()
+            return graph
+    if graph.ready:
+        graph.refresh()
+    return graph
@@ -0,0 +1,109 @@
+"""
+League standings tables
+
+Standings are computed with pandas/NumPy from the few roster fields they
+depend on and memoized per league and roster version. A feed full of posts
+from the same league computes its table once, and only recomputes it after a
+roster's record or points actually change.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+STAT_FIELDS = ('wins', 'losses', 'ties', 'fpts', 'fpts_decimal', 'fpts_against', 'fpts_against_decimal')
+MEDALS = ("🥇 ", "🥈 ", "🥉 ")
+MAX_CACHED_LEAGUES = 512
+
+_cache: 'OrderedDict[str, Tuple[str, pd.DataFrame]]' = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'computed': 0}
+
+
+def standings_records(rosters: List[Dict], users: List[Dict]) -> List[Tuple]:
+    """(team name, *STAT_FIELDS) for each roster: everything standings depend on"""
+    names = {user.get('user_id'): user.get('display_name', 'Unknown') for user in users or []}
+    records = []
+    for roster in rosters or []:
+        settings = roster.get('settings') or {}
+        records.append((names.get(roster.get('owner_id'), 'Unknown'),
+                        *(settings.get(field) or 0 for field in STAT_FIELDS)))
+    return records
+
+
+def roster_version(records: List[Tuple]) -> str:
+    """Fingerprint of the standings inputs; changes whenever a record or score does"""
+    return hashlib.blake2b(json.dumps(records, separators=(',', ':')).encode(), digest_size=16).hexdigest()
+
+
+def compute_standings(records: List[Tuple]) -> pd.DataFrame:
+    """
+    Standings table sorted by wins, then points for
+
+    Columns: Rank, Team, W, L, (T if anyone has a tie), Win %, PF, PA. Win %
+    is wins / (wins + losses) as a percentage; ties sort in roster order.
+    """
+    frame = pd.DataFrame.from_records(records, columns=('team',) + STAT_FIELDS)
+    stats = frame[list(STAT_FIELDS)].to_numpy(dtype=np.float64)
+    wins, losses, ties, fpts, fpts_decimal, fpts_against, fpts_against_decimal = stats.T
+
+    games = wins + losses
+    win_pct = np.divide(wins, games, out=np.zeros_like(wins), where=games > 0) * 100
+    points_for = fpts + fpts_decimal / 100
+    points_against = fpts_against + fpts_against_decimal / 100
+
+    # lexsort is stable, and its last key is the primary one
+    order = np.lexsort((-points_for, -wins))
+
+    teams = frame['team'].to_numpy(dtype=object)[order]
+    rank = np.arange(1, len(order) + 1, dtype=np.int32)
+    medals = np.array([MEDALS[i] if i < len(MEDALS) else "" for i in range(len(order))], dtype=object)
+
+    table = pd.DataFrame({
+        'Rank': rank,
+        'Team': medals + teams,
+        'W': wins[order].astype(np.int32),
+        'L': losses[order].astype(np.int32),
+        'T': ties[order].astype(np.int32),
+        'Win %': win_pct[order],
+        'PF': points_for[order],
+        'PA': points_against[order],
+    })
+    if not table['T'].any():
+        table = table.drop(columns='T')
+    return table
+
+
+def get_standings(league_id: str, rosters: List[Dict], users: List[Dict]) -> pd.DataFrame:
+    """
+    Memoized standings for a league
+
+    The cached table is reused as long as the roster version matches. It is
+    shared between callers, so treat it as read-only.
+    """
+    records = standings_records(rosters, users)
+    version = roster_version(records)
+    with _cache_lock:
+        cached = _cache.get(league_id)
+        if cached is not None and cached[0] == version:
+            _cache.move_to_end(league_id)
+            _stats['hits'] += 1
+            return cached[1]
+
+    table = compute_standings(records)
+    with _cache_lock:
+        _cache[league_id] = (version, table)
+        _cache.move_to_end(league_id)
+        while len(_cache) > MAX_CACHED_LEAGUES:
+            _cache.popitem(last=False)
+        _stats['computed'] += 1
+    return table
+
+
+def cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return dict(_stats, leagues=len(_cache))